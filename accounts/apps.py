@@ -10,3 +10,8 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'  # Default field for primary keys
     name = 'accounts'  # Name of the application
 
+    def ready(self):
+        """
+        Connect the signal handlers that invalidate cached dashboards.
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,166 @@
+"""
+Dashboard benchmark suite.
+
+Generates synthetic users with short, medium and long histories (see
+accounts/synthetic.py), logs in as each one with the Django test client and
+requests every dashboard, first with an empty dashboard cache ("cold") and
+then again with the cache warm. For each request it records wall time, the
+number of SQL queries, time spent in SQL and response size, then checks the
+results against the budgets stored in benchmarks/dashboard_budgets.json.
+"""
+
+import datetime
+import json
+import statistics
+import time
+from pathlib import Path
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from healthy_you.cache import bump_data_version
+from .synthetic import generate
+
+# Dashboard name -> URL name
+DASHBOARDS = {
+    'accounts': 'dashboard',
+    'health': 'health_dashboard',
+    'sleep': 'sleep_dashboard',
+    'medications': 'medications_dashboard',
+    'goals': 'goal_dashboard',
+    'appointments': 'appointment_dashboard',
+    'reports': 'report_dashboard',
+}
+
+# History size -> years of synthetic data for its user
+PROFILES = {
+    'small': 0.25,
+    'medium': 2,
+    'large': 10,
+}
+
+MODES = ('cold', 'warm')
+
+# Measured value -> budget key that caps it
+BUDGET_KEYS = {
+    'queries': 'max_queries',
+    'wall_ms': 'max_wall_ms',
+    'sql_ms': 'max_sql_ms',
+    'bytes': 'max_bytes',
+}
+TIMING_METRICS = ('wall_ms', 'sql_ms')
+
+DEFAULT_BUDGETS = Path(settings.BASE_DIR) / 'benchmarks' / 'dashboard_budgets.json'
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting queries and the time spent running them.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def load_budgets(path=DEFAULT_BUDGETS):
+    """
+    Return {profile: {dashboard: {mode: {budget key: limit}}}} from a JSON file.
+    """
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def measure(client, url, repeat, cold):
+    """
+    Request a URL `repeat` times and return the median wall time, SQL time,
+    and the query count and size of the last response. For cold runs the
+    user's dashboard cache is invalidated before each request.
+    """
+    user_id = int(client.session['_auth_user_id'])
+    walls, sql_times = [], []
+    for _ in range(repeat):
+        if cold:
+            bump_data_version(user_id)
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = client.get(url)
+            wall = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} answered {response.status_code}")
+        walls.append(wall)
+        sql_times.append(timer.seconds)
+    return {
+        'wall_ms': round(statistics.median(walls) * 1000, 2),
+        'sql_ms': round(statistics.median(sql_times) * 1000, 2),
+        'queries': timer.queries,
+        'bytes': len(response.content),
+    }
+
+
+def check(result, budget, timing=True):
+    """
+    Return the budget violations of one result as ["metric value > limit", ...].
+    """
+    violations = []
+    for metric, key in BUDGET_KEYS.items():
+        if not timing and metric in TIMING_METRICS:
+            continue
+        limit = budget.get(key)
+        if limit is not None and result[metric] > limit:
+            violations.append(f"{metric} {result[metric]} > {limit}")
+    return violations
+
+
+def run(profiles=tuple(PROFILES), dashboards=tuple(DASHBOARDS), budgets=None, repeat=5, seed=42, timing=True):
+    """
+    Run the suite and return its report: metadata, one entry per
+    (profile, dashboard, mode) with its measurements, budget and violations,
+    and whether everything stayed within budget. Pass timing=False to skip
+    the wall and SQL time budgets, which depend on the machine.
+    """
+    budgets = budgets or {}
+    results = []
+    for number, profile in enumerate(profiles):
+        # Each profile gets its own user (and prefix), so histories do not mix
+        generate(users=1, years=PROFILES[profile], seed=seed + number, prefix=f"benchmark-{profile}")
+        client = Client()
+        client.login(username=f"benchmark-{profile}-000000", password='synthetic-password')
+        for dashboard in dashboards:
+            url = reverse(DASHBOARDS[dashboard])
+            for mode in MODES:
+                result = measure(client, url, repeat, cold=(mode == 'cold'))
+                budget = budgets.get(profile, {}).get(dashboard, {}).get(mode, {})
+                results.append({
+                    'profile': profile,
+                    'dashboard': dashboard,
+                    'mode': mode,
+                    **result,
+                    'budget': budget,
+                    'violations': check(result, budget, timing),
+                })
+    return {
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'repeat': repeat,
+        'timing_checked': timing,
+        'passed': not any(result['violations'] for result in results),
+        'results': results,
+    }
+
+
+def client_settings():
+    """
+    Settings the test client needs outside the test runner.
+    """
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
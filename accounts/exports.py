@@ -0,0 +1,43 @@
+from appointments.models import Appointment, AppointmentOverride
+from goals.models import Goal
+from health.models import HealthMetric
+from medications.models import Medication, MedicationDoseTime, MedicationLog
+from sleep.models import SleepRecord
+
+# Dataset name -> (function returning the user's rows in export order, exported fields)
+EXPORTS = {
+    'health_metrics': (
+        lambda user: HealthMetric.objects.filter(user=user).order_by('date', 'id'),
+        ('id', 'date', 'weight', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+         'heart_rate', 'calories_intake', 'physical_activity_minutes'),
+    ),
+    'sleep_records': (
+        lambda user: SleepRecord.objects.filter(user=user).order_by('date', 'id'),
+        ('id', 'date', 'duration', 'quality'),
+    ),
+    'medications': (
+        lambda user: Medication.objects.filter(user=user).order_by('id'),
+        ('id', 'name', 'description', 'frequency', 'start_date', 'dosing_schedule'),
+    ),
+    'medication_dose_times': (
+        lambda user: MedicationDoseTime.objects.filter(medication__user=user).order_by('medication_id', 'id'),
+        ('id', 'medication_id', 'scheduled_time', 'recurring_days'),
+    ),
+    'medication_logs': (
+        lambda user: MedicationLog.objects.filter(medication__user=user).order_by('medication_id', 'date', 'id'),
+        ('id', 'medication_id', 'dose_time_id', 'date', 'status'),
+    ),
+    'goals': (
+        lambda user: Goal.objects.filter(user=user).order_by('id'),
+        ('id', 'goal_type', 'target_value', 'comparison', 'description', 'due_date', 'created_at'),
+    ),
+    'appointments': (
+        lambda user: Appointment.objects.filter(user=user).order_by('appointment_date', 'appointment_time', 'id'),
+        ('id', 'title', 'description', 'appointment_date', 'appointment_time', 'location', 'status',
+         'recurrence', 'recurrence_end', 'created_at'),
+    ),
+    'appointment_overrides': (
+        lambda user: AppointmentOverride.objects.filter(appointment__user=user).order_by('appointment_id', 'date', 'id'),
+        ('id', 'appointment_id', 'date', 'cancelled', 'status', 'rescheduled_date', 'rescheduled_time'),
+    ),
+}
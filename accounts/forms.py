@@ -0,0 +1,21 @@
+from django import forms
+from healthy_you.importer import FORMATS
+
+
+class DataImportForm(forms.Form):
+    """
+    Form for uploading a CSV or NDJSON file of historical health or sleep data.
+    """
+
+    KIND_CHOICES = (
+        ('health', 'Health metrics'),
+        ('sleep', 'Sleep records'),
+    )
+    FORMAT_CHOICES = (('', 'Detect from file name'),) + tuple((fmt, fmt.upper()) for fmt in FORMATS)
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES, label="Data")
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False, label="Format")
+    file = forms.FileField(
+        label="File",
+        help_text="CSV with a header row, or one JSON object per line, using the entry form's field names.",
+    )
@@ -0,0 +1,8 @@
+from health.imports import import_health_metrics
+from sleep.imports import import_sleep_records
+
+# Kind of data -> importer(stream, user, fmt, batch_size, transaction_rows)
+IMPORTERS = {
+    'health': import_health_metrics,
+    'sleep': import_sleep_records,
+}
@@ -0,0 +1,218 @@
+import asyncio
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from accounts.synthetic import clear, generate
+from healthy_you.cache import bump_data_version
+
+PREFIX = 'loadtest'
+
+# Dashboard -> URL name
+DASHBOARDS = {
+    'health': 'health_dashboard',
+    'sleep': 'sleep_dashboard',
+    'reports': 'report_dashboard',
+}
+
+HOST = 'testserver'
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the dashboards in one worker process through Django's own request handlers, "
+        "middleware included: the WSGI handler on a fixed pool of threads, as a threaded WSGI server "
+        "runs it, and the ASGI handler on an event loop, as an ASGI server runs it. The URLs serve "
+        "the async views only when DJANGO_ASYNC_DASHBOARDS=True, so run it once with and once "
+        "without that setting to compare sync views under WSGI with async views under ASGI. Reports "
+        "throughput, latency, peak traced memory and peak thread count. Synthetic users are created "
+        "for the run and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dashboard',
+            choices=sorted(DASHBOARDS),
+            action='append',
+            dest='dashboards',
+            help="Dashboard to load-test (may be repeated; default: all).",
+        )
+        parser.add_argument('--requests', type=int, default=400, help="Requests per dashboard and handler.")
+        parser.add_argument('--users', type=int, default=20, help="Synthetic users the requests are spread over.")
+        parser.add_argument('--years', type=float, default=1.0, help="Years of history per synthetic user.")
+        parser.add_argument('--threads', type=int, default=4, help="Worker threads for the WSGI handler.")
+        parser.add_argument('--concurrency', type=int, default=32, help="Requests in flight for the ASGI handler.")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed for the synthetic users.")
+        parser.add_argument(
+            '--handler',
+            choices=('wsgi', 'asgi'),
+            action='append',
+            dest='handlers',
+            help="Handler to load-test (may be repeated; default: the one the dashboards are served for).",
+        )
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help="Serve from the dashboard cache instead of invalidating it before each request.",
+        )
+        parser.add_argument(
+            '--no-memory',
+            action='store_true',
+            help="Skip memory tracing, which slows both handlers down.",
+        )
+
+    def handle(self, *args, **options):
+        dashboards = [name for name in DASHBOARDS if name in (options['dashboards'] or DASHBOARDS)]
+        handlers = options['handlers'] or ['asgi' if settings.ASYNC_DASHBOARDS else 'wsgi']
+        views = 'async' if settings.ASYNC_DASHBOARDS else 'sync'
+        # Worker threads need committed rows, so this cannot run in a rolled-back transaction
+        generate(users=options['users'], years=options['years'], seed=options['seed'], prefix=PREFIX)
+        try:
+            users = list(get_user_model().objects.filter(username__startswith=f"{PREFIX}-").order_by('username'))
+            with override_settings(ALLOWED_HOSTS=[HOST]):
+                cookies = self._log_in(users)
+                for dashboard in dashboards:
+                    url = reverse(DASHBOARDS[dashboard])
+                    for handler in handlers:
+                        if handler == 'wsgi':
+                            workers = f"{options['threads']} threads"
+                            run = self._wsgi_run(url, users, cookies, options)
+                        else:
+                            workers = f"{options['concurrency']} in flight"
+                            run = self._asgi_run(url, users, cookies, options)
+                        self.stdout.write(
+                            f"{dashboard:<8} {views} views  {handler:<5} {workers:<14} " + self._measure(run, options)
+                        )
+        finally:
+            clear(prefix=PREFIX)
+
+    def _log_in(self, users):
+        """
+        Return a session cookie header for each user.
+        """
+        cookies = {}
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            name = settings.SESSION_COOKIE_NAME
+            cookies[user.pk] = f"{name}={client.cookies[name].value}"
+        return cookies
+
+    def _measure(self, run, options):
+        """
+        Run one load test and format its throughput, latency, memory and thread figures.
+        """
+        self.peak_threads = threading.active_count()
+        if not options['no_memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        latencies = run()
+        seconds = time.perf_counter() - started
+        peak = 0
+        if not options['no_memory']:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        latencies.sort()
+        return (
+            f"{len(latencies) / seconds:8.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms  "
+            f"peak {peak / 1e6:6.2f} MB  threads {self.peak_threads}"
+        )
+
+    def _note_threads(self):
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def _wsgi_run(self, url, users, cookies, options):
+        """
+        Return a callable sending the requests through one WSGIHandler from a
+        pool of worker threads, which returns their latencies.
+        """
+        handler = WSGIHandler()
+        count, cold = options['requests'], not options['warm']
+
+        def one(index):
+            user = users[index % len(users)]
+            if cold:
+                bump_data_version(user.pk)
+            environ = {'PATH_INFO': url, 'HTTP_HOST': HOST, 'HTTP_COOKIE': cookies[user.pk]}
+            setup_testing_defaults(environ)
+            statuses = []
+            started = time.perf_counter()
+            response = handler(environ, lambda status, headers: statuses.append(status))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                # Sends request_finished, which closes or recycles the thread's connection
+                response.close()
+            self._note_threads()
+            assert statuses[0].startswith('200'), statuses[0]
+            return time.perf_counter() - started
+
+        def run():
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                return list(pool.map(one, range(count)))
+        return run
+
+    def _asgi_run(self, url, users, cookies, options):
+        """
+        Return a callable awaiting the requests through one ASGIHandler with up
+        to `concurrency` in flight, which returns their latencies.
+        """
+        handler = ASGIHandler()
+        count, cold = options['requests'], not options['warm']
+
+        async def one(index, slots):
+            user = users[index % len(users)]
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': url,
+                'raw_path': url.encode(),
+                'query_string': b'',
+                'root_path': '',
+                'headers': [(b'host', HOST.encode()), (b'cookie', cookies[user.pk].encode())],
+                'client': ('127.0.0.1', 0),
+                'server': (HOST, 80),
+            }
+            messages, received = [], []
+
+            async def receive():
+                if received:
+                    # Only asked again to watch for a disconnect; wait like a connection left open
+                    await asyncio.Event().wait()
+                received.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            async with slots:
+                if cold:
+                    bump_data_version(user.pk)
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                self._note_threads()
+            status = messages[0]['status']
+            assert status == 200, status
+            return time.perf_counter() - started
+
+        async def main():
+            slots = asyncio.Semaphore(options['concurrency'])
+            return list(await asyncio.gather(*(one(index, slots) for index in range(count))))
+
+        return lambda: asyncio.run(main())
@@ -0,0 +1,64 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.benchmarking import DASHBOARDS, DEFAULT_BUDGETS, PROFILES, client_settings, load_budgets, run
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every dashboard for synthetic users of several history sizes and checks the "
+        "results against stored budgets. Synthetic data is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile',
+            choices=sorted(PROFILES),
+            action='append',
+            dest='profiles',
+            help="History size to benchmark (may be repeated; default: all).",
+        )
+        parser.add_argument(
+            '--dashboard',
+            choices=sorted(DASHBOARDS),
+            action='append',
+            dest='dashboards',
+            help="Dashboard to benchmark (may be repeated; default: all).",
+        )
+        parser.add_argument('--budgets', default=str(DEFAULT_BUDGETS), help="JSON file of budgets to check against.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of standard output.")
+        parser.add_argument('--repeat', type=int, default=5, help="Requests per dashboard and mode (median is reported).")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed for the synthetic users.")
+        parser.add_argument('--skip-timing', action='store_true', help="Only check query count and size budgets.")
+        parser.add_argument(
+            '--no-fail',
+            action='store_true',
+            help="Exit successfully even when a budget is exceeded.",
+        )
+
+    def handle(self, *args, **options):
+        budgets = load_budgets(options['budgets']) if options['budgets'] else {}
+        profiles = [name for name in PROFILES if name in (options['profiles'] or PROFILES)]
+        dashboards = [name for name in DASHBOARDS if name in (options['dashboards'] or DASHBOARDS)]
+
+        with client_settings(), transaction.atomic():
+            report = run(
+                profiles, dashboards, budgets,
+                repeat=options['repeat'], seed=options['seed'], timing=not options['skip_timing'],
+            )
+            transaction.set_rollback(True)
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(payload + '\n')
+        else:
+            self.stdout.write(payload)
+
+        for result in report['results']:
+            if result['violations']:
+                self.stderr.write(
+                    f"{result['profile']}/{result['dashboard']}/{result['mode']}: {', '.join(result['violations'])}"
+                )
+        if not report['passed'] and not options['no_fail']:
+            raise CommandError("Dashboard benchmarks exceeded their budgets.")
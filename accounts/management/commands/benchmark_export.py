@@ -0,0 +1,81 @@
+import datetime
+import time
+import tracemalloc
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.exports import EXPORTS
+from health.models import HealthMetric
+from healthy_you.exporter import ENCODERS, zip_stream
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures export speed and peak memory for a synthetic user at growing history sizes. "
+        "Everything is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            action='append',
+            dest='sizes',
+            help="Number of HealthMetric rows to export (may be repeated; default 10000, 100000 and 1000000).",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help="Number of rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'] or [10000, 100000, 1000000])
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username=f"export-benchmark-{time.time_ns()}")
+            rows_written = 0
+            for size in sizes:
+                rows_written = self._grow(user, rows_written, size, options['batch_size'])
+                for fmt in ('csv', 'ndjson', 'zip'):
+                    seconds, total_bytes, peak = self._measure(user, fmt)
+                    self.stdout.write(
+                        f"{size:>9} rows  {fmt:<6} {seconds:8.2f}s  {size / seconds:>9.0f} rows/s  "
+                        f"{total_bytes / 1e6:9.1f} MB out  peak {peak / 1e6:6.2f} MB"
+                    )
+            transaction.set_rollback(True)
+
+    def _grow(self, user, start, size, batch_size):
+        """
+        Add synthetic HealthMetric rows until the user has `size` of them.
+        """
+        first_day = datetime.date(2000, 1, 1)
+        for offset in range(start, size, batch_size):
+            HealthMetric.objects.bulk_create([
+                HealthMetric(
+                    user_id=user.pk, date=first_day + datetime.timedelta(days=i % 20000),
+                    weight=60 + i % 40, blood_pressure_systolic=110 + i % 30, blood_pressure_diastolic=70 + i % 20,
+                    heart_rate=55 + i % 40, calories_intake=1800 + i % 900, physical_activity_minutes=i % 90,
+                )
+                for i in range(offset, min(offset + batch_size, size))
+            ])
+        return size
+
+    def _measure(self, user, fmt):
+        """
+        Consume one export and return (seconds, bytes produced, peak traced memory in bytes).
+        """
+        if fmt == 'zip':
+            members = (
+                (f"{dataset}.csv", ENCODERS['csv'](rows(user), fields))
+                for dataset, (rows, fields) in EXPORTS.items()
+            )
+            stream = zip_stream(members)
+        else:
+            rows, fields = EXPORTS['health_metrics']
+            stream = ENCODERS[fmt](rows(user), fields)
+
+        total_bytes = 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        for chunk in stream:
+            total_bytes += len(chunk)
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return seconds, total_bytes, peak
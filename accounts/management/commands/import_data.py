@@ -0,0 +1,45 @@
+import sys
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from accounts.imports import IMPORTERS
+from healthy_you.importer import FORMATS, detect_format
+
+
+class Command(BaseCommand):
+    help = "Bulk-imports health metrics or sleep records for a user from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - to read standard input.")
+        parser.add_argument('--user', required=True, help="Username of the user the rows belong to.")
+        parser.add_argument('--kind', choices=sorted(IMPORTERS), required=True, help="Type of data in the file.")
+        parser.add_argument('--format', choices=FORMATS, help="File format (default: detected from the file name, else csv).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of rows written per bulk insert.")
+        parser.add_argument(
+            '--transaction-rows',
+            type=int,
+            default=20000,
+            help="Number of rows committed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        importer = IMPORTERS[options['kind']]
+        if path == '-':
+            report = importer(sys.stdin, user, fmt, options['batch_size'], options['transaction_rows'])
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                report = importer(stream, user, fmt, options['batch_size'], options['transaction_rows'])
+
+        for line, message in report.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        if report.rejected > len(report.errors):
+            self.stderr.write(f"... and {report.rejected - len(report.errors)} more rejected rows.")
+        style = self.style.SUCCESS if not report.rejected else self.style.WARNING
+        self.stdout.write(style(f"Import finished: {report}."))
@@ -0,0 +1,37 @@
+import os
+import tempfile
+from django.core.management.base import BaseCommand
+from healthy_you.database import stress
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs concurrent readers and writers against scratch SQLite files, first with SQLite's defaults "
+        "and then with the tuning in healthy_you/database.py, and reports throughput, lock errors and "
+        "read latency for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument('--readers', type=int, default=4, help="Concurrent reader threads.")
+        parser.add_argument('--writers', type=int, default=4, help="Concurrent writer threads.")
+        parser.add_argument(
+            '--write-hold',
+            type=float,
+            default=0.002,
+            help="Seconds each write transaction stays open between its read and its insert.",
+        )
+
+    def handle(self, *args, **options):
+        for label, tuned in (('default', False), ('tuned', True)):
+            with tempfile.TemporaryDirectory() as directory:
+                result = stress(
+                    os.path.join(directory, 'stress.sqlite3'), tuned=tuned, readers=options['readers'],
+                    writers=options['writers'], seconds=options['seconds'], write_hold=options['write_hold'],
+                )
+            self.stdout.write(
+                f"{label:<8} {result['reads'] / options['seconds']:8.1f} reads/s  "
+                f"{result['writes'] / options['seconds']:8.1f} writes/s  "
+                f"errors {result['read_errors']} read / {result['write_errors']} write  "
+                f"read p50 {result['read_p50_ms']} ms  max {result['read_max_ms']} ms"
+            )
@@ -0,0 +1,14 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from healthy_you.cache import invalidate_dashboards
+
+
+@receiver(post_save, sender=User)
+def start_dashboard_version(sender, instance, created=False, **kwargs):
+    """
+    Give every new user a fresh dashboard data version, so nothing cached for
+    an earlier account that reused the same ID can be served to them.
+    """
+    if created:
+        invalidate_dashboards(instance.pk)
@@ -0,0 +1,334 @@
+"""
+Synthetic population generator for load testing and profiling.
+
+Each generated user gets daily health metrics and sleep records over the
+requested span, a few medications with dose times and a log per scheduled
+dose, goals and appointments. Values follow plausible distributions (a
+mean-reverting weight walk, blood pressure tied to a personal baseline,
+longer sleep at weekends, per-user logging habits, per-medication adherence).
+
+Every user's data comes from a random generator seeded with the run's seed
+and the user's index, so the same seed always yields the same rows and a
+larger population only adds users. Rows are written with bulk_create, and
+each group of users is committed in one transaction together with the
+rollup and adherence-counter rebuilds that bulk inserts skip.
+"""
+
+import datetime
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from appointments.models import Appointment
+from goals.models import Goal
+from health.models import HealthMetric
+from health.rollups import rebuild_daily_rollups
+from healthy_you.cache import invalidate_dashboards
+from medications.adherence import rebuild_adherence_counters
+from medications.models import Medication, MedicationDoseTime, MedicationLog, parse_recurring_days
+from medications.schedule import occurrences
+from sleep.models import SleepRecord
+
+DEFAULT_PASSWORD = 'synthetic-password'
+
+MEDICATION_NAMES = (
+    'Lisinopril', 'Metformin', 'Atorvastatin', 'Levothyroxine', 'Amlodipine', 'Omeprazole',
+    'Sertraline', 'Vitamin D', 'Metoprolol', 'Losartan', 'Albuterol', 'Gabapentin',
+)
+DOSING_SCHEDULES = ('Take with food', 'Take on an empty stomach', 'Take with water', '')
+APPOINTMENT_TITLES = ('Annual physical', 'Dental cleaning', 'Cardiology follow-up', 'Eye exam', 'Lab work', 'Physiotherapy')
+LOCATIONS = ('City Clinic', 'Main Street Medical', 'University Hospital', 'Telehealth', '')
+
+# (frequency, relative weight, scheduled times per dose set)
+FREQUENCIES = (
+    ('daily', 0.7, ((8, 0),)),
+    ('daily', 0.15, ((8, 0), (20, 0))),
+    ('weekly', 0.1, ((9, 0),)),
+    ('monthly', 0.05, ((9, 0),)),
+)
+WEEKLY_DAYS = ('', 'Mon', 'Mon,Thu', 'Tue,Fri', 'Sat')
+
+
+class Population:
+    """
+    Counts of what a generate() run wrote, keyed by model name.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, name, count):
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def __str__(self):
+        return ', '.join(f"{count} {name}" for name, count in self.counts.items())
+
+
+def _label(model):
+    return str(model._meta.verbose_name_plural).lower()
+
+
+def _clip(value, low, high):
+    return max(low, min(high, value))
+
+
+def _maybe(rng, probability, value):
+    """
+    Return value, or None with the given probability (a reading the user skipped).
+    """
+    return None if rng.random() < probability else value
+
+
+def user_rng(seed, index):
+    """
+    Return the random generator for one user. String seeds hash deterministically.
+    """
+    return random.Random(f"{seed}:{index}")
+
+
+def health_rows(rng, user_id, start, end):
+    """
+    Yield one user's HealthMetric rows, one per logged day.
+    """
+    baseline_weight = _clip(rng.gauss(78, 14), 45, 160)
+    systolic_base = _clip(rng.gauss(120, 12), 95, 170)
+    resting_hr = _clip(rng.gauss(68, 8), 48, 100)
+    calories_base = _clip(rng.gauss(2200, 350), 1300, 3800)
+    activity_base = rng.choice((10, 25, 40, 60))
+    log_rate = rng.uniform(0.55, 0.98)  # Share of days the user records anything
+    skip_rate = rng.uniform(0.05, 0.3)  # Chance each optional reading is left blank
+
+    weight = baseline_weight
+    day = start
+    while day <= end:
+        # Weight drifts day to day but is pulled back toward the user's baseline
+        weight += rng.gauss(0, 0.25) + (baseline_weight - weight) * 0.02
+        if rng.random() < log_rate:
+            systolic = round(rng.gauss(systolic_base, 7))
+            weekend = day.weekday() >= 5
+            yield HealthMetric(
+                user_id=user_id,
+                date=day,
+                weight=round(weight, 1),
+                blood_pressure_systolic=_maybe(rng, skip_rate, systolic),
+                blood_pressure_diastolic=_maybe(rng, skip_rate, round(systolic * 0.65 + rng.gauss(0, 5))),
+                heart_rate=_maybe(rng, skip_rate, round(rng.gauss(resting_hr, 5))),
+                calories_intake=_maybe(rng, skip_rate, round(rng.gauss(calories_base + (250 if weekend else 0), 300))),
+                physical_activity_minutes=_maybe(rng, skip_rate, round(rng.expovariate(1 / activity_base))),
+            )
+        day += datetime.timedelta(days=1)
+
+
+def sleep_rows(rng, user_id, start, end):
+    """
+    Yield one user's SleepRecord rows, one per logged night.
+    """
+    typical = _clip(rng.gauss(7.1, 0.7), 5, 9.5)
+    log_rate = rng.uniform(0.5, 0.97)
+
+    day = start
+    while day <= end:
+        if rng.random() < log_rate:
+            duration = _clip(rng.gauss(typical + (0.6 if day.weekday() >= 5 else 0), 0.9), 2.5, 12)
+            quality = round(_clip(3 + (duration - typical) * 0.8 + rng.gauss(0, 0.8), 1, 5))
+            yield SleepRecord(user_id=user_id, date=day, duration=round(duration, 2), quality=quality)
+        day += datetime.timedelta(days=1)
+
+
+def medication_plans(rng, user_id, start, end):
+    """
+    Return [(Medication, [MedicationDoseTime, ...]), ...] for one user (unsaved).
+    """
+    count = rng.choices((0, 1, 2, 3, 4), weights=(0.3, 0.3, 0.2, 0.15, 0.05))[0]
+    span = (end - start).days
+    plans = []
+    for name in rng.sample(MEDICATION_NAMES, count):
+        frequency, _, times = rng.choices(FREQUENCIES, weights=[weight for _, weight, _ in FREQUENCIES])[0]
+        medication = Medication(
+            user_id=user_id,
+            name=name,
+            frequency=frequency,
+            start_date=start + datetime.timedelta(days=rng.randint(0, max(span * 2 // 3, 0))),
+            dosing_schedule=rng.choice(DOSING_SCHEDULES),
+        )
+        recurring_days = rng.choice(WEEKLY_DAYS) if frequency == 'weekly' else ''
+        doses = [
+            MedicationDoseTime(
+                scheduled_time=datetime.time(hour, minute),
+                recurring_days=recurring_days,
+                # bulk_create skips save(), which normally compiles the mask
+                recurring_mask=parse_recurring_days(recurring_days),
+            )
+            for hour, minute in times
+        ]
+        plans.append((medication, doses))
+    return plans
+
+
+def log_rows(rng, medication, dose, end):
+    """
+    Yield a MedicationLog for every scheduled dose up to `end`, following the
+    user's adherence: recent doses are often still unrecorded.
+    """
+    adherence = rng.uniform(0.6, 0.98)
+    for day in occurrences(medication, dose, medication.start_date, end):
+        if (end - day).days < 2 and rng.random() < 0.5:
+            status = 'not_recorded'
+        else:
+            status = 'taken' if rng.random() < adherence else rng.choice(('not_taken', 'not_recorded'))
+        yield MedicationLog(medication_id=medication.pk, dose_time_id=dose.pk, date=day, status=status)
+
+
+def goal_rows(rng, user_id, end):
+    """
+    Return one user's goals, at most one per goal type.
+    """
+    targets = {
+        'weight': (lambda: round(rng.uniform(120, 220)), 'min'),
+        'calories': (lambda: rng.choice((1800, 2000, 2200, 2500)), 'min'),
+        'activity': (lambda: rng.choice((20, 30, 45, 60)), 'max'),
+        'sleep': (lambda: rng.choice((7, 7.5, 8)), 'max'),
+    }
+    goals = []
+    for goal_type in rng.sample(sorted(targets), rng.randint(0, 4)):
+        target, comparison = targets[goal_type]
+        due_date = end + datetime.timedelta(days=rng.randint(14, 365)) if rng.random() < 0.7 else None
+        goals.append(Goal(user_id=user_id, goal_type=goal_type, target_value=target(), comparison=comparison, due_date=due_date))
+    return goals
+
+
+def appointment_rows(rng, user_id, start, end):
+    """
+    Return one user's appointments: about six a year over the span plus a few
+    upcoming ones. Past appointments are mostly attended.
+    """
+    span = (end - start).days
+    count = max(1, round(rng.gauss(6 * span / 365, 2)))
+    appointments = []
+    for _ in range(count + rng.randint(0, 3)):
+        day = start + datetime.timedelta(days=rng.randint(0, span + 90))
+        if day > end:
+            status = 'pending'
+        else:
+            status = 'attended' if rng.random() < 0.85 else 'missed'
+        appointments.append(Appointment(
+            user_id=user_id,
+            title=rng.choice(APPOINTMENT_TITLES),
+            appointment_date=day,
+            appointment_time=datetime.time(rng.randint(8, 16), rng.choice((0, 15, 30, 45))),
+            location=rng.choice(LOCATIONS),
+            status=status,
+        ))
+    return appointments
+
+
+class _Writer:
+    """
+    Buffers unsaved instances per model and bulk-inserts them batch_size at a time.
+    """
+
+    def __init__(self, population, batch_size):
+        self.population = population
+        self.batch_size = batch_size
+        self.pending = {}
+
+    def add(self, instance):
+        batch = self.pending.setdefault(type(instance), [])
+        batch.append(instance)
+        if len(batch) >= self.batch_size:
+            self.flush(type(instance))
+
+    def flush(self, model=None):
+        for current in ([model] if model else list(self.pending)):
+            batch = self.pending.pop(current, [])
+            if batch:
+                current.objects.bulk_create(batch, batch_size=self.batch_size)
+                self.population.add(_label(current), len(batch))
+
+
+def generate(users=10, years=1.0, seed=42, end=None, prefix='synthetic', batch_size=5000,
+             users_per_transaction=50, progress=None):
+    """
+    Create `users` synthetic users with `years` of history ending at `end`
+    (default today) and return a Population of what was written. Usernames
+    are <prefix>-<index>; all users share DEFAULT_PASSWORD. progress, if
+    given, is called with the number of users written after each group.
+    """
+    end = end or datetime.date.today()
+    start = end - datetime.timedelta(days=max(round(years * 365) - 1, 0))
+    password = make_password(DEFAULT_PASSWORD)  # Hashing once rather than per user
+    population = Population()
+    writer = _Writer(population, batch_size)
+
+    for first in range(0, users, users_per_transaction):
+        indexes = range(first, min(first + users_per_transaction, users))
+        with transaction.atomic():
+            accounts = User.objects.bulk_create([
+                User(username=f"{prefix}-{index:06d}", password=password, email=f"{prefix}-{index:06d}@example.com")
+                for index in indexes
+            ])
+            population.add(_label(User), len(accounts))
+
+            medications, dose_lists, owners = [], [], []
+            for index, account in zip(indexes, accounts):
+                rng = user_rng(seed, index)
+                for instance in health_rows(rng, account.pk, start, end):
+                    writer.add(instance)
+                for instance in sleep_rows(rng, account.pk, start, end):
+                    writer.add(instance)
+                for medication, doses in medication_plans(rng, account.pk, start, end):
+                    medications.append(medication)
+                    dose_lists.append(doses)
+                    owners.append(index)
+                for instance in goal_rows(rng, account.pk, end):
+                    writer.add(instance)
+                for instance in appointment_rows(rng, account.pk, start, end):
+                    writer.add(instance)
+
+            # Medications and dose times need primary keys before their logs can refer to them
+            Medication.objects.bulk_create(medications, batch_size=batch_size)
+            for medication, doses in zip(medications, dose_lists):
+                for dose in doses:
+                    dose.medication_id = medication.pk
+            MedicationDoseTime.objects.bulk_create([dose for doses in dose_lists for dose in doses], batch_size=batch_size)
+            population.add(_label(Medication), len(medications))
+            population.add(_label(MedicationDoseTime), sum(len(doses) for doses in dose_lists))
+
+            for index, medication, doses in zip(owners, medications, dose_lists):
+                log_rng = random.Random(f"{seed}:{index}:logs:{medication.name}")
+                for dose in doses:
+                    for instance in log_rows(log_rng, medication, dose, end):
+                        writer.add(instance)
+            writer.flush()
+
+            # bulk_create skips the signals that keep these derived tables current
+            user_ids = [account.pk for account in accounts]
+            rebuild_daily_rollups(user_ids=user_ids, batch_size=batch_size)
+            if medications:
+                rebuild_adherence_counters(medication_ids=[medication.pk for medication in medications], batch_size=batch_size)
+            for user_id in user_ids:
+                invalidate_dashboards(user_id)
+
+        if progress is not None:
+            progress(indexes.stop)
+    return population
+
+
+def clear(prefix='synthetic', users_per_transaction=50):
+    """
+    Delete every user created by generate() with this prefix, and their data,
+    a group of users at a time. Returns the number of users deleted.
+    """
+    users = User.objects.filter(username__startswith=f"{prefix}-")
+    deleted = 0
+    while True:
+        ids = list(users.values_list('pk', flat=True)[:users_per_transaction])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            User.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
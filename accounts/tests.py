@@ -1,6 +1,22 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import zipfile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.urls import reverse
+from appointments.models import Appointment, AppointmentOverride
+from goals.models import Goal
+from healthy_you.cache import get_data_version
+from health.imports import import_health_metrics
+from health.models import HealthDailyRollup, HealthMetric
+from medications.models import Medication, MedicationAdherenceCounter, MedicationDoseTime, MedicationLog
+from sleep.models import SleepRecord
 
 
 class AccountsAppTests(TestCase):
@@ -103,3 +119,329 @@ class AccountsAppTests(TestCase):
         response = self.client.get(reverse('dashboard'))  # Attempt to access dashboard without login
         self.assertEqual(response.status_code, 302)  # Should redirect to login page
         self.assertRedirects(response, f"{reverse('login')}?next={reverse('dashboard')}")  # Login redirection with next
+
+
+class DataImportTests(TestCase):
+    """
+    Test cases for the bulk CSV/NDJSON import view and management command.
+    """
+
+    HEALTH_CSV = (
+        "date,weight,weight_unit,blood_pressure_systolic,blood_pressure_diastolic,heart_rate\n"
+        "2024-01-01,154.32,lbs,120,80,60\n"
+        "2024-01-02,71,,,,\n"
+        "not-a-date,70,kg,,,\n"
+        "2024-01-03,,kg,,,\n"
+        "2024-01-03,70,stone,,,\n"
+        "01/04/2024,72,kg,,,\n"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='password123')
+        self.client.login(username='importer', password='password123')
+
+    def upload(self, kind, name, content, **data):
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post(reverse('import_data'), {'kind': kind, 'file': upload, **data})
+
+    def test_health_csv_upload(self):
+        """
+        Test that valid rows are imported with the form's lbs conversion and bad rows are reported by line.
+        """
+        response = self.upload('health', 'metrics.csv', self.HEALTH_CSV)
+        self.assertEqual(response.status_code, 200)
+        report = response.context['report']
+        self.assertEqual((report.created, report.rejected), (3, 3))
+        self.assertEqual([line for line, _ in report.errors], [4, 5, 6])
+        self.assertIn('weight_unit', report.errors[2][1])
+
+        weights = list(HealthMetric.objects.filter(user=self.user).order_by('date').values_list('weight', flat=True))
+        self.assertAlmostEqual(weights[0], 70, places=2)
+        self.assertEqual(weights[1:], [71, 72])
+        # bulk_create skips signals, so rollups are rebuilt after the import
+        self.assertEqual(HealthDailyRollup.objects.filter(user=self.user).count(), 3)
+
+    def test_sleep_ndjson_upload(self):
+        """
+        Test that NDJSON sleep records are imported and malformed lines are rejected.
+        """
+        lines = [
+            json.dumps({'date': '2024-01-01', 'duration': 7.5, 'quality': 4}),
+            '',
+            '{broken',
+            json.dumps({'date': '2024-01-02', 'duration': 8, 'quality': 9}),
+            json.dumps(['not', 'an', 'object']),
+        ]
+        response = self.upload('sleep', 'sleep.ndjson', '\n'.join(lines))
+        report = response.context['report']
+        self.assertEqual((report.created, report.rejected), (1, 3))
+        self.assertEqual([line for line, _ in report.errors], [3, 4, 5])
+        self.assertEqual(SleepRecord.objects.get(user=self.user).duration, 7.5)
+
+    def test_import_is_chunked(self):
+        """
+        Test that rows are committed in transaction-sized chunks.
+        """
+        rows = ''.join(f"2023-{month:02d}-{day:02d},70\n" for month in range(1, 13) for day in range(1, 29))
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write("date,weight\n" + rows)
+        self.addCleanup(os.remove, handle.name)
+        out = io.StringIO()
+        with self.assertNumQueries(47):
+            # One user lookup, then per 50 rows a transaction of two inserts (SAVEPOINT, 2 INSERTs, RELEASE),
+            # then the rollup rebuild (SAVEPOINT, DELETE, SELECT, 14 batches of 25 INSERTs, RELEASE)
+            call_command(
+                'import_data', handle.name, user='importer', kind='health',
+                batch_size=25, transaction_rows=50, stdout=out,
+            )
+        self.assertIn('336 rows imported, 0 rejected', out.getvalue())
+        self.assertEqual(HealthMetric.objects.filter(user=self.user).count(), 336)
+
+    def test_failed_chunk_keeps_earlier_chunks_consistent(self):
+        """
+        Test that when a later chunk fails, the chunks already committed still
+        get their rollups and invalidate the user's dashboards.
+        """
+        version = get_data_version(self.user.pk)
+        # The second chunk holds a heart rate the form accepts but SQLite cannot store
+        rows = f"date,weight,heart_rate\n2024-01-01,70,60\n2024-01-02,71,61\n2024-01-03,72,{10 ** 20}\n"
+        with self.assertRaises(OverflowError):
+            import_health_metrics(io.StringIO(rows), self.user, transaction_rows=2)
+        self.assertEqual(HealthMetric.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(HealthDailyRollup.objects.filter(user=self.user).count(), 2)
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+
+    def test_requires_login(self):
+        """
+        Test that anonymous users are redirected to the login page.
+        """
+        self.client.logout()
+        response = self.client.get(reverse('import_data'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('import_data')}")
+
+
+class DataExportTests(TestCase):
+    """
+    Test cases for the streaming data export views and benchmark command.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='password123')
+        self.client.login(username='exporter', password='password123')
+        self.today = datetime.date(2024, 3, 1)
+        HealthMetric.objects.create(user=self.user, date=self.today, weight=70, heart_rate=60)
+        HealthMetric.objects.create(user=self.user, date=self.today - datetime.timedelta(days=1), weight=71)
+        SleepRecord.objects.create(user=self.user, date=self.today, duration=7.5, quality=4)
+        medication = Medication.objects.create(user=self.user, name='Med, "A"', frequency='daily', start_date=self.today)
+        MedicationDoseTime.objects.create(medication=medication, scheduled_time=datetime.time(8, 0))
+
+        other = User.objects.create_user(username='other', password='password123')
+        HealthMetric.objects.create(user=other, date=self.today, weight=90)
+
+    def download(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        """
+        Test that a dataset streams as CSV in date order with only the user's rows.
+        """
+        response = self.client.get(reverse('export_dataset', args=['health_metrics', 'csv']))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="health_metrics.csv"')
+        rows = list(csv.DictReader(io.StringIO(self.download(response).decode('utf-8'))))
+        self.assertEqual([row['weight'] for row in rows], ['71.0', '70.0'])
+        self.assertEqual(rows[0]['heart_rate'], '')
+
+        rows = list(csv.reader(io.StringIO(self.download(
+            self.client.get(reverse('export_dataset', args=['medications', 'csv']))
+        ).decode('utf-8'))))
+        self.assertEqual(rows[1][1], 'Med, "A"')
+
+    def test_ndjson_export(self):
+        """
+        Test that a dataset streams as one JSON object per line.
+        """
+        response = self.client.get(reverse('export_dataset', args=['sleep_records', 'ndjson']))
+        lines = self.download(response).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': SleepRecord.objects.get().pk, 'date': '2024-03-01', 'duration': 7.5, 'quality': 4},
+        ])
+        self.assertEqual(self.client.get(reverse('export_dataset', args=['users', 'csv'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_dataset', args=['goals', 'xml'])).status_code, 404)
+
+    def test_zip_bundle(self):
+        """
+        Test that the bundle holds one readable file per dataset.
+        """
+        content = self.download(self.client.get(reverse('export_bundle')))
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(archive.namelist(), [
+                'health_metrics.csv', 'sleep_records.csv', 'medications.csv', 'medication_dose_times.csv',
+                'medication_logs.csv', 'goals.csv', 'appointments.csv', 'appointment_overrides.csv',
+            ])
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(len(archive.read('health_metrics.csv').decode('utf-8').splitlines()), 3)
+            self.assertIn('08:00:00', archive.read('medication_dose_times.csv').decode('utf-8'))
+
+    def test_recurring_appointments_and_overrides(self):
+        """
+        Test that recurrence rules and changed occurrences are exported with their appointment.
+        """
+        series = Appointment.objects.create(
+            user=self.user, title='Therapy', appointment_date=self.today, appointment_time=datetime.time(9, 0),
+            recurrence='FREQ=WEEKLY;COUNT=4',
+        )
+        AppointmentOverride.objects.create(appointment=series, date=self.today + datetime.timedelta(days=7), cancelled=True)
+        AppointmentOverride.objects.create(
+            appointment=series, date=self.today + datetime.timedelta(days=14),
+            rescheduled_time=datetime.time(11, 0), status='attended',
+        )
+        other_series = Appointment.objects.create(
+            user=User.objects.get(username='other'), title='Elsewhere', appointment_date=self.today,
+            appointment_time=datetime.time(9, 0), recurrence='FREQ=DAILY',
+        )
+        AppointmentOverride.objects.create(appointment=other_series, date=self.today, cancelled=True)
+
+        lines = self.download(self.client.get(reverse('export_dataset', args=['appointments', 'ndjson'])))
+        appointment = json.loads(lines.decode('utf-8').splitlines()[0])
+        self.assertEqual((appointment['recurrence'], appointment['recurrence_end']), ('FREQ=WEEKLY;COUNT=4', '2024-03-22'))
+
+        lines = self.download(self.client.get(reverse('export_dataset', args=['appointment_overrides', 'ndjson'])))
+        self.assertEqual([json.loads(line) for line in lines.decode('utf-8').splitlines()], [
+            {'id': override.pk, 'appointment_id': series.pk, 'date': f"{override.date:%Y-%m-%d}",
+             'cancelled': override.cancelled, 'status': override.status, 'rescheduled_date': None,
+             'rescheduled_time': override.rescheduled_time and f"{override.rescheduled_time:%H:%M:%S}"}
+            for override in series.overrides.order_by('date')
+        ])
+
+    def test_export_requires_login(self):
+        """
+        Test that anonymous users are redirected to the login page.
+        """
+        self.client.logout()
+        response = self.client.get(reverse('export_bundle'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('export_bundle')}")
+
+    def test_benchmark_command(self):
+        """
+        Test that the export benchmark runs and leaves no synthetic data behind.
+        """
+        out = io.StringIO()
+        call_command('benchmark_export', rows=[50, 100], batch_size=40, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 6)
+        self.assertFalse(User.objects.filter(username__startswith='export-benchmark-').exists())
+
+
+class SyntheticDataTests(TestCase):
+    """
+    Test cases for the synthetic population generator and seed command.
+    """
+
+    END = datetime.date(2024, 6, 30)
+
+    def generate(self, *args):
+        out = io.StringIO()
+        call_command(
+            'generate_synthetic_data', '--users', '3', '--years', '0.25', '--end-date', self.END.isoformat(),
+            '--users-per-transaction', '2', '--batch-size', '100', *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def snapshot(self):
+        """
+        Return the generated data without database IDs or timestamps, for comparing runs.
+        """
+        return (
+            list(HealthMetric.objects.order_by('user__username', 'date').values_list(
+                'user__username', 'date', 'weight', 'blood_pressure_systolic', 'heart_rate', 'calories_intake')),
+            list(SleepRecord.objects.order_by('user__username', 'date').values_list('user__username', 'date', 'duration', 'quality')),
+            list(MedicationLog.objects.order_by('medication__user__username', 'medication__name', 'date').values_list(
+                'medication__user__username', 'medication__name', 'date', 'status')),
+            list(Goal.objects.order_by('user__username', 'goal_type').values_list('user__username', 'goal_type', 'target_value')),
+            list(Appointment.objects.order_by('user__username', 'appointment_date', 'appointment_time').values_list(
+                'user__username', 'appointment_date', 'status')),
+        )
+
+    def test_population(self):
+        """
+        Test that users get bounded daily history and consistent derived tables.
+        """
+        output = self.generate()
+        self.assertIn('3 users', output)
+        users = User.objects.filter(username__startswith='synthetic-')
+        self.assertEqual(users.count(), 3)
+        self.assertTrue(self.client.login(username='synthetic-000000', password='synthetic-password'))
+
+        first_day = self.END - datetime.timedelta(days=90)
+        for user in users:
+            dates = list(HealthMetric.objects.filter(user=user).values_list('date', flat=True))
+            self.assertTrue(dates)
+            self.assertTrue(all(first_day <= date <= self.END for date in dates))
+            self.assertEqual(len(set(dates)), len(dates))
+            # Rollups and counters are rebuilt although bulk_create skips the signals
+            self.assertEqual(HealthDailyRollup.objects.filter(user=user).count(), len(dates))
+
+        self.assertEqual(
+            sum(MedicationAdherenceCounter.objects.values_list('taken', flat=True)),
+            MedicationLog.objects.filter(status='taken').count(),
+        )
+        for dose in MedicationDoseTime.objects.exclude(recurring_days=''):
+            self.assertNotEqual(dose.recurring_mask, 0)
+
+    def test_same_seed_same_data(self):
+        """
+        Test that regenerating with the same seed reproduces the data and --clear replaces it.
+        """
+        self.generate()
+        first = self.snapshot()
+        self.generate('--clear')
+        self.assertEqual(User.objects.filter(username__startswith='synthetic-').count(), 3)
+        self.assertEqual(self.snapshot(), first)
+
+        self.generate('--clear', '--seed', '7')
+        self.assertNotEqual(self.snapshot(), first)
+
+
+class DashboardBenchmarkTests(TestCase):
+    """
+    Test cases for the dashboard benchmark suite and its stored budgets.
+    """
+
+    def benchmark(self, *args):
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command(
+                'benchmark_dashboards', '--profile', 'small', '--repeat', '1', '--output', output.name,
+                *args, stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+            return json.load(output)
+
+    def test_small_profile_within_budgets(self):
+        """
+        Test that every dashboard stays within its stored query-count and size budgets.
+        """
+        report = self.benchmark('--skip-timing')
+        self.assertTrue(report['passed'], [result for result in report['results'] if result['violations']])
+        self.assertEqual(len(report['results']), 14)
+        self.assertEqual(
+            {key for key in report['results'][0]},
+            {'profile', 'dashboard', 'mode', 'wall_ms', 'sql_ms', 'queries', 'bytes', 'budget', 'violations'},
+        )
+        # The synthetic data is rolled back
+        self.assertFalse(User.objects.filter(username__startswith='benchmark-').exists())
+
+    def test_exceeded_budget_fails(self):
+        """
+        Test that a result over budget is reported and fails the command unless --no-fail is given.
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as budgets:
+            json.dump({'small': {'health': {'cold': {'max_queries': 1}}}}, budgets)
+        self.addCleanup(os.remove, budgets.name)
+        with self.assertRaises(CommandError):
+            self.benchmark('--budgets', budgets.name, '--dashboard', 'health')
+
+        report = self.benchmark('--budgets', budgets.name, '--dashboard', 'health', '--no-fail')
+        self.assertFalse(report['passed'])
+        cold, warm = report['results']
+        self.assertEqual(cold['violations'], [f"queries {cold['queries']} > 1"])
+        self.assertEqual(warm['violations'], [])
@@ -18,5 +18,13 @@ urlpatterns = [
 
     # User Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),  # Route for user dashboard
+
+    # Bulk import of historical health and sleep data
+    path('import/', views.import_data, name='import_data'),
+
+    # Streaming export of all of a user's data
+    path('export/', views.export_data, name='export_data'),
+    path('export/all.zip', views.export_bundle, name='export_bundle'),
+    path('export/<str:dataset>.<str:fmt>', views.export_dataset, name='export_dataset'),
     path('password_reset/', auth_views.PasswordResetView.as_view(), name='password_reset'),
 ]
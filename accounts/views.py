@@ -1,8 +1,15 @@
+import datetime
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from healthy_you.exporter import CONTENT_TYPES, ENCODERS, zip_stream
+from healthy_you.importer import detect_format, text_stream
+from .exports import EXPORTS
+from .forms import DataImportForm
+from .imports import IMPORTERS
 
 # View for Homepage
 def homepage(request):
@@ -83,3 +90,78 @@ def dashboard(request):
     Render the user's dashboard. Requires the user to be logged in.
     """
     return render(request, 'accounts/dashboard.html')  # Render the dashboard template
+
+
+# View for bulk-importing historical data (requires authentication)
+@login_required
+def import_data(request):
+    """
+    Import an uploaded CSV or NDJSON file of health metrics or sleep records
+    for the logged-in user, then show how many rows were imported and which
+    were rejected. Large uploads are spooled to disk by Django and read
+    incrementally, so memory use does not grow with the file.
+    """
+    report = None
+    if request.method == 'POST':
+        form = DataImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = form.cleaned_data['format'] or detect_format(upload.name)
+            stream = text_stream(upload.file)
+            try:
+                report = IMPORTERS[form.cleaned_data['kind']](stream, request.user, fmt)
+            except UnicodeDecodeError:
+                form.add_error('file', "The file must be UTF-8 encoded text.")
+            finally:
+                stream.detach()  # Leave closing the upload to Django
+    else:
+        form = DataImportForm()
+
+    return render(request, 'accounts/import_data.html', {'form': form, 'report': report})
+
+
+# Views for exporting all of a user's data (require authentication)
+@login_required
+def export_data(request):
+    """
+    List the datasets the user can download, each as CSV or NDJSON, and the zip bundle of all of them.
+    """
+    return render(request, 'accounts/export_data.html', {'datasets': list(EXPORTS)})
+
+
+def _download(stream, filename, content_type):
+    """
+    Wrap a byte iterator in a streaming attachment response.
+    """
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def export_dataset(request, dataset, fmt):
+    """
+    Stream one of the user's datasets as CSV or NDJSON.
+    """
+    if dataset not in EXPORTS or fmt not in ENCODERS:
+        raise Http404("Unknown export.")
+    rows, fields = EXPORTS[dataset]
+    return _download(ENCODERS[fmt](rows(request.user), fields), f"{dataset}.{fmt}", CONTENT_TYPES[fmt])
+
+
+@login_required
+def export_bundle(request):
+    """
+    Stream every dataset of the user as a zip of CSV files (or NDJSON with ?format=ndjson).
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ENCODERS:
+        raise Http404("Unknown export format.")
+    encode = ENCODERS[fmt]
+    # Each member's rows are only queried once the archive reaches that member
+    members = (
+        (f"{dataset}.{fmt}", encode(rows(request.user), fields))
+        for dataset, (rows, fields) in EXPORTS.items()
+    )
+    filename = f"healthy_you_{request.user.username}_{datetime.date.today():%Y%m%d}.zip"
+    return _download(zip_stream(members), filename, CONTENT_TYPES['zip'])
@@ -0,0 +1,69 @@
+import datetime
+from rest_framework import serializers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from healthy_you.api import user_data_condition
+from healthy_you.replicas import replica_reads
+from .occurrences import occurrences
+
+# Longest window one request may ask for; FullCalendar's views span at most six weeks
+MAX_WINDOW_DAYS = 400
+
+
+class CalendarDateField(serializers.Field):
+    """
+    A date sent by FullCalendar, which may be a plain date or an ISO datetime
+    with an offset ("2024-01-28T00:00:00+01:00"); only the date part is used.
+    """
+
+    def to_internal_value(self, data):
+        try:
+            return datetime.date.fromisoformat(str(data)[:10])
+        except ValueError:
+            raise serializers.ValidationError("Enter a date in YYYY-MM-DD format.")
+
+
+class EventWindowSerializer(serializers.Serializer):
+    """
+    Validates the start (inclusive) and end (exclusive) of a calendar event request.
+    """
+    start = CalendarDateField()
+    end = CalendarDateField()
+
+    def validate(self, attrs):
+        if attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError("start must be before end.")
+        if (attrs['end'] - attrs['start']).days > MAX_WINDOW_DAYS:
+            raise serializers.ValidationError(f"The window may span at most {MAX_WINDOW_DAYS} days.")
+        return attrs
+
+
+@user_data_condition()
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def appointment_events(request):
+    """
+    Return the logged-in user's appointments between ?start= and ?end= as
+    FullCalendar events. These are the parameters FullCalendar sends for the
+    visible range, so only that range is read, through the user/date index,
+    and recurring appointments are expanded for that range only.
+    """
+    serializer = EventWindowSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    window = serializer.validated_data
+
+    events = []
+    for occurrence in occurrences(request.user, window['start'], window['end']):
+        event = {
+            'id': occurrence.appointment.id,
+            'title': occurrence.appointment.title,
+            'start': occurrence.starts_at.isoformat(),
+            'status': occurrence.status,
+        }
+        if occurrence.appointment.recurrence:
+            # Identifies the occurrence within its series, e.g. to override it
+            event['occurrence'] = occurrence.date.isoformat()
+        events.append(event)
+    return Response(events)
@@ -8,3 +8,9 @@ class AppointmentsConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'  # Use BigAutoField for auto-generated primary keys
     name = 'appointments'  # The name of the app, matching the directory name
+
+    def ready(self):
+        """
+        Connect the signal handlers that invalidate cached dashboards.
+        """
+        from . import signals  # noqa: F401
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Appointment
+from .models import Appointment, AppointmentOverride
 
 
 class AppointmentForm(forms.ModelForm):
@@ -11,10 +11,29 @@ class AppointmentForm(forms.ModelForm):
     class Meta:
         model = Appointment  # Specify the model the form is based on
         fields = ['title', 'description', 'appointment_date', 'appointment_time', 'location',
-                  'status']  # Explicitly define the fields to include in the form
+                  'status', 'recurrence']  # Explicitly define the fields to include in the form
 
         # Add custom widgets for better user input experience
         widgets = {
             'appointment_date': forms.DateInput(attrs={'type': 'date'}),  # Render a modern HTML5 date picker
             'appointment_time': forms.TimeInput(attrs={'type': 'time'}),  # Render a modern HTML5 time picker
+            'recurrence': forms.TextInput(attrs={'placeholder': 'FREQ=WEEKLY;BYDAY=MO;COUNT=12'}),
+        }
+
+
+class AppointmentOverrideForm(forms.ModelForm):
+    """
+    A form for cancelling, moving or setting the status of one occurrence of a
+    recurring appointment. The view sets the appointment on the instance, so
+    validation checks that the date is one of its occurrences.
+    """
+
+    class Meta:
+        model = AppointmentOverride
+        fields = ['date', 'cancelled', 'status', 'rescheduled_date', 'rescheduled_time']
+
+        widgets = {
+            'date': forms.DateInput(attrs={'type': 'date'}),
+            'rescheduled_date': forms.DateInput(attrs={'type': 'date'}),
+            'rescheduled_time': forms.TimeInput(attrs={'type': 'time'}),
         }
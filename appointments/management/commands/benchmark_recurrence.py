@@ -0,0 +1,113 @@
+import datetime
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from appointments import rules
+from appointments.models import Appointment, AppointmentOverride
+from appointments.occurrences import occurrences
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares calendar window queries over lazily expanded recurring appointments with the same "
+        "queries over one materialized row per occurrence. Everything is created inside a transaction "
+        "that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--series', type=int, default=20, help="Number of weekly series per user.")
+        parser.add_argument('--years', type=int, default=5, help="Years the series have been running.")
+        parser.add_argument('--weeks', type=int, default=6, help="Weeks in each calendar window.")
+        parser.add_argument('--override-every', type=int, default=10, help="Override one occurrence in this many.")
+        parser.add_argument('--repeat', type=int, default=200, help="Window queries per measurement.")
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        first_day = today - datetime.timedelta(days=365 * options['years'])
+        windows = {
+            'oldest': first_day,
+            'current': today - datetime.timedelta(weeks=options['weeks'] // 2),
+        }
+        with transaction.atomic():
+            lazy_user, materialized_user = self._populate(first_day, today, options)
+            self.stdout.write(
+                f"rows: {Appointment.objects.filter(user=lazy_user).count()} appointments + "
+                f"{AppointmentOverride.objects.filter(appointment__user=lazy_user).count()} overrides (lazy), "
+                f"{Appointment.objects.filter(user=materialized_user).count()} appointments (materialized)"
+            )
+            for name, start in windows.items():
+                end = start + datetime.timedelta(weeks=options['weeks'])
+
+                def lazy():
+                    return occurrences(lazy_user, start, end)
+
+                def materialized():
+                    return self._materialized_window(materialized_user, start, end)
+
+                expanded = sorted((o.starts_at, o.appointment.title, o.status) for o in lazy())
+                stored = sorted(
+                    (datetime.datetime.combine(day, at), title, status)
+                    for _, title, day, at, status in materialized()
+                )
+                if expanded != stored:
+                    raise AssertionError(f"{name} window: the lazy and materialized occurrences differ")
+                rules.parse_rule.cache_clear()
+                cold = self._measure(lazy, 1)
+                self.stdout.write(
+                    f"{name:<8} window  {len(expanded):>4} occurrences  "
+                    f"lazy {self._measure(lazy, options['repeat']):7.2f} ms (first {cold:.2f} ms)  "
+                    f"materialized {self._measure(materialized, options['repeat']):7.2f} ms"
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, first_day, today, options):
+        """
+        Create a user with weekly series and sparse overrides, and a user with
+        the same occurrences stored one row each.
+        """
+        users = get_user_model().objects
+        suffix = time.time_ns()
+        lazy_user = users.create_user(username=f"recurrence-benchmark-lazy-{suffix}")
+        materialized_user = users.create_user(username=f"recurrence-benchmark-rows-{suffix}")
+        # Leave every window's overrides in place by running the series a year past today
+        last_day = today + datetime.timedelta(days=365)
+        rows, overrides = [], []
+        for number in range(options['series']):
+            series = Appointment.objects.create(
+                user=lazy_user, title=f"Series {number}", appointment_date=first_day + datetime.timedelta(days=number % 7),
+                appointment_time=datetime.time(8 + number % 10), recurrence="FREQ=WEEKLY",
+            )
+            for index, starts_at in enumerate(series.occurrences_between(first_day, last_day)):
+                if index % options['override_every'] == options['override_every'] - 1:
+                    overrides.append(AppointmentOverride(appointment=series, date=starts_at.date(), status='attended'))
+                    status = 'attended'
+                else:
+                    status = 'pending'
+                rows.append(Appointment(
+                    user=materialized_user, title=series.title, appointment_date=starts_at.date(),
+                    appointment_time=starts_at.time(), status=status,
+                ))
+        AppointmentOverride.objects.bulk_create(overrides, batch_size=1000)
+        Appointment.objects.bulk_create(rows, batch_size=1000)
+        return lazy_user, materialized_user
+
+    def _materialized_window(self, user, start, end):
+        """
+        The window query over materialized rows, as the event feed ran it before recurrence.
+        """
+        return list(
+            Appointment.objects
+            .filter(user=user, appointment_date__gte=start, appointment_date__lt=end)
+            .order_by('appointment_date', 'appointment_time')
+            .values_list('id', 'title', 'appointment_date', 'appointment_time', 'status')
+        )
+
+    def _measure(self, query, repeat):
+        """
+        Return the mean milliseconds per call of `query`.
+        """
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query()
+        return (time.perf_counter() - started) * 1000 / repeat
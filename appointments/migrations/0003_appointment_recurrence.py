@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:08
+
+import appointments.rules
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_appointment_appt_user_date_time_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='recurrence',
+            field=models.CharField(blank=True, help_text='Optional: repeat by an iCalendar rule, e.g. FREQ=WEEKLY;BYDAY=MO;COUNT=12', max_length=255, validators=[appointments.rules.validate_recurrence]),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='recurrence_end',
+            field=models.DateField(blank=True, editable=False, help_text='Date of the last occurrence of a bounded recurrence; empty for open-ended ones', null=True),
+        ),
+        migrations.CreateModel(
+            name='AppointmentOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Date the occurrence falls on by the recurrence rule')),
+                ('cancelled', models.BooleanField(default=False, help_text='Skip this occurrence')),
+                ('status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('attended', 'Attended'), ('missed', 'Missed')], help_text="Optional: status of this occurrence; empty to use the appointment's", max_length=10)),
+                ('rescheduled_date', models.DateField(blank=True, help_text='Optional: date this occurrence was moved to', null=True)),
+                ('rescheduled_time', models.TimeField(blank=True, help_text='Optional: time this occurrence was moved to', null=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overrides', to='appointments.appointment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['rescheduled_date'], name='appt_override_moved_idx')],
+                'constraints': [models.UniqueConstraint(fields=('appointment', 'date'), name='appt_override_unique_date')],
+            },
+        ),
+    ]
@@ -1,11 +1,16 @@
+import datetime
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from . import rules
 
 
 class Appointment(models.Model):
     """
     Model representing an appointment.
     Each appointment is linked to a user and contains details such as title, date, time, and status.
+    A recurring appointment repeats by its recurrence rule from its date and time
+    (see rules.py); its occurrences are expanded when they are shown, not stored.
     """
 
     # Choices for the appointment status
@@ -46,14 +51,129 @@ class Appointment(models.Model):
         default='pending',
         help_text="Current status of the appointment"
     )
+    recurrence = models.CharField(
+        max_length=255,
+        blank=True,
+        validators=[rules.validate_recurrence],
+        help_text="Optional: repeat by an iCalendar rule, e.g. FREQ=WEEKLY;BYDAY=MO;COUNT=12"
+    )
+    recurrence_end = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,  # Derived from the rule on save, so window queries can skip finished series
+        help_text="Date of the last occurrence of a bounded recurrence; empty for open-ended ones"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,  # Automatically set the field to the current timestamp when the object is created
         help_text="Timestamp when the appointment was created"
     )
 
+    class Meta:
+        indexes = [
+            # The dashboard lists a user's appointments in date and time order
+            models.Index(fields=['user', 'appointment_date', 'appointment_time'], name='appt_user_date_time_idx'),
+        ]
+
     def __str__(self):
         """
         String representation of the appointment.
         Example: "Doctor Visit on 2023-10-15 at 14:30"
         """
         return f"{self.title} on {self.appointment_date} at {self.appointment_time}"
+
+    def save(self, *args, **kwargs):
+        """
+        Normalize the recurrence rule and keep recurrence_end in step with it.
+        """
+        self.recurrence = rules.normalize(self.recurrence)
+        self.recurrence_end = rules.last_date(self.recurrence, self.starts_at) if self.recurrence else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'recurrence', 'appointment_date', 'appointment_time'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'recurrence', 'recurrence_end'}
+        super().save(*args, **kwargs)
+
+    @property
+    def starts_at(self):
+        """
+        The date and time of the first occurrence (the rule's DTSTART).
+        """
+        return datetime.datetime.combine(self.appointment_date, self.appointment_time)
+
+    def occurrences_between(self, start, end):
+        """
+        Return the datetimes this appointment occurs at on the dates from `start` up to (not including) `end`.
+        """
+        if self.recurrence:
+            return rules.occurrences_between(self.recurrence, self.starts_at, start, end)
+        return [self.starts_at] if start <= self.appointment_date < end else []
+
+
+class AppointmentOverride(models.Model):
+    """
+    A change to one occurrence of a recurring appointment: cancelled, moved,
+    or given its own status. Only changed occurrences have a row.
+    """
+
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.CASCADE,
+        related_name='overrides'
+    )
+    date = models.DateField(
+        help_text="Date the occurrence falls on by the recurrence rule"
+    )
+    cancelled = models.BooleanField(
+        default=False,
+        help_text="Skip this occurrence"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Appointment.STATUS_CHOICES,
+        blank=True,
+        help_text="Optional: status of this occurrence; empty to use the appointment's"
+    )
+    rescheduled_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Optional: date this occurrence was moved to"
+    )
+    rescheduled_time = models.TimeField(
+        null=True,
+        blank=True,
+        help_text="Optional: time this occurrence was moved to"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'date'], name='appt_override_unique_date'),
+        ]
+        indexes = [
+            # Occurrences moved into a calendar window are found by their new date
+            models.Index(fields=['rescheduled_date'], name='appt_override_moved_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.appointment.title} on {self.date}"
+
+    def clean(self):
+        """
+        Ensure the date is one the appointment actually occurs on.
+        """
+        if self.appointment_id is not None and self.date is not None:
+            next_day = self.date + datetime.timedelta(days=1)
+            if not self.appointment.occurrences_between(self.date, next_day):
+                raise ValidationError({'date': "The appointment does not occur on this date."})
+
+    @property
+    def is_moved(self):
+        return self.rescheduled_date is not None or self.rescheduled_time is not None
+
+    @property
+    def starts_at(self):
+        """
+        The date and time the occurrence now takes place.
+        """
+        return datetime.datetime.combine(
+            self.rescheduled_date or self.date,
+            self.rescheduled_time or self.appointment.appointment_time,
+        )
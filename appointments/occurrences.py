@@ -0,0 +1,69 @@
+"""
+Lazy expansion of a user's appointments over a calendar window.
+
+One-off appointments are rows; recurring ones are a single row whose rule is
+expanded for the window only, with AppointmentOverride rows applied to the
+few occurrences that were cancelled, moved or given their own status. A
+window costs two indexed queries (appointments and overrides) plus one rule
+expansion per series that is still running; overrides reuse the appointments
+already loaded rather than joining them again.
+"""
+
+from collections import namedtuple
+from django.db.models import Q
+from .models import Appointment, AppointmentOverride
+
+# One occurrence of an appointment: `date` is the rule's date, `starts_at` when it takes place
+Occurrence = namedtuple('Occurrence', 'appointment date starts_at status')
+
+
+def window_filter(start, end):
+    """
+    Return a filter for the appointments that may occur from `start` up to (not including) `end`.
+    """
+    one_off = Q(recurrence='', appointment_date__gte=start)
+    running = ~Q(recurrence='') & (Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=start))
+    return Q(appointment_date__lt=end) & (one_off | running)
+
+
+def occurrences(user, start, end):
+    """
+    Return the user's appointment occurrences taking place from `start` up to
+    (not including) `end`, ordered by when they start.
+    """
+    appointments = {
+        appointment.id: appointment
+        for appointment in Appointment.objects.filter(window_filter(start, end), user=user)
+    }
+    # An occurrence may be moved into or out of the window, so overrides are matched on both dates
+    overrides = list(
+        AppointmentOverride.objects
+        .filter(appointment__user=user)
+        .filter(Q(date__gte=start, date__lt=end) | Q(rescheduled_date__gte=start, rescheduled_date__lt=end))
+    )
+    owners = dict(appointments)
+    missing = {override.appointment_id for override in overrides} - owners.keys()
+    if missing:
+        # Only occurrences moved in from a series that does not otherwise occur in the window
+        owners.update(Appointment.objects.in_bulk(missing))
+    for override in overrides:
+        override.appointment = owners[override.appointment_id]
+    changed = {(override.appointment_id, override.date): override for override in overrides}
+
+    result = []
+    for appointment in appointments.values():
+        for starts_at in appointment.occurrences_between(start, end):
+            override = changed.get((appointment.id, starts_at.date()))
+            if override is None:
+                result.append(Occurrence(appointment, starts_at.date(), starts_at, appointment.status))
+            elif not (override.cancelled or override.is_moved):
+                result.append(Occurrence(appointment, override.date, starts_at, override.status or appointment.status))
+
+    # Moved occurrences are placed by their new date, wherever their rule date falls
+    for override in changed.values():
+        if override.is_moved and not override.cancelled and start <= override.starts_at.date() < end:
+            appointment = override.appointment
+            result.append(Occurrence(appointment, override.date, override.starts_at, override.status or appointment.status))
+
+    result.sort(key=lambda occurrence: (occurrence.starts_at, occurrence.appointment.id))
+    return result
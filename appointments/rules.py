@@ -0,0 +1,115 @@
+"""
+Appointment recurrence rules.
+
+A recurring appointment stores the body of an RFC 5545 RRULE (for example
+"FREQ=WEEKLY;BYDAY=MO;COUNT=12") in Appointment.recurrence, with its
+appointment_date and appointment_time as DTSTART. Occurrences are never
+stored: they are expanded with dateutil's rrule for the window being shown
+(see occurrences.py).
+
+rrule iterates from DTSTART, so a long-running series would cost one step
+per past occurrence on every request. Daily and weekly rules without COUNT
+repeat with a fixed period, so their DTSTART is moved forward by whole
+periods to just before the window first; the expansion then costs one step
+per occurrence in the window, however old the series is.
+"""
+
+import datetime
+from functools import lru_cache
+from itertools import islice
+from dateutil.rrule import rrulestr
+from django.core.exceptions import ValidationError
+
+# Frequencies an appointment may repeat at; anything finer is not an appointment schedule
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+
+# Days in one period of the frequencies whose DTSTART may be moved forward
+PERIOD_DAYS = {'DAILY': 1, 'WEEKLY': 7}
+
+# Bounded rules with more occurrences than this are treated as open-ended
+MAX_EXPANDED = 10000
+
+
+def normalize(text):
+    """
+    Return a rule in canonical form: upper case, without an "RRULE:" prefix or blanks.
+    """
+    text = ''.join(text.split()).upper()
+    return text[len('RRULE:'):] if text.startswith('RRULE:') else text
+
+
+@lru_cache(maxsize=1024)
+def rule_parts(text):
+    """
+    Return {name: value} for the parts of a normalized rule.
+    """
+    return dict(part.split('=', 1) for part in text.split(';') if '=' in part)
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(text, dtstart):
+    """
+    Return the dateutil rrule for a normalized rule starting at `dtstart`.
+    """
+    return rrulestr(text, dtstart=dtstart)
+
+
+def validate_recurrence(value):
+    """
+    Raise ValidationError unless the value is a single RRULE that repeats daily or less often.
+    """
+    text = normalize(value)
+    if not text:
+        return
+    if ':' in text or rule_parts(text).get('FREQ') not in FREQUENCIES:
+        raise ValidationError(
+            "Enter one recurrence rule repeating %(frequencies)s, e.g. FREQ=WEEKLY;BYDAY=MO;COUNT=12.",
+            params={'frequencies': ', '.join(FREQUENCIES).lower()},
+        )
+    try:
+        # Any fixed DTSTART will do: appointments are naive, so UNTIL must be naive too
+        rrulestr(text, dtstart=datetime.datetime(2000, 1, 1))
+    except ValueError as error:
+        raise ValidationError("Invalid recurrence rule: %(error)s", params={'error': error})
+
+
+def last_date(text, dtstart):
+    """
+    Return the date of a rule's last occurrence, or None when it repeats
+    indefinitely. A bounded rule without occurrences ends on its start date.
+    """
+    parts = rule_parts(text)
+    if 'COUNT' not in parts and 'UNTIL' not in parts:
+        return None
+    last = None
+    for index, last in enumerate(islice(parse_rule(text, dtstart), MAX_EXPANDED + 1)):
+        if index == MAX_EXPANDED:
+            return None
+    return last.date() if last else dtstart.date()
+
+
+def _window_dtstart(text, dtstart, start):
+    """
+    Return `dtstart` moved forward by whole periods to before the `start` date,
+    when the rule's occurrences do not depend on how many came before.
+    """
+    parts = rule_parts(text)
+    period = PERIOD_DAYS.get(parts.get('FREQ'))
+    if period is None or 'COUNT' in parts:
+        return dtstart
+    period *= int(parts.get('INTERVAL', 1))
+    # One period short of the window, so occurrences earlier on DTSTART's day are not skipped
+    periods = (start - dtstart.date()).days // period - 1
+    if periods <= 0:
+        return dtstart
+    return dtstart + datetime.timedelta(days=periods * period)
+
+
+def occurrences_between(text, dtstart, start, end):
+    """
+    Return the datetimes of a rule's occurrences on the dates from `start` up to (not including) `end`.
+    """
+    window_start = datetime.datetime.combine(start, datetime.time.min)
+    window_end = datetime.datetime.combine(end, datetime.time.min)
+    rule = parse_rule(text, _window_dtstart(text, dtstart, start))
+    return [when for when in rule.between(window_start, window_end, inc=True) if when < window_end]
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from healthy_you.cache import invalidate_dashboards, is_cascade_delete
+from .models import Appointment, AppointmentOverride
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_dashboards_on_change(sender, instance, origin=None, **kwargs):
+    """
+    Move the owner to a new dashboard data version whenever one of their appointments changes.
+    """
+    if not is_cascade_delete(sender, origin):
+        invalidate_dashboards(instance.user_id)
+
+
+@receiver(post_save, sender=AppointmentOverride)
+@receiver(post_delete, sender=AppointmentOverride)
+def invalidate_dashboards_on_override_change(sender, instance, origin=None, **kwargs):
+    """
+    Move the owner to a new dashboard data version whenever an occurrence of their appointments changes.
+    """
+    if is_cascade_delete(sender, origin):
+        return
+    if type(instance).appointment.is_cached(instance):
+        user_id = instance.appointment.user_id
+    else:
+        user_id = Appointment.objects.filter(pk=instance.appointment_id).values_list('user_id', flat=True).first()
+    invalidate_dashboards(user_id)
@@ -1,7 +1,13 @@
+from dateutil.rrule import rrulestr
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
-from .models import Appointment
+from . import rules
+from .models import Appointment, AppointmentOverride
+from .occurrences import occurrences
 from .forms import AppointmentForm
 import datetime
 
@@ -118,6 +124,31 @@ class AppointmentViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "appointments/appointment_dashboard.html")
 
+    def test_dashboard_partitions_in_one_query(self):
+        """
+        Test that past and upcoming appointments come from a single query, each in date and time order.
+        """
+        today = datetime.date.today()
+        past = Appointment.objects.create(
+            user=self.user, title="Past", appointment_date=today - datetime.timedelta(days=3),
+            appointment_time=datetime.time(9, 0),
+        )
+        future = Appointment.objects.create(
+            user=self.user, title="Future", appointment_date=today + datetime.timedelta(days=3),
+            appointment_time=datetime.time(9, 0),
+        )
+        self.client.login(username="testuser", password="testpassword")
+        response = self.client.get(reverse("appointment_dashboard"))
+        old = response.context["old_appointments"]
+        upcoming = response.context["upcoming_appointments"]
+        self.assertEqual(old[0], past)
+        self.assertEqual(upcoming[-1], future)
+        self.assertEqual(len(old) + len(upcoming), 3)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse("appointment_dashboard"))
+        self.assertEqual(sum('appointments_appointment' in query['sql'] for query in captured), 1)
+
     def test_appointment_create_view(self):
         """
         Test creating an appointment via the appointment_create view.
@@ -190,3 +221,214 @@ class AppointmentPermissionsTest(TestCase):
         self.client.login(username="user2", password="password2")
         response = self.client.get(reverse("appointment_detail", args=[self.appointment.id]))
         self.assertEqual(response.status_code, 404)  # Should return 404 because they don't own it
+
+
+class AppointmentEventFeedTest(TestCase):
+    """
+    Tests for the FullCalendar event feed.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="feeduser", password="password")
+        other = User.objects.create_user(username="otheruser", password="password")
+        for user, day, title in (
+            (self.user, datetime.date(2024, 1, 31), "Before"),
+            (self.user, datetime.date(2024, 2, 1), "First"),
+            (self.user, datetime.date(2024, 2, 29), "Last"),
+            (self.user, datetime.date(2024, 3, 1), "After"),
+            (other, datetime.date(2024, 2, 10), "Someone else's"),
+        ):
+            Appointment.objects.create(user=user, title=title, appointment_date=day, appointment_time=datetime.time(10, 30))
+        self.client.force_login(self.user)
+
+    def test_returns_the_window_only(self):
+        """
+        Test that only the user's appointments from start up to (not including) end are returned.
+        """
+        response = self.client.get(reverse("appointment_events"), {"start": "2024-02-01", "end": "2024-03-01"})
+        self.assertEqual(response.status_code, 200)
+        events = response.json()
+        self.assertEqual([event["title"] for event in events], ["First", "Last"])
+        self.assertEqual(events[0]["start"], "2024-02-01T10:30:00")
+
+    def test_accepts_fullcalendar_datetimes(self):
+        """
+        Test that the ISO datetimes with offsets FullCalendar sends are accepted.
+        """
+        response = self.client.get(
+            reverse("appointment_events"),
+            {"start": "2024-01-28T00:00:00+01:00", "end": "2024-03-10T00:00:00+01:00"},
+        )
+        self.assertEqual(len(response.json()), 4)
+
+    def test_rejects_bad_windows(self):
+        """
+        Test that missing, reversed, malformed or overlong windows are refused.
+        """
+        for params in (
+            {},
+            {"start": "2024-03-01", "end": "2024-02-01"},
+            {"start": "not-a-date", "end": "2024-02-01"},
+            {"start": "2020-01-01", "end": "2024-01-01"},
+        ):
+            response = self.client.get(reverse("appointment_events"), params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_requires_login(self):
+        """
+        Test that anonymous requests are refused.
+        """
+        self.client.logout()
+        response = self.client.get(reverse("appointment_events"), {"start": "2024-02-01", "end": "2024-03-01"})
+        self.assertIn(response.status_code, (401, 403))
+
+
+class RecurringAppointmentTest(TestCase):
+    """
+    Tests for recurring appointments and their per-occurrence overrides.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="recurringuser", password="password")
+        # Mondays at 09:00 from 2024-01-01
+        self.weekly = Appointment.objects.create(
+            user=self.user, title="Therapy", appointment_date=datetime.date(2024, 1, 1),
+            appointment_time=datetime.time(9, 0), recurrence="rrule:freq=weekly;byday=mo",
+        )
+
+    def test_rule_is_normalized_and_bounded_rules_record_their_end(self):
+        """
+        Test that rules are stored in canonical form and recurrence_end follows COUNT and UNTIL.
+        """
+        self.assertEqual(self.weekly.recurrence, "FREQ=WEEKLY;BYDAY=MO")
+        self.assertIsNone(self.weekly.recurrence_end)
+        self.weekly.recurrence = "FREQ=WEEKLY;COUNT=3"
+        self.weekly.save()
+        self.assertEqual(self.weekly.recurrence_end, datetime.date(2024, 1, 15))
+        self.weekly.recurrence = "FREQ=MONTHLY;UNTIL=20240420"
+        self.weekly.save(update_fields=["recurrence"])
+        self.weekly.refresh_from_db()
+        self.assertEqual(self.weekly.recurrence_end, datetime.date(2024, 4, 1))
+
+    def test_invalid_rules_are_rejected(self):
+        """
+        Test that malformed rules and sub-daily frequencies fail validation.
+        """
+        for rule in ("FREQ=WEEKLY;BYDAY=XX", "FREQ=HOURLY", "not a rule", "FREQ=DAILY\nEXDATE:20240101"):
+            appointment = Appointment(
+                user=self.user, title="Bad", appointment_date=datetime.date(2024, 1, 1),
+                appointment_time=datetime.time(9, 0), recurrence=rule,
+            )
+            with self.assertRaises(ValidationError, msg=rule):
+                appointment.full_clean()
+
+    def test_expands_only_the_window(self):
+        """
+        Test that an open-ended series yields just the occurrences in the window, however old it is.
+        """
+        found = occurrences(self.user, datetime.date(2030, 6, 1), datetime.date(2030, 7, 1))
+        self.assertEqual([o.starts_at.date() for o in found], [
+            datetime.date(2030, 6, 3), datetime.date(2030, 6, 10), datetime.date(2030, 6, 17), datetime.date(2030, 6, 24),
+        ])
+        self.assertEqual({o.starts_at.time() for o in found}, {datetime.time(9, 0)})
+
+    def test_window_skip_matches_full_expansion(self):
+        """
+        Test that moving DTSTART forward for daily and weekly rules gives the same occurrences as iterating from it.
+        """
+        start, end = datetime.date(2025, 3, 5), datetime.date(2025, 5, 20)
+        for rule in ("FREQ=DAILY;INTERVAL=3", "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR", "FREQ=DAILY;BYHOUR=7,21;BYMINUTE=0"):
+            dtstart = datetime.datetime(2024, 1, 3, 12, 0)
+            window_start = datetime.datetime.combine(start, datetime.time.min)
+            window_end = datetime.datetime.combine(end, datetime.time.min)
+            expected = [when for when in rrulestr(rule, dtstart=dtstart) if window_start <= when < window_end]
+            self.assertEqual(rules.occurrences_between(rule, dtstart, start, end), expected, rule)
+
+    def test_finished_series_are_not_read(self):
+        """
+        Test that a series whose last occurrence precedes the window is filtered out in SQL.
+        """
+        self.weekly.recurrence = "FREQ=WEEKLY;COUNT=2"
+        self.weekly.save()
+        self.assertEqual(occurrences(self.user, datetime.date(2024, 2, 1), datetime.date(2024, 3, 1)), [])
+
+    def test_overrides_cancel_move_and_restatus_occurrences(self):
+        """
+        Test that sparse overrides cancel, move and set the status of single occurrences.
+        """
+        AppointmentOverride.objects.create(appointment=self.weekly, date=datetime.date(2024, 1, 8), cancelled=True)
+        AppointmentOverride.objects.create(appointment=self.weekly, date=datetime.date(2024, 1, 15), status="attended")
+        # Moved out of January into February, and from February into January
+        AppointmentOverride.objects.create(
+            appointment=self.weekly, date=datetime.date(2024, 1, 22), rescheduled_date=datetime.date(2024, 2, 2),
+        )
+        AppointmentOverride.objects.create(
+            appointment=self.weekly, date=datetime.date(2024, 2, 5),
+            rescheduled_date=datetime.date(2024, 1, 31), rescheduled_time=datetime.time(16, 30),
+        )
+        found = occurrences(self.user, datetime.date(2024, 1, 1), datetime.date(2024, 2, 1))
+        self.assertEqual(
+            [(o.starts_at, o.status, o.date) for o in found],
+            [
+                (datetime.datetime(2024, 1, 1, 9, 0), "pending", datetime.date(2024, 1, 1)),
+                (datetime.datetime(2024, 1, 15, 9, 0), "attended", datetime.date(2024, 1, 15)),
+                (datetime.datetime(2024, 1, 29, 9, 0), "pending", datetime.date(2024, 1, 29)),
+                (datetime.datetime(2024, 1, 31, 16, 30), "pending", datetime.date(2024, 2, 5)),
+            ],
+        )
+
+    def test_override_must_fall_on_an_occurrence(self):
+        """
+        Test that an override for a date the rule skips fails validation.
+        """
+        override = AppointmentOverride(appointment=self.weekly, date=datetime.date(2024, 1, 9), cancelled=True)
+        with self.assertRaises(ValidationError):
+            override.full_clean()
+
+    def test_event_feed_and_dashboard(self):
+        """
+        Test that the feed lists expanded occurrences and an open-ended series stays upcoming.
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("appointment_events"), {"start": "2024-01-01", "end": "2024-01-15"})
+        self.assertEqual(response.json(), [
+            {"id": self.weekly.id, "title": "Therapy", "start": "2024-01-01T09:00:00", "status": "pending", "occurrence": "2024-01-01"},
+            {"id": self.weekly.id, "title": "Therapy", "start": "2024-01-08T09:00:00", "status": "pending", "occurrence": "2024-01-08"},
+        ])
+        response = self.client.get(reverse("appointment_dashboard"))
+        self.assertEqual(response.context["upcoming_appointments"], [self.weekly])
+
+    def test_occurrence_override_view(self):
+        """
+        Test that the override view cancels, moves and restores occurrences of the
+        user's own recurring appointments, and rejects dates the rule skips.
+        """
+        self.client.force_login(self.user)
+        url = reverse("occurrence_override", args=[self.weekly.pk])
+        window = (datetime.date(2024, 1, 1), datetime.date(2024, 1, 15))
+
+        response = self.client.post(url, {"date": "2024-01-08", "cancelled": "on"})
+        self.assertRedirects(response, reverse("appointment_detail", args=[self.weekly.pk]))
+        self.assertEqual([o.date for o in occurrences(self.user, *window)], [datetime.date(2024, 1, 1)])
+
+        # Changing the same occurrence again replaces its override
+        self.client.post(url, {"date": "2024-01-08", "rescheduled_time": "11:00", "status": "attended"})
+        override = AppointmentOverride.objects.get(appointment=self.weekly)
+        self.assertEqual((override.cancelled, override.status), (False, "attended"))
+        self.assertEqual(occurrences(self.user, *window)[1].starts_at, datetime.datetime(2024, 1, 8, 11, 0))
+
+        response = self.client.get(url, {"date": "2024-01-08"})
+        self.assertEqual(response.context["form"].instance, override)
+
+        # Nothing changed restores the occurrence to the rule
+        self.client.post(url, {"date": "2024-01-08"})
+        self.assertFalse(AppointmentOverride.objects.exists())
+
+        response = self.client.post(url, {"date": "2024-01-09", "cancelled": "on"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("date", response.context["form"].errors)
+        self.assertFalse(AppointmentOverride.objects.exists())
+
+        other = User.objects.create_user(username="otheruser", password="password")
+        self.client.force_login(other)
+        self.assertEqual(self.client.post(url, {"date": "2024-01-08", "cancelled": "on"}).status_code, 404)
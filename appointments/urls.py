@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 # URL patterns for the appointments application
 urlpatterns = [
@@ -14,4 +14,10 @@ urlpatterns = [
 
     # Detail view: Displays detailed information about a specific appointment by primary key (pk)
     path('appointment/<int:pk>/', views.appointment_detail, name='appointment_detail'),
+
+    # Override view: Cancels, moves or sets the status of one occurrence of a recurring appointment
+    path('appointment/<int:pk>/occurrence/', views.occurrence_override, name='occurrence_override'),
+
+    # JSON event feed for the calendar: appointments between ?start= and ?end=
+    path('api/events/', api.appointment_events, name='appointment_events'),
 ]
@@ -1,58 +1,42 @@
 import datetime
-import json
 
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Appointment
-from .forms import AppointmentForm
+from healthy_you.replicas import replica_reads
+from .models import Appointment, AppointmentOverride
+from .forms import AppointmentForm, AppointmentOverrideForm
 
 
 @login_required
+@replica_reads
 def appointment_dashboard(request):
     """
     View to display the appointment dashboard for the logged-in user.
-    Includes both upcoming and past appointments and prepares event data for FullCalendar.
+    Includes both upcoming and past appointments; the calendar loads its
+    events for the visible range from appointment_events.
     """
-    # Retrieve all appointments specific to the logged-in user
+    # Retrieve all appointments specific to the logged-in user, in one query
     appointments = Appointment.objects.filter(user=request.user).order_by('appointment_date', 'appointment_time')
 
-    # Prepare events data for FullCalendar
-    events = []
-    for appt in appointments:
-        # Combine date and time into a single datetime object
-        dt = datetime.datetime.combine(appt.appointment_date, appt.appointment_time)
-        events.append({
-            "title": appt.title,
-            "start": dt.isoformat(),  # FullCalendar expects dates in ISO format
-            "id": appt.id,
-        })
-
-    # Get the current date and time
+    # Split them into past and upcoming in a single pass, keeping the date and time order.
+    # A recurring appointment is upcoming until its last occurrence; open-ended ones always are
     now = datetime.datetime.now()
-
-    # OLD Appointments: Those that occurred in the past
-    old_appointments = appointments.filter(
-        appointment_date__lt=now.date()
-    ) | appointments.filter(
-        appointment_date=now.date(), appointment_time__lt=now.time()
-    )
-    old_appointments = old_appointments.order_by('appointment_date', 'appointment_time')
-
-    # UPCOMING Appointments: Those that are happening today (in the future) or any future dates
-    upcoming_appointments = appointments.filter(
-        appointment_date__gt=now.date()
-    ) | appointments.filter(
-        appointment_date=now.date(), appointment_time__gte=now.time()
-    )
-    upcoming_appointments = upcoming_appointments.order_by('appointment_date', 'appointment_time')
+    cutoff = (now.date(), now.time())
+    old_appointments, upcoming_appointments = [], []
+    for appt in appointments:
+        last_date = (appt.recurrence_end or datetime.date.max) if appt.recurrence else appt.appointment_date
+        if (last_date, appt.appointment_time) < cutoff:
+            old_appointments.append(appt)
+        else:
+            upcoming_appointments.append(appt)
 
     # Form for the "Create Appointment" tab
     form = AppointmentForm()
 
     # Pass all the necessary data into the template context
     context = {
-        'appointments': appointments,
-        'events': json.dumps(events),  # Convert event data to JSON format for use by FullCalendar
         'old_appointments': old_appointments,
         'upcoming_appointments': upcoming_appointments,
         'form': form,
@@ -102,3 +86,44 @@ def appointment_detail(request, pk):
     # Retrieve the specific appointment, or return a 404 if not found
     appointment = get_object_or_404(Appointment, pk=pk)
     return render(request, 'appointments/appointment_detail.html', {'appointment': appointment})
+
+
+@login_required
+def occurrence_override(request, pk):
+    """
+    View to cancel, move or set the status of one occurrence of the user's
+    recurring appointment. Saving an occurrence with nothing changed removes
+    its override, restoring it to the recurrence rule.
+    """
+    appointment = get_object_or_404(Appointment, pk=pk, user=request.user)
+    if not appointment.recurrence:
+        raise Http404("Only recurring appointments have occurrences to change.")
+
+    if request.method == 'POST':
+        # The form validates against the appointment, so the date must be one of its occurrences
+        form = AppointmentOverrideForm(request.POST, instance=AppointmentOverride(appointment=appointment))
+        if form.is_valid():
+            override = form.instance
+            if override.cancelled or override.status or override.is_moved:
+                # One override per occurrence: changing it again replaces the earlier change
+                AppointmentOverride.objects.update_or_create(
+                    appointment=appointment,
+                    date=override.date,
+                    defaults={field: form.cleaned_data[field] for field in form.Meta.fields if field != 'date'},
+                )
+            else:
+                appointment.overrides.filter(date=override.date).delete()
+            return redirect('appointment_detail', pk=appointment.pk)
+    else:
+        # Pre-fill the form with the occurrence's current override, if any
+        override = None
+        if request.GET.get('date'):
+            try:
+                override = appointment.overrides.filter(date=request.GET['date']).first()
+            except ValidationError:
+                pass
+        if override is None:
+            form = AppointmentOverrideForm(initial={'date': request.GET.get('date')})
+        else:
+            form = AppointmentOverrideForm(instance=override)
+    return render(request, 'appointments/occurrence_override.html', {'appointment': appointment, 'form': form})
@@ -0,0 +1,180 @@
+"""
+Microbenchmark comparing the old list-based dashboard statistics with
+mean_of() over the finished series and with the streaming RunningStats
+accumulator.
+
+Usage:
+    python benchmarks/bench_running_stats.py [days]
+
+The input mimics the rows returned by the health dashboard's daily query:
+one row per day with the date, weight, calories, activity, MAP and heart
+rate, with a sprinkling of missing values. The old view read dictionaries
+from .values(); the new view reads tuples from .values_list().
+"""
+
+import datetime
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthy_you.stats import RunningStats, mean_of  # noqa: E402
+
+
+def make_rows(days, seed=42):
+    rng = random.Random(seed)
+
+    def maybe(value):
+        return None if rng.random() < 0.05 else value
+
+    start = datetime.date(2000, 1, 1)
+    return [
+        (
+            start + datetime.timedelta(days=day),
+            rng.gauss(80, 5),
+            maybe(rng.randint(1500, 3000)),
+            maybe(rng.randint(0, 120)),
+            maybe(rng.gauss(93, 8)),
+            maybe(rng.randint(55, 95)),
+        )
+        for day in range(days)
+    ]
+
+
+def as_dicts(rows):
+    keys = ('date', 'avg_weight', 'sum_calories', 'sum_activity', 'avg_map', 'avg_hr')
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def list_passes(aggregated):
+    """
+    The previous approach: materialize each series, then filter and average copies.
+    """
+    agg_dates = [entry['date'].strftime('%Y-%m-%d') for entry in aggregated]
+    agg_weight = [entry['avg_weight'] for entry in aggregated]
+    agg_weight_lbs = [round(w * 2.20462, 2) if w is not None else None for w in agg_weight]
+    agg_calories = [entry['sum_calories'] for entry in aggregated]
+    agg_activity = [entry['sum_activity'] for entry in aggregated]
+    agg_map = [entry['avg_map'] for entry in aggregated]
+    agg_hr = [entry['avg_hr'] for entry in aggregated]
+
+    overall_weight = (sum([w for w in agg_weight_lbs if w is not None]) /
+                      len([w for w in agg_weight_lbs if w is not None])) if agg_weight_lbs else 0
+    filtered_calories = [c for c in agg_calories if c is not None]
+    overall_calories = sum(filtered_calories) / len(filtered_calories) if filtered_calories else 0
+    filtered_activity = [a for a in agg_activity if a is not None]
+    overall_activity = sum(filtered_activity) / len(filtered_activity) if filtered_activity else 0
+    filtered_map = [m for m in agg_map if m is not None]
+    overall_map = sum(filtered_map) / len(filtered_map) if filtered_map else 0
+    filtered_hr = [h for h in agg_hr if h is not None]
+    overall_hr = sum(filtered_hr) / len(filtered_hr) if filtered_hr else 0
+    return (agg_dates, agg_weight_lbs, agg_calories, agg_activity, agg_map, agg_hr,
+            overall_weight, overall_calories, overall_activity, overall_map, overall_hr)
+
+
+def single_pass(rows):
+    """
+    The new approach: build the chart series while iterating once, then average
+    each finished series with mean_of() (no filtered copies).
+    """
+    agg_dates, agg_weight_lbs, agg_calories, agg_activity, agg_map, agg_hr = [], [], [], [], [], []
+    for d, w, c, a, m, h in iter(rows):
+        agg_dates.append(d.strftime('%Y-%m-%d'))
+        agg_weight_lbs.append(round(w * 2.20462, 2) if w is not None else None)
+        agg_calories.append(c)
+        agg_activity.append(a)
+        agg_map.append(m)
+        agg_hr.append(h)
+    return (agg_dates, agg_weight_lbs, agg_calories, agg_activity, agg_map, agg_hr,
+            mean_of(agg_weight_lbs), mean_of(agg_calories), mean_of(agg_activity),
+            mean_of(agg_map), mean_of(agg_hr))
+
+
+def pushed(rows):
+    """
+    Fully streaming variant: push every value into an accumulator as it is read.
+    """
+    agg_dates, agg_weight_lbs, agg_calories, agg_activity, agg_map, agg_hr = [], [], [], [], [], []
+    weight, calories, activity, map_stats, hr = (RunningStats() for _ in range(5))
+    for d, w, c, a, m, h in iter(rows):
+        agg_dates.append(d.strftime('%Y-%m-%d'))
+        agg_weight_lbs.append(weight.push(round(w * 2.20462, 2) if w is not None else None))
+        agg_calories.append(calories.push(c))
+        agg_activity.append(activity.push(a))
+        agg_map.append(map_stats.push(m))
+        agg_hr.append(hr.push(h))
+    return (agg_dates, agg_weight_lbs, agg_calories, agg_activity, agg_map, agg_hr,
+            weight.mean_or(0), calories.mean_or(0), activity.mean_or(0), map_stats.mean_or(0), hr.mean_or(0))
+
+
+def peak_allocation(func, rows):
+    tracemalloc.start()
+    func(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def old_statistics(series):
+    """
+    Statistics step only, as before: filter a copy of each series, then sum() / len().
+    """
+    means = []
+    for values in series:
+        filtered = [value for value in values if value is not None]
+        means.append(sum(filtered) / len(filtered) if filtered else 0)
+    return means
+
+
+def new_statistics(series):
+    """
+    Statistics step only, with mean_of() reading each series in place.
+    """
+    return [mean_of(values) for values in series]
+
+
+def pushed_statistics(series):
+    """
+    Statistics step only, pushing every value through RunningStats.
+    """
+    return [RunningStats(values).mean_or(0) for values in series]
+
+
+def report(label, func, data, baseline=None, repeat=20):
+    elapsed = min(timeit.repeat(lambda: func(data), number=1, repeat=repeat))
+    peak = peak_allocation(func, data)
+    if baseline is None:
+        baseline = (elapsed, peak)
+    print(f"  {label:24} {elapsed * 1000:8.2f} ms ({(elapsed / baseline[0] - 1) * 100:+6.1f} %)   "
+          f"peak {peak / 1024:9.1f} KiB ({(peak / baseline[1] - 1) * 100:+6.1f} %)")
+    return baseline
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rows = make_rows(days)
+    dict_rows = as_dicts(rows)
+
+    old = list_passes(dict_rows)
+    for variant in (single_pass, pushed):
+        for before, after in zip(old[6:], variant(rows)[6:]):
+            assert abs(before - after) < 1e-6, (variant.__name__, before, after)
+
+    print(f"days of history: {days}")
+    print("dashboard transform (rows -> chart series + overall averages):")
+    baseline = report('list passes (old)', list_passes, dict_rows)
+    report('single pass + mean_of', single_pass, rows, baseline)
+    report('single pass + push', pushed, rows, baseline)
+
+    series = [list(column) for column in list(zip(*rows))[1:]]
+    print("statistics step only (five finished series -> means):")
+    baseline = report('filtered copies (old)', old_statistics, series)
+    report('mean_of', new_statistics, series, baseline)
+    report('RunningStats', pushed_statistics, series, baseline)
+
+
+if __name__ == '__main__':
+    main()
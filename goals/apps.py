@@ -8,3 +8,9 @@ class GoalsConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'  # Default primary key field type
     name = 'goals'  # Name of the application
+
+    def ready(self):
+        """
+        Connect the signal handlers that invalidate cached dashboards.
+        """
+        from . import signals  # noqa: F401
@@ -59,6 +59,12 @@ class Goal(models.Model):
         help_text="The timestamp when the goal was created."
     )
 
+    class Meta:
+        indexes = [
+            # The dashboard lists a user's goals ordered by due date
+            models.Index(fields=['user', 'due_date'], name='goal_user_due_date_idx'),
+        ]
+
     def __str__(self):
         """
         Return a human-readable representation of the Goal object.
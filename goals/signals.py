@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from healthy_you.cache import invalidate_dashboards, is_cascade_delete
+from .models import Goal
+
+
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+def invalidate_dashboards_on_change(sender, instance, origin=None, **kwargs):
+    """
+    Move the owner to a new dashboard data version whenever one of their goals changes.
+    """
+    if not is_cascade_delete(sender, origin):
+        invalidate_dashboards(instance.user_id)
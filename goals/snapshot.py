@@ -0,0 +1,62 @@
+import datetime
+from django.contrib.auth.models import User
+from django.db.models import Avg, OuterRef, Subquery
+from health.models import HealthMetric
+from sleep.models import SleepRecord
+
+KG_TO_LBS = 2.20462  # Weight is stored in kilograms but goals are set in pounds
+
+# Calorie, activity and sleep goals average the rows from this many days ago up to today
+WINDOW_DAYS = 7
+
+
+def _window_average(model, field, start, end):
+    """
+    Correlated subquery averaging one field of the outer user's rows within [start, end].
+    """
+    rows = (
+        model.objects
+        .filter(user=OuterRef('pk'), date__range=[start, end])
+        .order_by()
+        .values('user')
+        .annotate(avg=Avg(field))
+        .values('avg')
+    )
+    return Subquery(rows)
+
+
+def user_metric_snapshot(user, today=None):
+    """
+    Fetch every metric the goal dashboard compares goals against, in a single
+    query, and return a dict keyed by goal type:
+
+    * weight   - the most recent HealthMetric weight, converted to lbs
+    * calories - average daily calorie intake over the last week
+    * activity - average physical activity minutes over the last week
+    * sleep    - average sleep duration over the last week
+
+    Values are rounded to two decimals, or None when there is no data.
+    """
+    today = today or datetime.date.today()
+    start = today - datetime.timedelta(days=WINDOW_DAYS)
+
+    latest_weight = (
+        HealthMetric.objects
+        .filter(user=OuterRef('pk'))
+        .order_by('-date', '-id')
+        .values('weight')[:1]
+    )
+    row = User.objects.filter(pk=user.pk).values(
+        weight=Subquery(latest_weight),
+        calories=_window_average(HealthMetric, 'calories_intake', start, today),
+        activity=_window_average(HealthMetric, 'physical_activity_minutes', start, today),
+        sleep=_window_average(SleepRecord, 'duration', start, today),
+    ).first() or {}
+
+    snapshot = {}
+    for goal_type in ('weight', 'calories', 'activity', 'sleep'):
+        value = row.get(goal_type)
+        if value is not None and goal_type == 'weight':
+            value *= KG_TO_LBS
+        snapshot[goal_type] = round(value, 2) if value is not None else None
+    return snapshot
@@ -1,8 +1,13 @@
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
+from health.models import HealthMetric
+from sleep.models import SleepRecord
 from .models import Goal
 from .forms import GoalForm
+from .snapshot import user_metric_snapshot
 import datetime
 
 
@@ -190,3 +195,50 @@ class GoalAccessTest(TestCase):
         """
         response = self.client.get(reverse('goal_edit', args=[1]))
         self.assertEqual(response.status_code, 302)  # Redirect to login
+
+
+class GoalDashboardQueryCountTest(TestCase):
+    """
+    The goal dashboard shares one metric snapshot across all goals.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.force_login(self.user)
+        today = datetime.date.today()
+        HealthMetric.objects.create(user=self.user, date=today - datetime.timedelta(days=10), weight=80, calories_intake=9000)
+        HealthMetric.objects.create(user=self.user, date=today - datetime.timedelta(days=1), weight=70, calories_intake=2000, physical_activity_minutes=30)
+        HealthMetric.objects.create(user=self.user, date=today, weight=72, calories_intake=2500, physical_activity_minutes=60)
+        SleepRecord.objects.create(user=self.user, date=today, duration=7.5, quality=4)
+
+    def add_goals(self, count):
+        goal_types = [goal_type for goal_type, _ in Goal.GOAL_TYPE_CHOICES]
+        for i in range(count):
+            Goal.objects.create(user=self.user, goal_type=goal_types[i % len(goal_types)], target_value=100)
+
+    def count_dashboard_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('goal_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(captured), response
+
+    def test_snapshot_values(self):
+        """
+        Test that the snapshot matches the per-goal values the dashboard used to compute.
+        """
+        with self.assertNumQueries(1):
+            snapshot = user_metric_snapshot(self.user)
+        # The most recent weight is converted to lbs
+        self.assertEqual(snapshot, {'weight': 158.73, 'calories': 2250, 'activity': 45, 'sleep': 7.5})
+
+    def test_query_count_is_constant(self):
+        """
+        Test that the dashboard issues the same number of queries for 1 and 20 goals.
+        """
+        self.add_goals(1)
+        small, _ = self.count_dashboard_queries()
+        self.add_goals(19)
+        large, response = self.count_dashboard_queries()
+        self.assertEqual(small, large)
+        values = {row['goal'].goal_type: row['current_value'] for row in response.context['goal_data']}
+        self.assertEqual(values, {'weight': 158.73, 'calories': 2250, 'activity': 45, 'sleep': 7.5})
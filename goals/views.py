@@ -1,51 +1,38 @@
 import datetime
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Sum
-from health.models import HealthMetric  # For weight, calories, activity
-from sleep.models import SleepRecord  # For sleep duration
+from healthy_you.cache import cached_context
+from healthy_you.replicas import replica_reads
 from .models import Goal
 from .forms import GoalForm
+from .snapshot import user_metric_snapshot
 
 
 @login_required
+@replica_reads
 def goal_dashboard(request):
     """
     Displays a dashboard with all goals created by the logged-in user.
     Fetches current progress and provides feedback for each goal.
     """
-    goals = Goal.objects.filter(user=request.user).order_by('-due_date')  # Fetch user goals sorted by due date
+    # Goal progress only changes with the user's data or the 7-day window, so it is cached per day
+    today = datetime.date.today()
+    context = cached_context('goals', request.user, lambda: _build_dashboard_context(request.user, today), today)
+    return render(request, 'goals/goal_dashboard.html', context)
+
+
+def _build_dashboard_context(user, today):
+    """
+    Compute current values, progress and feedback for each of the user's goals.
+    """
+    goals = list(Goal.objects.filter(user=user).order_by('-due_date'))  # Fetch user goals sorted by due date
     goal_data = []
 
-    # Define a 7-day window to compute performance for relevant goals
-    today = datetime.date.today()
-    seven_days_ago = today - datetime.timedelta(days=7)
+    # Fetch the latest weight and 7-day averages once, shared by every goal
+    snapshot = user_metric_snapshot(user, today) if goals else {}
 
     for goal in goals:
-        current_value = None
-
-        # Handle different types of goals
-        if goal.goal_type == 'weight':
-            # For weight, fetch the latest HealthMetric record
-            latest_record = HealthMetric.objects.filter(user=request.user).order_by('-date').first()
-            if latest_record and latest_record.weight is not None:
-                current_value = round(latest_record.weight * 2.20462, 2)  # Convert to lbs
-        elif goal.goal_type in ['calories', 'activity']:
-            # For calories and activity, compute a 7-day average
-            metric_records = HealthMetric.objects.filter(user=request.user, date__range=[seven_days_ago, today])
-            if goal.goal_type == 'calories':
-                current_value = metric_records.aggregate(avg=Avg('calories_intake'))['avg']
-            elif goal.goal_type == 'activity':
-                current_value = metric_records.aggregate(avg=Avg('physical_activity_minutes'))['avg']
-
-            if current_value is not None:
-                current_value = round(current_value, 2)
-        elif goal.goal_type == 'sleep':
-            # For sleep, compute a 7-day average
-            sleep_records = SleepRecord.objects.filter(user=request.user, date__range=[seven_days_ago, today])
-            current_value = sleep_records.aggregate(avg=Avg('duration'))['avg']
-            if current_value is not None:
-                current_value = round(current_value, 2)
+        current_value = snapshot.get(goal.goal_type)
 
         # Calculate progress percentage
         progress = None
@@ -90,8 +77,7 @@ def goal_dashboard(request):
             'feedback': feedback,
         })
 
-    context = {'goal_data': goal_data}
-    return render(request, 'goals/goal_dashboard.html', context)
+    return {'goal_data': goal_data}
 
 
 @login_required
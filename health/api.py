@@ -0,0 +1,72 @@
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from healthy_you.api import DateRangeSerializer, series_query, user_data_condition
+from healthy_you.cache import cached_context
+from healthy_you.downsample import downsample_payload
+from healthy_you.replicas import replica_reads
+from .entries import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, entries_page
+from .series import SERIES, series_payload
+
+
+class EntryPageSerializer(DateRangeSerializer):
+    """
+    Validates the date range, cursor and page size of an entries request.
+    """
+    after = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE)
+
+    def validate_after(self, value):
+        try:
+            decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError("Invalid cursor.")
+        return value
+
+
+@user_data_condition()
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def health_series(request, series):
+    """
+    Return one health chart series (weight, map, hr, calories or activity)
+    for the logged-in user, optionally limited to ?start= and ?end= dates.
+    ?bucket=week or month averages the daily values per bucket. Long series
+    are downsampled to the point budget; ?points= changes it and ?raw=1
+    disables it.
+    """
+    if series not in SERIES:
+        raise NotFound(f"Unknown series: {series}")
+    start, end, budget, bucket = series_query(request)
+    data = cached_context(
+        'health_series',
+        request.user,
+        lambda: downsample_payload(series_payload(request.user, series, start, end, bucket), budget),
+        series, start, end, budget, bucket,
+    )
+    return Response(data)
+
+
+@user_data_condition()
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def health_entries(request):
+    """
+    Return a page of the logged-in user's health entries, ordered by date,
+    optionally limited to ?start= and ?end= dates. Pass the returned `next`
+    cursor as ?after= to get the following page; ?limit= sets the page size.
+    """
+    serializer = EntryPageSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    page = entries_page(
+        request.user, params.get('start'), params.get('end'), params.get('after'), params['limit'],
+    )
+    for row in page['results']:
+        row['edit_url'] = reverse('health_edit_entry', args=[f"{row['date']:%Y-%m-%d}"])
+    return Response(page)
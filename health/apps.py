@@ -7,3 +7,9 @@ class HealthConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'  # Default auto field type for primary keys.
     name = 'health'  # Name of the application as specified in the project structure.
+
+    def ready(self):
+        """
+        Connect signal handlers that keep the daily rollup table in sync.
+        """
+        from . import signals  # noqa: F401
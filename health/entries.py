@@ -0,0 +1,66 @@
+"""
+Keyset pagination over a user's health entries for the edit tab.
+
+Pages are ordered by (date, id) and continue from a cursor naming the last
+row of the previous page, so each page is one indexed range scan no matter
+how deep into the history it is, and rows added or removed meanwhile never
+shift later pages the way an OFFSET would.
+"""
+
+import datetime
+from django.db.models import Q
+from .models import HealthMetric
+from .series import KG_TO_LBS
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+
+# Only the columns the entries table shows are read
+ENTRY_FIELDS = (
+    'id', 'date', 'weight', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+    'heart_rate', 'calories_intake', 'physical_activity_minutes',
+)
+
+
+def encode_cursor(date, pk):
+    """
+    Return the cursor continuing after the entry with this date and id.
+    """
+    return f"{date:%Y-%m-%d}.{pk}"
+
+
+def decode_cursor(cursor):
+    """
+    Return the (date, id) named by a cursor. Raises ValueError if it is malformed.
+    """
+    date, _, pk = cursor.partition('.')
+    return datetime.date.fromisoformat(date), int(pk)
+
+
+def entries_page(user, start=None, end=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of the user's entries within [start, end] as
+    {'results': [row, ...], 'next': cursor or None}. Rows are dicts of
+    ENTRY_FIELDS plus weight_lbs; `after` is the cursor from the previous page.
+    """
+    entries = HealthMetric.objects.filter(user=user)
+    if start is not None:
+        entries = entries.filter(date__gte=start)
+    if end is not None:
+        entries = entries.filter(date__lte=end)
+    if after is not None:
+        after_date, after_pk = decode_cursor(after)
+        entries = entries.filter(Q(date__gt=after_date) | Q(date=after_date, pk__gt=after_pk))
+
+    # Read one row past the page to learn whether another page follows
+    rows = list(entries.order_by('date', 'id').values(*ENTRY_FIELDS)[:limit + 1])
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    for row in rows:
+        row['weight_lbs'] = round(row['weight'] * KG_TO_LBS, 2)
+
+    last = rows[-1] if rows else None
+    return {
+        'results': rows,
+        'next': encode_cursor(last['date'], last['id']) if has_next else None,
+    }
@@ -1,6 +1,23 @@
 from django import forms
 from .models import HealthMetric
 
+KG_TO_LBS = 2.20462  # 1 kg ≈ 2.20462 lbs
+
+
+def convert_weight_to_kg(cleaned_data):
+    """
+    Convert cleaned form data entered in lbs to kg, the unit weights are stored in.
+    Shared by HealthMetricForm and the bulk importer so both apply the same rule.
+    """
+    weight = cleaned_data.get('weight')  # Retrieve the weight value
+    weight_unit = cleaned_data.get('weight_unit')  # Retrieve the selected weight unit
+
+    # Check if weight is provided and needs conversion from lbs to kg
+    if weight is not None and weight_unit == 'lbs':
+        cleaned_data['weight'] = weight / KG_TO_LBS
+
+    return cleaned_data
+
 
 class HealthMetricForm(forms.ModelForm):
     """
@@ -47,12 +64,4 @@ class HealthMetricForm(forms.ModelForm):
         Handles conversion of weight from lbs to kg if the 'weight_unit' is set to 'lbs'.
         """
         cleaned_data = super().clean()  # Access the cleaned data from the form
-        weight = cleaned_data.get('weight')  # Retrieve the weight value
-        weight_unit = cleaned_data.get('weight_unit')  # Retrieve the selected weight unit
-
-        # Check if weight is provided and needs conversion from lbs to kg
-        if weight is not None and weight_unit == 'lbs':
-            # Convert weight from lbs to kg (1 kg ≈ 2.20462 lbs)
-            cleaned_data['weight'] = weight / 2.20462
-
-        return cleaned_data
+        return convert_weight_to_kg(cleaned_data)
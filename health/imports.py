@@ -0,0 +1,30 @@
+from healthy_you.cache import invalidate_dashboards
+from healthy_you.importer import ImportReport, RowCleaner, import_records
+from .forms import HealthMetricForm, convert_weight_to_kg
+from .models import HealthMetric
+from .rollups import rebuild_daily_rollups
+
+
+def import_health_metrics(stream, user, fmt='csv', batch_size=1000, transaction_rows=20000):
+    """
+    Bulk-import HealthMetric rows for a user from a CSV or NDJSON text stream.
+    Columns match HealthMetricForm (weight_unit defaults to kg). Returns an ImportReport.
+
+    bulk_create skips the model signals, so the user's rollups are rebuilt
+    and their dashboards invalidated once the rows are in. Chunks commit on
+    their own, so this also happens when a later chunk fails.
+    """
+    cleaner = RowCleaner(HealthMetricForm, post_clean=convert_weight_to_kg)
+
+    def build(cleaned):
+        cleaned.pop('weight_unit')
+        return HealthMetric(user_id=user.pk, **cleaned)
+
+    report = ImportReport()
+    try:
+        import_records(stream, fmt, cleaner, build, HealthMetric, batch_size, transaction_rows, report)
+    finally:
+        if report.created:
+            rebuild_daily_rollups(user_ids=[user.pk], batch_size=batch_size)
+            invalidate_dashboards(user.pk)
+    return report
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from health.rollups import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-user, per-day HealthMetric rollup table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help="Only rebuild rollups for this user ID (may be repeated).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of rollup rows written per bulk insert.",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_daily_rollups(
+            user_ids=options['user_ids'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily rollup rows."))
@@ -0,0 +1,60 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Populate the rollup table from the HealthMetric entries recorded so far.
+    """
+    HealthMetric = apps.get_model('health', 'HealthMetric')
+    HealthDailyRollup = apps.get_model('health', 'HealthDailyRollup')
+
+    map_expr = ExpressionWrapper(
+        (F('blood_pressure_systolic') + 2 * F('blood_pressure_diastolic')) / 3.0,
+        output_field=FloatField()
+    )
+    grouped = HealthMetric.objects.values('user_id', 'date').annotate(
+        avg_weight=Avg('weight'),
+        sum_calories=Sum('calories_intake'),
+        sum_activity=Sum('physical_activity_minutes'),
+        avg_map=Avg(map_expr),
+        avg_hr=Avg('heart_rate'),
+        entry_count=Count('id'),
+    ).order_by('user_id', 'date')
+
+    HealthDailyRollup.objects.bulk_create(
+        (HealthDailyRollup(**row) for row in grouped.iterator(chunk_size=1000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0002_alter_healthmetric_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='The date summarized by this rollup.')),
+                ('avg_weight', models.FloatField(blank=True, help_text='Average weight for the day in kilograms (kg).', null=True)),
+                ('sum_calories', models.IntegerField(blank=True, help_text='Total calories consumed on this date.', null=True)),
+                ('sum_activity', models.IntegerField(blank=True, help_text='Total minutes of physical activity on this date.', null=True)),
+                ('avg_map', models.FloatField(blank=True, help_text='Average mean arterial pressure (MAP) for the day in mmHg.', null=True)),
+                ('avg_hr', models.FloatField(blank=True, help_text='Average resting heart rate for the day in BPM.', null=True)),
+                ('entry_count', models.PositiveIntegerField(default=0, help_text='Number of HealthMetric entries recorded on this date.')),
+                ('user', models.ForeignKey(help_text='The user whose health metrics are summarized.', on_delete=django.db.models.deletion.CASCADE, related_name='health_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0003_healthdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthmetric',
+            index=models.Index(fields=['user', 'date'], name='health_metric_user_date_idx'),
+        ),
+    ]
@@ -51,9 +51,78 @@ class HealthMetric(models.Model):
         help_text="Total minutes of physical activity performed on this date."
     )
 
+    class Meta:
+        indexes = [
+            # Dashboards filter by user and a date range, ordered by date
+            models.Index(fields=['user', 'date'], name='health_metric_user_date_idx'),
+        ]
+
     def __str__(self):
         """
         String representation of the HealthMetric object.
         Displays the username and the date of the health metrics.
         """
         return f"{self.user.username} - {self.date}"
+
+
+class HealthDailyRollup(models.Model):
+    """
+    Pre-aggregated, per-user, per-day summary of HealthMetric entries.
+    Kept current by the signal handlers in health/signals.py so the health
+    dashboard can read one row per day instead of grouping raw metrics.
+    """
+
+    # Association with the User whose metrics are summarized
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='health_rollups',
+        help_text="The user whose health metrics are summarized."
+    )
+
+    # Day covered by this rollup
+    date = models.DateField(
+        help_text="The date summarized by this rollup."
+    )
+
+    # Aggregated values (None when no entry for the day recorded the metric)
+    avg_weight = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Average weight for the day in kilograms (kg)."
+    )
+    sum_calories = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Total calories consumed on this date."
+    )
+    sum_activity = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Total minutes of physical activity on this date."
+    )
+    avg_map = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Average mean arterial pressure (MAP) for the day in mmHg."
+    )
+    avg_hr = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Average resting heart rate for the day in BPM."
+    )
+    entry_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of HealthMetric entries recorded on this date."
+    )
+
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['date']
+
+    def __str__(self):
+        """
+        String representation of the HealthDailyRollup object.
+        Displays the username, the date, and how many entries were summarized.
+        """
+        return f"{self.user.username} - {self.date} ({self.entry_count} entries)"
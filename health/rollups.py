@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Sum
+from .models import HealthDailyRollup, HealthMetric
+
+
+def map_expression():
+    """
+    Build the MAP (Mean Arterial Pressure) expression used when aggregating
+    HealthMetric rows. Rows missing either blood pressure value yield NULL,
+    which SQL averages ignore.
+    """
+    return ExpressionWrapper(
+        (F('blood_pressure_systolic') + 2 * F('blood_pressure_diastolic')) / 3.0,
+        output_field=FloatField()
+    )
+
+
+def rollup_aggregates():
+    """
+    Aggregate expressions that turn a set of HealthMetric rows into the
+    values stored on a HealthDailyRollup row.
+    """
+    return {
+        'avg_weight': Avg('weight'),
+        'sum_calories': Sum('calories_intake'),
+        'sum_activity': Sum('physical_activity_minutes'),
+        'avg_map': Avg(map_expression()),
+        'avg_hr': Avg('heart_rate'),
+        'entry_count': Count('id'),
+    }
+
+
+def refresh_daily_rollup(user_id, date):
+    """
+    Recompute the rollup row for a single user and day from that day's
+    HealthMetric entries. The row is removed once the day has no entries left.
+    """
+    values = HealthMetric.objects.filter(user_id=user_id, date=date).aggregate(**rollup_aggregates())
+
+    if not values['entry_count']:
+        HealthDailyRollup.objects.filter(user_id=user_id, date=date).delete()
+        return None
+
+    rollup, _ = HealthDailyRollup.objects.update_or_create(
+        user_id=user_id,
+        date=date,
+        defaults=values,
+    )
+    return rollup
+
+
+def rebuild_daily_rollups(user_ids=None, batch_size=1000):
+    """
+    Rebuild rollup rows from scratch, either for every user or only for the
+    given user IDs. Returns the number of rollup rows written.
+    """
+    metrics = HealthMetric.objects.all()
+    rollups = HealthDailyRollup.objects.all()
+    if user_ids is not None:
+        metrics = metrics.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    grouped = metrics.values('user_id', 'date').annotate(**rollup_aggregates()).order_by('user_id', 'date')
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(HealthDailyRollup(**row))
+            if len(batch) >= batch_size:
+                HealthDailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            HealthDailyRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
@@ -0,0 +1,218 @@
+"""
+Chart series for the health dashboard, shared by the dashboard view and the
+series API so both describe a user's data the same way.
+"""
+
+from django.db.models import Avg, Max, Q
+from healthy_you.buckets import bucketed
+from healthy_you.stats import mean_of
+from .models import HealthDailyRollup, HealthMetric
+
+KG_TO_LBS = 2.20462  # Weights are stored in kg and charted in lbs
+
+# National reference averages drawn alongside the user's own data
+NATIONAL_AVG_HR = 70
+NATIONAL_AVG_MAP = 93
+
+# Series name -> national average shown on its chart (None when there is none)
+SERIES = {
+    'weight': None,
+    'map': NATIONAL_AVG_MAP,
+    'hr': NATIONAL_AVG_HR,
+    'calories': None,
+    'activity': None,
+}
+
+# Series name -> HealthDailyRollup column it is read from
+COLUMNS = {
+    'weight': 'avg_weight',
+    'map': 'avg_map',
+    'hr': 'avg_hr',
+    'calories': 'sum_calories',
+    'activity': 'sum_activity',
+}
+
+
+def _in_range(queryset, start, end):
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def daily_series(user, start=None, end=None, bucket='day'):
+    """
+    Return the per-day chart series read from the user's rollup rows:
+    {'dates': [...], 'weight': [...], 'map': [...], 'hr': [...], 'calories': [...], 'activity': [...]}.
+    Days without a value for a metric hold None.
+
+    With bucket='week' or 'month' each entry is instead the average of the
+    daily values in that bucket, dated by its first day (see healthy_you/buckets.py).
+    """
+    if bucket != 'day':
+        return _format_daily(_bucket_rows(user, start, end, bucket))
+    return _format_daily(_daily_rows(user, start, end).iterator())
+
+
+async def adaily_series(user, start=None, end=None):
+    """
+    Async variant of daily_series().
+    """
+    return _format_daily([row async for row in _daily_rows(user, start, end)])
+
+
+def _daily_rows(user, start, end):
+    return _in_range(HealthDailyRollup.objects.filter(user=user), start, end).values_list(
+        'date', 'avg_weight', 'sum_calories', 'sum_activity', 'avg_map', 'avg_hr'
+    ).order_by('date')
+
+
+def _bucket_rows(user, start, end, bucket):
+    """
+    Yield rollup rows averaged per bucket, in the same shape as _daily_rows().
+    """
+    rows = bucketed(
+        _in_range(HealthDailyRollup.objects.filter(user=user), start, end), bucket,
+        weight=Avg('avg_weight'),
+        calories=Avg('sum_calories'),
+        activity=Avg('sum_activity'),
+        map=Avg('avg_map'),
+        hr=Avg('avg_hr'),
+    ).values_list('period', 'weight', 'calories', 'activity', 'map', 'hr')
+    for period, weight, *values in rows.iterator():
+        # Weight is rounded once it is converted to lbs
+        yield (period, weight, *(round(value, 2) if value is not None else None for value in values))
+
+
+def _format_daily(rows):
+    # Build every series in a single pass over the rollup rows
+    dates, weight_lbs, calories, activity, map_values, hr = [], [], [], [], [], []
+    for date, weight, day_calories, day_activity, map_value, day_hr in rows:
+        dates.append(date.strftime('%Y-%m-%d'))
+        weight_lbs.append(round(weight * KG_TO_LBS, 2) if weight is not None else None)
+        calories.append(day_calories)
+        activity.append(day_activity)
+        map_values.append(map_value)
+        hr.append(day_hr)
+
+    return {
+        'dates': dates,
+        'weight': weight_lbs,
+        'map': map_values,
+        'hr': hr,
+        'calories': calories,
+        'activity': activity,
+    }
+
+
+def single_series(user, name, start=None, end=None, bucket='day'):
+    """
+    Return (dates, values) for one chart series, the same as daily_series()'s
+    'dates' and [name] lists but reading only that series' rollup column.
+    """
+    rows = _in_range(HealthDailyRollup.objects.filter(user=user), start, end)
+    if bucket == 'day':
+        rows = rows.values_list('date', COLUMNS[name]).order_by('date')
+    else:
+        rows = bucketed(rows, bucket, value=Avg(COLUMNS[name])).values_list('period', 'value')
+
+    dates, values = [], []
+    for date, value in rows.iterator():
+        dates.append(date.strftime('%Y-%m-%d'))
+        if value is not None and name == 'weight':
+            value = round(value * KG_TO_LBS, 2)
+        elif value is not None and bucket != 'day':
+            value = round(value, 2)
+        values.append(value)
+    return dates, values
+
+
+def summary(user):
+    """
+    Return {name: (overall average, latest value)} for every series, read from
+    the rollup rows in two queries: one aggregating the averages and the date
+    of each series' latest value, and one fetching the rows on those dates.
+    Series the user has never recorded give (None, None).
+    """
+    rollups = HealthDailyRollup.objects.filter(user=user)
+    totals = rollups.aggregate(**_summary_aggregates())
+    dates = _latest_dates(totals)
+    rows = rollups.filter(date__in=dates).values_list('date', *COLUMNS.values()) if dates else []
+    return _format_summary(totals, rows)
+
+
+async def asummary(user):
+    """
+    Async variant of summary().
+    """
+    rollups = HealthDailyRollup.objects.filter(user=user)
+    totals = await rollups.aaggregate(**_summary_aggregates())
+    dates = _latest_dates(totals)
+    rows = []
+    if dates:
+        rows = [row async for row in rollups.filter(date__in=dates).values_list('date', *COLUMNS.values())]
+    return _format_summary(totals, rows)
+
+
+def _summary_aggregates():
+    aggregates = {}
+    for name, column in COLUMNS.items():
+        aggregates[f'{name}_avg'] = Avg(column)
+        aggregates[f'{name}_date'] = Max('date', filter=Q(**{f'{column}__isnull': False}))
+    return aggregates
+
+
+def _latest_dates(totals):
+    return {totals[f'{name}_date'] for name in COLUMNS} - {None}
+
+
+def _format_summary(totals, rows):
+    values_on = {date: values for date, *values in rows}
+    result = {}
+    for index, name in enumerate(COLUMNS):
+        average, date = totals[f'{name}_avg'], totals[f'{name}_date']
+        latest = values_on[date][index] if date is not None else None
+        if name == 'weight' and average is not None:
+            # Charted in lbs; the latest value is rounded like the chart's daily values
+            average, latest = average * KG_TO_LBS, round(latest * KG_TO_LBS, 2)
+        result[name] = (average, latest)
+    return result
+
+
+def individual_points(user, name, start=None, end=None):
+    """
+    Return the individual entries behind a series as [{'x': date, 'y': value}, ...].
+    Only weight, MAP and heart rate charts plot individual entries.
+    """
+    entries = _in_range(HealthMetric.objects.filter(user=user), start, end).order_by('date')
+    if name == 'weight':
+        rows = entries.exclude(weight__isnull=True).values_list('date', 'weight')
+        return [{'x': date.strftime('%Y-%m-%d'), 'y': round(weight * KG_TO_LBS, 2)} for date, weight in rows]
+    if name == 'hr':
+        rows = entries.exclude(heart_rate__isnull=True).values_list('date', 'heart_rate')
+        return [{'x': date.strftime('%Y-%m-%d'), 'y': hr} for date, hr in rows]
+    if name == 'map':
+        rows = entries.values_list('date', 'blood_pressure_systolic', 'blood_pressure_diastolic')
+        return [
+            {'x': date.strftime('%Y-%m-%d'), 'y': round((systolic + 2 * diastolic) / 3.0, 2)}
+            for date, systolic, diastolic in rows
+            if systolic and diastolic
+        ]
+    return []
+
+
+def series_payload(user, name, start=None, end=None, bucket='day'):
+    """
+    Build the API payload for one chart: its daily (or per-bucket) values, the
+    overall average, the national average (if any) and the individual entries.
+    """
+    dates, values = single_series(user, name, start, end, bucket)
+    return {
+        'series': name,
+        'dates': dates,
+        'values': values,
+        'overall': mean_of(values),
+        'national': SERIES[name],
+        'points': individual_points(user, name, start, end),
+    }
@@ -0,0 +1,53 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from healthy_you.cache import invalidate_dashboards, is_cascade_delete
+from .models import HealthMetric
+from .rollups import refresh_daily_rollup
+
+
+@receiver(pre_save, sender=HealthMetric)
+def remember_previous_rollup_day(sender, instance, raw=False, **kwargs):
+    """
+    Record the (user, date) an existing entry belonged to before it is saved,
+    so the old day's rollup can be refreshed if the entry moves to a new date.
+    """
+    instance._previous_rollup_day = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('user_id', 'date').first()
+    if previous and previous != (instance.user_id, instance.date):
+        instance._previous_rollup_day = previous
+
+
+@receiver(post_save, sender=HealthMetric)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Keep the daily rollup current whenever a HealthMetric entry is created or edited.
+    """
+    if raw:
+        return
+    refresh_daily_rollup(instance.user_id, instance.date)
+    previous = getattr(instance, '_previous_rollup_day', None)
+    if previous:
+        refresh_daily_rollup(*previous)
+
+
+@receiver(post_delete, sender=HealthMetric)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Keep the daily rollup current whenever a HealthMetric entry is deleted.
+    Entries only cascade from their user, whose rollups are deleted with them.
+    """
+    if is_cascade_delete(sender, origin):
+        return
+    refresh_daily_rollup(instance.user_id, instance.date)
+
+
+@receiver(post_save, sender=HealthMetric)
+@receiver(post_delete, sender=HealthMetric)
+def invalidate_dashboards_on_change(sender, instance, origin=None, **kwargs):
+    """
+    Move the owner to a new dashboard data version whenever one of their entries changes.
+    """
+    if not is_cascade_delete(sender, origin):
+        invalidate_dashboards(instance.user_id)
@@ -0,0 +1,11 @@
+from celery import shared_task
+from .rollups import rebuild_daily_rollups
+
+
+@shared_task
+def rebuild_health_rollups(user_ids=None):
+    """
+    Rebuild the daily HealthMetric rollups, for every user or only the given
+    user IDs. Returns the number of rollup rows written.
+    """
+    return rebuild_daily_rollups(user_ids=user_ids)
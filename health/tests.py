@@ -1,9 +1,17 @@
+import datetime
+import io
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils.timezone import now
-from .models import HealthMetric
+from .entries import entries_page
+from .models import HealthDailyRollup, HealthMetric
 from .forms import HealthMetricForm
+from .series import COLUMNS, daily_series, single_series, summary
+from .tasks import rebuild_health_rollups
 
 
 class HealthMetricModelTest(TestCase):
@@ -132,6 +140,7 @@ class HealthDashboardViewTest(TestCase):
         response = self.client.get(reverse('health_dashboard'))
         self.assertIn('form', response.context)
         self.assertIn('entries', response.context)
+        self.assertIsNone(response.context['entries'])
         self.assertIn('feedback', response.context)
         self.assertIn('overall_weight', response.context)
 
@@ -214,3 +223,315 @@ class HealthEditEntryViewTest(TestCase):
         response = self.client.get(reverse('health_edit_entry', kwargs={'entry_date': self.metric.date}))
         self.assertRedirects(response,
                              f"{reverse('login')}?next={reverse('health_edit_entry', kwargs={'entry_date': self.metric.date})}")
+
+
+class HealthDailyRollupTest(TestCase):
+    """
+    Test cases for keeping the HealthDailyRollup table in sync with HealthMetric entries.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.today = now().date()
+
+    def create_metric(self, date, weight, **kwargs):
+        return HealthMetric.objects.create(user=self.user, date=date, weight=weight, **kwargs)
+
+    def test_rollup_created_on_save(self):
+        """
+        Test that saving an entry creates the rollup row for its day.
+        """
+        self.create_metric(self.today, 70.0, blood_pressure_systolic=120, blood_pressure_diastolic=81,
+                           heart_rate=72, calories_intake=2000, physical_activity_minutes=30)
+        rollup = HealthDailyRollup.objects.get(user=self.user, date=self.today)
+        self.assertEqual(rollup.entry_count, 1)
+        self.assertEqual(rollup.avg_weight, 70.0)
+        self.assertAlmostEqual(rollup.avg_map, 94.0)
+        self.assertEqual(rollup.sum_calories, 2000)
+
+    def test_rollup_aggregates_multiple_entries(self):
+        """
+        Test that several entries on the same day are averaged and summed.
+        """
+        self.create_metric(self.today, 70.0, calories_intake=1000, physical_activity_minutes=20, heart_rate=60)
+        self.create_metric(self.today, 72.0, calories_intake=500, heart_rate=80)
+        rollup = HealthDailyRollup.objects.get(user=self.user, date=self.today)
+        self.assertEqual(rollup.entry_count, 2)
+        self.assertEqual(rollup.avg_weight, 71.0)
+        self.assertEqual(rollup.sum_calories, 1500)
+        self.assertEqual(rollup.sum_activity, 20)
+        self.assertEqual(rollup.avg_hr, 70.0)
+        self.assertIsNone(rollup.avg_map)
+
+    def test_rollup_follows_date_change(self):
+        """
+        Test that moving an entry to another date refreshes both days.
+        """
+        metric = self.create_metric(self.today, 70.0)
+        yesterday = self.today - datetime.timedelta(days=1)
+        metric.date = yesterday
+        metric.save()
+        self.assertFalse(HealthDailyRollup.objects.filter(user=self.user, date=self.today).exists())
+        self.assertTrue(HealthDailyRollup.objects.filter(user=self.user, date=yesterday).exists())
+
+    def test_rollup_removed_on_delete(self):
+        """
+        Test that deleting the last entry of a day removes its rollup row.
+        """
+        metric = self.create_metric(self.today, 70.0)
+        metric.delete()
+        self.assertFalse(HealthDailyRollup.objects.filter(user=self.user).exists())
+
+    def test_user_delete_skips_rollup_refresh(self):
+        """
+        Test that deleting a user drops their rollups without recomputing them entry by entry.
+        """
+        for days in range(3):
+            self.create_metric(self.today - datetime.timedelta(days=days), 70.0)
+        with CaptureQueriesContext(connection) as captured:
+            self.user.delete()
+        self.assertFalse(any('AVG(' in query['sql'] for query in captured))
+        self.assertFalse(HealthDailyRollup.objects.exists())
+
+    def test_rebuild_command(self):
+        """
+        Test that the rebuild command regenerates rollups for bulk-inserted entries.
+        """
+        HealthMetric.objects.bulk_create([
+            HealthMetric(user=self.user, date=self.today - datetime.timedelta(days=i), weight=70 + i)
+            for i in range(5)
+        ])
+        self.assertEqual(HealthDailyRollup.objects.count(), 0)
+        call_command('rebuild_health_rollups', stdout=io.StringIO())
+        self.assertEqual(HealthDailyRollup.objects.filter(user=self.user).count(), 5)
+
+    def test_rebuild_task(self):
+        """
+        Test that the background task rebuilds the rollups of the given users.
+        """
+        HealthMetric.objects.bulk_create([HealthMetric(user=self.user, date=self.today, weight=70)])
+        self.assertEqual(rebuild_health_rollups.apply(kwargs={'user_ids': [self.user.id]}).get(), 1)
+        self.assertEqual(HealthDailyRollup.objects.get(user=self.user).avg_weight, 70.0)
+
+    def test_dashboard_reads_rollups(self):
+        """
+        Test that the dashboard charts are built from the rollup rows.
+        """
+        self.create_metric(self.today, 70.0, heart_rate=72)
+        self.client.login(username='testuser', password='password123')
+        response = self.client.get(reverse('health_dashboard'))
+        self.assertEqual(response.context['overall_hr'], 72.0)
+        response = self.client.get(reverse('health_series', args=['hr']))
+        self.assertEqual(response.json()['dates'], [f"{self.today:%Y-%m-%d}"])
+
+
+class HealthSeriesApiTest(TestCase):
+    """
+    Test cases for the health chart-series API endpoint.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.force_login(self.user)
+        self.today = datetime.date.today()
+        self.yesterday = self.today - datetime.timedelta(days=1)
+        HealthMetric.objects.create(
+            user=self.user, date=self.yesterday, weight=70, heart_rate=60,
+            blood_pressure_systolic=120, blood_pressure_diastolic=60,
+        )
+        HealthMetric.objects.create(user=self.user, date=self.today, weight=80, heart_rate=70)
+
+    def get(self, series, **params):
+        return self.client.get(reverse('health_series', args=[series]), params, HTTP_ACCEPT='application/json')
+
+    def test_series_payload(self):
+        """
+        Test that a series returns daily values, averages and individual points.
+        """
+        data = self.get('map').json()
+        self.assertEqual(data['dates'], [f"{self.yesterday:%Y-%m-%d}", f"{self.today:%Y-%m-%d}"])
+        self.assertEqual(data['values'], [80.0, None])
+        self.assertEqual(data['overall'], 80.0)
+        self.assertEqual(data['national'], 93)
+        self.assertEqual(data['points'], [{'x': f"{self.yesterday:%Y-%m-%d}", 'y': 80.0}])
+
+    def test_date_range(self):
+        """
+        Test that start and end limit the series, and that invalid ranges are rejected.
+        """
+        data = self.get('weight', start=self.today.isoformat()).json()
+        self.assertEqual(data['values'], [176.37])
+        self.assertEqual(self.get('weight', start='not-a-date').status_code, 400)
+        self.assertEqual(self.get('weight', start=self.today.isoformat(), end=self.yesterday.isoformat()).status_code, 400)
+        self.assertEqual(self.get('unknown').status_code, 404)
+
+    def test_conditional_get(self):
+        """
+        Test that an unchanged series answers 304 and a new write changes its ETag.
+        """
+        response = self.get('hr')
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('private', response['Cache-Control'])
+
+        cached = self.client.get(reverse('health_series', args=['hr']), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        HealthMetric.objects.create(user=self.user, date=self.today - datetime.timedelta(days=2), weight=75, heart_rate=90)
+        fresh = self.client.get(reverse('health_series', args=['hr']), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual(len(fresh.json()['values']), 3)
+
+    def test_downsampling(self):
+        """
+        Test that long series are reduced to the point budget unless raw data is requested.
+        """
+        HealthMetric.objects.bulk_create([
+            HealthMetric(user=self.user, date=self.today - datetime.timedelta(days=i), weight=70 + i % 7, heart_rate=60 + i % 11)
+            for i in range(2, 60)
+        ])
+        call_command('rebuild_health_rollups', stdout=io.StringIO())
+
+        data = self.get('weight', points=10).json()
+        self.assertTrue(data['downsampled'])
+        self.assertEqual(len(data['values']), 10)
+        self.assertEqual(len(data['points']), 10)
+        self.assertEqual(data['dates'][-1], f"{self.today:%Y-%m-%d}")
+
+        data = self.get('weight', raw=1).json()
+        self.assertFalse(data['downsampled'])
+        self.assertEqual(len(data['values']), 60)
+
+        with self.settings(CHART_POINT_BUDGET=20):
+            self.assertEqual(len(self.get('hr').json()['values']), 20)
+        self.assertEqual(self.get('weight', points=2).status_code, 400)
+
+    def test_buckets(self):
+        """
+        Test that week and month buckets average the daily values in the database.
+        """
+        for day, weight, calories in ((2, 70, 2000), (4, 80, 2500), (9, 90, 1800)):
+            HealthMetric.objects.create(user=self.user, date=datetime.date(2023, 10, day), weight=weight, calories_intake=calories)
+        october = {'start': '2023-10-01', 'end': '2023-10-31'}
+
+        data = self.get('weight', bucket='week', **october).json()
+        self.assertEqual(data['dates'], ['2023-10-02', '2023-10-09'])
+        self.assertEqual(data['values'], [165.35, 198.42])
+        self.assertEqual(self.get('calories', bucket='week', **october).json()['values'], [2250.0, 1800.0])
+
+        data = self.get('weight', bucket='month', **october).json()
+        self.assertEqual(data['dates'], ['2023-10-01'])
+        self.assertEqual(data['values'], [176.37])
+        self.assertEqual(len(data['points']), 3)  # Individual entries are not bucketed
+
+        self.assertEqual(self.get('weight', bucket='year').status_code, 400)
+
+    def test_requires_login(self):
+        """
+        Test that anonymous requests are refused.
+        """
+        self.client.logout()
+        self.assertEqual(self.get('weight').status_code, 403)
+
+    def test_summary_matches_the_daily_series(self):
+        """
+        Test that the dashboard summary gives each series' average and latest value in two queries.
+        """
+        HealthMetric.objects.create(user=self.user, date=self.today - datetime.timedelta(days=9), weight=72, calories_intake=2100)
+        series = daily_series(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            result = summary(self.user)
+        self.assertEqual(len(queries), 2)
+        for name in COLUMNS:
+            values = [value for value in series[name] if value is not None]
+            average, latest = result[name]
+            if values:
+                self.assertAlmostEqual(average, sum(values) / len(values), places=1, msg=name)
+                self.assertEqual(latest, values[-1], name)
+            else:
+                self.assertEqual((average, latest), (None, None), name)
+
+    def test_single_series_reads_one_column(self):
+        """
+        Test that one series matches its daily_series() values while selecting only its own rollup column.
+        """
+        HealthMetric.objects.create(user=self.user, date=self.today - datetime.timedelta(days=9), weight=72, calories_intake=2100, physical_activity_minutes=30)
+        for bucket in ('day', 'week', 'month'):
+            series = daily_series(self.user, bucket=bucket)
+            for name, column in COLUMNS.items():
+                with CaptureQueriesContext(connection) as queries:
+                    dates, values = single_series(self.user, name, bucket=bucket)
+                self.assertEqual((dates, values), (series['dates'], series[name]), (bucket, name))
+                sql = queries[0]['sql']
+                self.assertEqual([other for other in COLUMNS.values() if other in sql], [column])
+
+
+class HealthEntriesApiTest(TestCase):
+    """
+    Test cases for the keyset-paginated health entries API and the edit tab.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.force_login(self.user)
+        self.start = datetime.date(2024, 1, 1)
+        # Two entries per day for five days
+        HealthMetric.objects.bulk_create([
+            HealthMetric(user=self.user, date=self.start + datetime.timedelta(days=i // 2), weight=70 + i)
+            for i in range(10)
+        ])
+        other = User.objects.create_user(username='other', password='password123')
+        HealthMetric.objects.create(user=other, date=self.start, weight=90)
+
+    def get(self, **params):
+        return self.client.get(reverse('health_entries'), params, HTTP_ACCEPT='application/json')
+
+    def test_pages_follow_date_and_id(self):
+        """
+        Test that following the cursor visits every entry once, in (date, id) order.
+        """
+        seen, params = [], {'limit': 3}
+        while True:
+            data = self.get(**params).json()
+            self.assertLessEqual(len(data['results']), 3)
+            seen.extend(data['results'])
+            if data['next'] is None:
+                break
+            params['after'] = data['next']
+
+        expected = list(
+            HealthMetric.objects.filter(user=self.user).order_by('date', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual([row['id'] for row in seen], expected)
+        self.assertEqual(seen[0]['weight_lbs'], 154.32)
+        self.assertEqual(seen[0]['edit_url'], reverse('health_edit_entry', args=['2024-01-01']))
+
+    def test_filters_and_validation(self):
+        """
+        Test date filtering, and that bad cursors and page sizes are rejected.
+        """
+        data = self.get(start='2024-01-02', end='2024-01-03').json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertIsNone(data['next'])
+        self.assertEqual(self.get(after='garbage').status_code, 400)
+        self.assertEqual(self.get(limit=0).status_code, 400)
+        self.assertEqual(self.get(limit=1000).status_code, 400)
+
+    def test_page_is_a_single_query(self):
+        """
+        Test that a page deep in the history is one query, however many entries precede it.
+        """
+        first = self.get(limit=8).json()
+        with self.assertNumQueries(1):
+            entries_page(self.user, after=first['next'], limit=8)
+
+    def test_dashboard_renders_first_page_on_edit_tab(self):
+        """
+        Test that the dashboard renders entries only when it opens on the edit tab.
+        """
+        response = self.client.get(reverse('health_dashboard'), {'active_tab': 'edit'})
+        self.assertEqual(len(response.context['entries']), 10)
+        self.assertIsNone(response.context['entries_next'])
+        response = self.client.get(reverse('health_dashboard'), {'start_date': '2024-01-05', 'end_date': '2024-01-05'})
+        self.assertEqual(len(response.context['entries']), 2)
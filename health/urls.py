@@ -1,12 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 
 # Application URL configuration for the 'health' app
 urlpatterns = [
     # URL for the health dashboard
     path(
         'dashboard/',
-        views.health_dashboard,
+        views.ahealth_dashboard if settings.ASYNC_DASHBOARDS else views.health_dashboard,
         name='health_dashboard',  # Named route for reverse URL resolution
     ),
 
@@ -16,4 +17,18 @@ urlpatterns = [
         views.health_edit_entry,
         name='health_edit_entry',  # Named route for reverse URL resolution
     ),
+
+    # JSON endpoint for a single chart series (weight, map, hr, calories, activity)
+    path(
+        'api/series/<str:series>/',
+        api.health_series,
+        name='health_series',  # Named route for reverse URL resolution
+    ),
+
+    # JSON endpoint for keyset-paginated health entries (edit tab)
+    path(
+        'api/entries/',
+        api.health_entries,
+        name='health_entries',  # Named route for reverse URL resolution
+    ),
 ]
@@ -1,13 +1,18 @@
+import asyncio
 import datetime
-import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Avg, F, ExpressionWrapper, FloatField
+from healthy_you.cache import acached_context, cached_context
+from healthy_you.replicas import replica_reads
+from .entries import entries_page
 from .forms import HealthMetricForm
 from .models import HealthMetric
+from .series import NATIONAL_AVG_HR, NATIONAL_AVG_MAP, asummary, summary
 
 
 @login_required
+@replica_reads
 def health_dashboard(request):
     """
     View function to display the health dashboard.
@@ -26,85 +31,139 @@ def health_dashboard(request):
     else:
         form = HealthMetricForm()
 
-    # Define MAP (Mean Arterial Pressure) calculation expression
-    map_expr = ExpressionWrapper(
-        (F('blood_pressure_systolic') + 2 * F('blood_pressure_diastolic')) / 3.0,
-        output_field=FloatField()
-    )
+    # Everything below the form only changes when the user's data does, so it is cached
+    today = datetime.date.today()
+    context = dict(cached_context(
+        'health', request.user, lambda: _build_dashboard_context(request.user, today), today,
+    ))
+    context['form'] = form
+
+    # The edit tab loads its entries from the entries API when first opened; only
+    # render its first page here when the page opens on that tab
+    start_date_filter = request.GET.get('start_date')
+    end_date_filter = request.GET.get('end_date')
+    context['entries'] = None
+    if request.GET.get('active_tab') == 'edit' or start_date_filter or end_date_filter:
+        start, end = _parse_date_filter(start_date_filter, end_date_filter)
+        page = cached_context(
+            'health_entries', request.user, lambda: entries_page(request.user, start, end), start, end,
+        )
+        context['entries'] = page['results']
+        context['entries_next'] = page['next']
+    return render(request, 'health/health_dashboard.html', context)
+
+
+@login_required
+@replica_reads
+async def ahealth_dashboard(request):
+    """
+    Async variant of health_dashboard, served when the project runs under
+    ASGI (see settings.ASYNC_DASHBOARDS). New entries are still saved by the
+    sync view.
+    """
+    if request.method == 'POST':
+        return await sync_to_async(health_dashboard)(request)
 
-    # Aggregate metrics by date for the current user
-    aggregated = HealthMetric.objects.filter(
-        user=request.user,
-        calories_intake__isnull=False,  # Avoid None values
-        physical_activity_minutes__isnull=False,
-        heart_rate__isnull=False,  # Add similar filters if needed
-    ).values('date').annotate(
-        avg_weight=Avg('weight'),
-        sum_calories=Sum('calories_intake'),
-        sum_activity=Sum('physical_activity_minutes'),
-        avg_map=Avg(map_expr),
-        avg_hr=Avg('heart_rate')
-    ).order_by('date')
-
-    # Extract aggregated data for dashboard graphs
-    agg_dates = [entry['date'].strftime('%Y-%m-%d') for entry in aggregated]
-    agg_weight = [entry['avg_weight'] for entry in aggregated]
-    agg_weight_lbs = [round(w * 2.20462, 2) if w is not None else None for w in agg_weight]
-    agg_calories = [entry['sum_calories'] for entry in aggregated]
-    agg_activity = [entry['sum_activity'] for entry in aggregated]
-    agg_map = [entry['avg_map'] for entry in aggregated]
-    agg_hr = [entry['avg_hr'] for entry in aggregated]
-
-    # Calculate overall averages for statistics display
-    overall_weight = (sum([w for w in agg_weight_lbs if w is not None]) /
-                      len([w for w in agg_weight_lbs if w is not None])) if agg_weight_lbs else 0
-    # Filter out None values
-    filtered_calories = [cal for cal in agg_calories if cal is not None]
-
-    # Calculate sum and average
-    overall_calories = sum(filtered_calories) / len(filtered_calories) if filtered_calories else 0
-    filtered_activity = [act for act in agg_activity if act is not None]
-    overall_activity = sum(filtered_activity) / len(filtered_activity) if filtered_activity else 0
-
-    filtered_map = [map_val for map_val in agg_map if map_val is not None]
-    overall_map = sum(filtered_map) / len(filtered_map) if filtered_map else 0
-
-    filtered_hr = [hr for hr in agg_hr if hr is not None]
-    overall_hr = sum(filtered_hr) / len(filtered_hr) if filtered_hr else 0
-
-    # Constants for comparison
-    NATIONAL_AVG_HR = 70
-    NATIONAL_AVG_MAP = 93
+    user = await request.auser()
+    today = datetime.date.today()
+    summary = acached_context('health', user, lambda: _abuild_dashboard_context(user, today), today)
+
+    # The edit tab's first page is independent of the summary, so both are fetched together
+    start_date_filter = request.GET.get('start_date')
+    end_date_filter = request.GET.get('end_date')
+    if request.GET.get('active_tab') == 'edit' or start_date_filter or end_date_filter:
+        start, end = _parse_date_filter(start_date_filter, end_date_filter)
+        page = acached_context(
+            'health_entries', user, sync_to_async(lambda: entries_page(user, start, end)), start, end,
+        )
+        summary, page = await asyncio.gather(summary, page)
+    else:
+        summary, page = await summary, None
+
+    context = dict(summary)
+    context['form'] = HealthMetricForm()
+    context['entries'] = None
+    if page is not None:
+        context['entries'] = page['results']
+        context['entries_next'] = page['next']
+    # Rendering runs context processors that may touch the session and user, which is sync-only
+    return await sync_to_async(render)(request, 'health/health_dashboard.html', context)
+
+
+def _parse_date_filter(start_date_filter, end_date_filter):
+    """
+    Return the (start, end) dates of the edit tab's filter, or (None, None)
+    unless both are given and valid.
+    """
+    if not (start_date_filter and end_date_filter):
+        return None, None
+    try:
+        return (
+            datetime.datetime.strptime(start_date_filter, '%Y-%m-%d').date(),
+            datetime.datetime.strptime(end_date_filter, '%Y-%m-%d').date(),
+        )
+    except ValueError:
+        return None, None
+
+
+def _build_dashboard_context(user, today):
+    """
+    Compute the health dashboard's averages and feedback for a user. The
+    result depends only on the user's data and the date, which lets
+    health_dashboard cache it.
+    """
+    # Averages and latest values come straight from the rollups (the charts fetch the series from the series API)
+    return _context_from_summary(summary(user), today)
+
+
+async def _abuild_dashboard_context(user, today):
+    """
+    Async variant of _build_dashboard_context().
+    """
+    return _context_from_summary(await asummary(user), today)
+
+
+def _context_from_summary(averages, today):
+    """
+    Build the dashboard's averages and feedback from summary() output.
+    """
+    overall_weight, latest_weight = averages['weight']
+    overall_calories, latest_calories = averages['calories']
+    overall_activity, latest_activity = averages['activity']
+    overall_map, latest_map = averages['map']
+    overall_hr, latest_hr = averages['hr']
+
+    # Overall averages for statistics display (0 when nothing was recorded)
+    overall_weight = overall_weight or 0
+    overall_calories = overall_calories or 0
+    overall_activity = overall_activity or 0
+    overall_map = overall_map or 0
+    overall_hr = overall_hr or 0
 
     # Generate feedback based on health metrics
     feedback_map = ""
-    if agg_map and overall_map:
-        latest_map = agg_map[-1]
+    if latest_map is not None and overall_map:
         feedback_map = (
             "Your MAP is trending above your average—consider stress reduction and a consult if this continues."
             if latest_map > overall_map else "Your MAP is within a healthy range.")
 
     feedback_weight = ""
-    if agg_weight_lbs and overall_weight:
-        latest_weight = agg_weight_lbs[-1]
+    if latest_weight is not None and overall_weight:
         feedback_weight = ("Your weight is trending upward; review your diet and exercise."
                            if latest_weight > overall_weight else "Your weight appears stable.")
 
     feedback_hr = ""
-    if agg_hr and overall_hr:
-        latest_hr = agg_hr[-1]
+    if latest_hr is not None and overall_hr:
         feedback_hr = ("Your heart rate is higher than average; consider aerobic exercise and stress management."
                        if latest_hr > overall_hr else "Your heart rate is within normal range.")
 
     feedback_calories = ""
-    if agg_calories and overall_calories:
-        latest_calories = agg_calories[-1]
+    if latest_calories is not None and overall_calories:
         feedback_calories = ("Your calorie intake is higher than average; adjust portion sizes if needed."
                              if latest_calories > overall_calories else "Your calorie intake is consistent.")
 
     feedback_activity = ""
-    if agg_activity and overall_activity:
-        latest_activity = agg_activity[-1]
+    if latest_activity is not None and overall_activity:
         feedback_activity = ("Your physical activity is lower than average; try to increase daily movement."
                              if latest_activity < overall_activity else "Your activity level is consistent.")
 
@@ -117,48 +176,11 @@ def health_dashboard(request):
         f"<strong>Activity:</strong> {feedback_activity}"
     )
 
-    # Handle filtering for health entries (date range)
-    start_date_filter = request.GET.get('start_date')
-    end_date_filter = request.GET.get('end_date')
-    try:
-        if start_date_filter and end_date_filter:
-            start_date_obj = datetime.datetime.strptime(start_date_filter, '%Y-%m-%d').date()
-            end_date_obj = datetime.datetime.strptime(end_date_filter, '%Y-%m-%d').date()
-            entries = HealthMetric.objects.filter(
-                user=request.user, date__gte=start_date_obj, date__lte=end_date_obj).order_by('date')
-        else:
-            entries = HealthMetric.objects.filter(user=request.user).order_by('date')
-    except ValueError:
-        entries = HealthMetric.objects.filter(user=request.user).order_by('date')
-
-    # Prepare individual metrics for chart rendering
-    entries_list = list(entries)
-    individual_weight = [
-        {"x": entry.date.strftime("%Y-%m-%d"), "y": round(entry.weight * 2.20462, 2)}
-        for entry in entries_list if entry.weight is not None
-    ]
-    individual_hr = [
-        {"x": entry.date.strftime("%Y-%m-%d"), "y": entry.heart_rate}
-        for entry in entries_list if entry.heart_rate is not None
-    ]
-    individual_map = [
-        {"x": entry.date.strftime("%Y-%m-%d"),
-         "y": round((entry.blood_pressure_systolic + 2 * entry.blood_pressure_diastolic) / 3.0, 2)}
-        for entry in entries_list if entry.blood_pressure_systolic and entry.blood_pressure_diastolic
-    ]
-
     # Add current date for date range filtering in the frontend
-    current_date = datetime.date.today().strftime('%Y-%m-%d')
-
-    # Context data to render
-    context = {
-        'form': form,
-        'agg_dates': json.dumps(agg_dates),
-        'agg_weight_lbs': json.dumps(agg_weight_lbs),
-        'agg_calories': json.dumps(agg_calories),
-        'agg_activity': json.dumps(agg_activity),
-        'agg_map': json.dumps(agg_map),
-        'agg_hr': json.dumps(agg_hr),
+    current_date = today.strftime('%Y-%m-%d')
+
+    # Context data to render (the entry form is added by the view)
+    return {
         'overall_weight': overall_weight,
         'overall_calories': overall_calories,
         'overall_activity': overall_activity,
@@ -167,13 +189,8 @@ def health_dashboard(request):
         'national_avg_hr': NATIONAL_AVG_HR,
         'national_avg_map': NATIONAL_AVG_MAP,
         'feedback': detailed_feedback,
-        'entries': entries_list,
-        'individual_weight': json.dumps(individual_weight),
-        'individual_hr': json.dumps(individual_hr),
-        'individual_map': json.dumps(individual_map),
         'current_date': current_date,
     }
-    return render(request, 'health/health_dashboard.html', context)
 
 
 @login_required
@@ -0,0 +1,100 @@
+"""
+Shared pieces for the chart-series API endpoints.
+
+Series endpoints take optional ?start= and ?end= dates and a ?bucket= of
+day, week or month (see healthy_you/buckets.py), and are downsampled to
+settings.CHART_POINT_BUDGET points unless ?points= or ?raw=1 says otherwise
+(see healthy_you/downsample.py). They answer conditional GETs: the
+ETag and Last-Modified headers come from the user's dashboard data version
+(see healthy_you/cache.py), which changes on every write to their data, so
+an unchanged series is revalidated with a 304.
+"""
+
+import datetime
+from functools import wraps
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from rest_framework import serializers
+from .buckets import BUCKETS
+from .cache import caching_enabled, get_data_version
+from .downsample import point_budget
+
+
+class DateRangeSerializer(serializers.Serializer):
+    """
+    Validates the optional start and end query parameters of a series endpoint.
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if 'start' in attrs and 'end' in attrs and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must be on or before end.")
+        return attrs
+
+
+class SeriesQuerySerializer(DateRangeSerializer):
+    """
+    Validates a series endpoint's date range, bucket and downsampling parameters.
+    """
+    points = serializers.IntegerField(required=False, min_value=3, max_value=100000)
+    raw = serializers.BooleanField(required=False, default=False)
+    bucket = serializers.ChoiceField(choices=BUCKETS, required=False, default='day')
+
+
+def series_query(request, default_start=None, default_end=None):
+    """
+    Return (start, end, budget, bucket) for a series request. budget is the
+    number of points to downsample to, or None when ?raw=1 asks for every point.
+    """
+    serializer = SeriesQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    budget = None if data['raw'] else data.get('points', point_budget())
+    return data.get('start', default_start), data.get('end', default_end), budget, data['bucket']
+
+
+def _version(request):
+    """
+    Return the requesting user's data version, or None for anonymous requests
+    and when other workers could not see the version change.
+    """
+    if not request.user.is_authenticated or not caching_enabled():
+        return None
+    return get_data_version(request.user.pk)
+
+
+def user_data_condition(daily=False):
+    """
+    Decorate a series view so it answers conditional GETs from the user's data version.
+
+    Set daily for views whose default window ends today, so their validators
+    also change at midnight. Responses are marked private and must be
+    revalidated, which lets the browser keep them but never serve stale data.
+    """
+    def etag(request, *args, **kwargs):
+        version = _version(request)
+        if version is None:
+            return None
+        return f"{version}-{datetime.date.today():%Y%m%d}" if daily else str(version)
+
+    def last_modified(request, *args, **kwargs):
+        version = _version(request)
+        if version is None:
+            return None
+        modified = datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc)
+        if daily:
+            midnight = datetime.datetime.combine(datetime.date.today(), datetime.time(), tzinfo=datetime.timezone.utc)
+            modified = max(modified, midnight)
+        return modified
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
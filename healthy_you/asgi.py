@@ -5,6 +5,11 @@ This file exposes the ASGI callable as a module-level variable named `applicatio
 ASGI (Asynchronous Server Gateway Interface) is used for serving your project
 asynchronously and is necessary for supporting asynchronous frameworks and features.
 
+Run it with an ASGI server such as uvicorn (pinned in requirements.txt;
+Procfile.asgi.txt starts it in place of waitress):
+
+    uvicorn healthy_you.asgi:application --port 8000
+
 For more information, see:
 https://docs.djangoproject.com/en/stable/howto/deployment/asgi/
 """
@@ -15,5 +20,8 @@ from django.core.asgi import get_asgi_application
 # Set the default Django settings module for the 'asgi' environment
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthy_you.settings')
 
+# Serve the dashboards from their async views (settings.ASYNC_DASHBOARDS)
+os.environ.setdefault('DJANGO_ASYNC_DASHBOARDS', 'True')
+
 # Get the ASGI application callable
 application = get_asgi_application()
@@ -0,0 +1,37 @@
+"""
+Calendar buckets for chart series.
+
+Series endpoints take ?bucket=day|week|month. Rows are grouped in the
+database: week and month buckets truncate the date with TruncWeek and
+TruncMonth, which Django translates to date_trunc() on PostgreSQL and to its
+own registered functions on SQLite, so the same query runs on both. Each
+bucket is labelled with its first day; weeks start on Monday.
+"""
+
+from django.db.models import F
+from django.db.models.functions import TruncMonth, TruncWeek
+
+BUCKETS = ('day', 'week', 'month')
+
+_TRUNC = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def bucket_expression(bucket, field='date'):
+    """
+    Return the expression labelling a row with the first day of its bucket.
+    """
+    if bucket == 'day':
+        return F(field)
+    return _TRUNC[bucket](field)
+
+
+def bucketed(queryset, bucket, **aggregates):
+    """
+    Group a queryset's rows by bucket and annotate each group with the given
+    aggregates. Returns a values() queryset of {'period': first day, **aggregates},
+    ordered by period.
+    """
+    return queryset.values(period=bucket_expression(bucket)).annotate(**aggregates).order_by('period')
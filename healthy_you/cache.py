@@ -0,0 +1,223 @@
+"""
+Per-user, versioned cache for dashboard contexts.
+
+Each user has a data version stored in the cache. The signal handlers in the
+apps bump it whenever one of that user's tracked rows is saved or deleted,
+so dashboard results cached under the previous version are never read again
+and simply age out. Repeated dashboard views between writes are served from
+the cache without touching the database.
+
+Works with any Django cache backend (LocMemCache, FileBasedCache, Redis, ...)
+configured under settings.DASHBOARD_CACHE_ALIAS, as long as every web process
+shares it: a version bumped in one process must be seen by all of them. When
+settings.WEB_CONCURRENCY runs several workers on a process-local backend,
+caching_enabled() is False and dashboards are computed on every request. The
+async views use the a-prefixed variants, which go through the backend's async API.
+"""
+
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Dashboards whose hit and miss counters are reported by cache_stats()
+DASHBOARDS = ('health', 'sleep', 'reports', 'goals', 'medications')
+
+# Backends whose entries live in one process's memory
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def dashboard_cache():
+    """
+    Return the cache backend used for dashboard contexts.
+    """
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def shared_by_workers(alias):
+    """
+    Return False when the cache `alias` is process-local and
+    settings.WEB_CONCURRENCY runs several web workers, each with its own copy.
+    """
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    return backend not in PROCESS_LOCAL_BACKENDS or getattr(settings, 'WEB_CONCURRENCY', 1) <= 1
+
+
+def caching_enabled():
+    """
+    Return False when the dashboard cache cannot be shared by the web workers,
+    so a write in one worker would leave the others serving stale dashboards.
+    """
+    return shared_by_workers(getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default'))
+
+
+def _version_key(user_id):
+    return f"dashboard:version:{user_id}"
+
+
+def get_data_version(user_id):
+    """
+    Return the user's current data version, creating one if the cache has none.
+    cache.add() keeps concurrent first requests from picking different versions.
+    """
+    cache = dashboard_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+async def aget_data_version(user_id):
+    """
+    Async variant of get_data_version().
+    """
+    cache = dashboard_cache()
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def bump_data_version(user_id):
+    """
+    Move the user to a new data version, invalidating every cached dashboard for them.
+    Returns the new version, which is also a nanosecond timestamp of the change.
+    """
+    if user_id is None:
+        return None
+    version = time.time_ns()
+    dashboard_cache().set(_version_key(user_id), version, timeout=None)
+    return version
+
+
+def invalidate_dashboards(user_id):
+    """
+    Bump the user's data version now and again once the current transaction
+    commits. The second bump discards anything a concurrent request cached
+    from the database before the change became visible to it.
+    """
+    if user_id is None:
+        return
+    bump_data_version(user_id)
+    transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+def _record(name, outcome):
+    """
+    Increment the hit or miss counter for a dashboard.
+    """
+    cache = dashboard_cache()
+    key = f"dashboard:stats:{outcome}:{name}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add() and incr(); start it again
+        cache.set(key, 1, timeout=None)
+
+
+async def _arecord(name, outcome):
+    """
+    Async variant of _record().
+    """
+    cache = dashboard_cache()
+    key = f"dashboard:stats:{outcome}:{name}"
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout=None)
+
+
+def cache_stats(names=DASHBOARDS):
+    """
+    Return {dashboard: {'hits': n, 'misses': n}} for the given dashboards.
+    """
+    cache = dashboard_cache()
+    return {
+        name: {
+            'hits': cache.get(f"dashboard:stats:hits:{name}", 0),
+            'misses': cache.get(f"dashboard:stats:misses:{name}", 0),
+        }
+        for name in names
+    }
+
+
+def reset_cache_stats(names=DASHBOARDS):
+    """
+    Reset the hit and miss counters for the given dashboards.
+    """
+    dashboard_cache().delete_many(
+        [f"dashboard:stats:{outcome}:{name}" for name in names for outcome in ('hits', 'misses')]
+    )
+
+
+def _context_key(name, user, version, extra):
+    digest = hashlib.md5(repr(extra).encode(), usedforsecurity=False).hexdigest()
+    return f"dashboard:{name}:{user.pk}:{version}:{digest}"
+
+
+def cached_context(name, user, build, *extra):
+    """
+    Return the context for a user's dashboard, calling build() only on a miss.
+
+    The key combines the dashboard name, the user, their current data version
+    and any extra values the context depends on (today's date, query string
+    filters, ...). The version is read before building, so a write that lands
+    mid-build moves the user to a newer version and is picked up next time.
+    """
+    if not caching_enabled():
+        return build()
+    cache = dashboard_cache()
+    key = _context_key(name, user, get_data_version(user.pk), extra)
+
+    context = cache.get(key)
+    if context is not None:
+        _record(name, 'hits')
+        return context
+
+    _record(name, 'misses')
+    context = build()
+    cache.set(key, context, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 3600))
+    return context
+
+
+async def acached_context(name, user, build, *extra):
+    """
+    Async variant of cached_context(), for async views; build is a coroutine
+    function, awaited only on a miss. Entries are shared with cached_context().
+    """
+    if not caching_enabled():
+        return await build()
+    cache = dashboard_cache()
+    key = _context_key(name, user, await aget_data_version(user.pk), extra)
+
+    context = await cache.aget(key)
+    if context is not None:
+        await _arecord(name, 'hits')
+        return context
+
+    await _arecord(name, 'misses')
+    context = await build()
+    await cache.aset(key, context, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 3600))
+    return context
+
+
+def is_cascade_delete(sender, origin):
+    """
+    Return True when a post_delete signal comes from deleting a different
+    model's row (for example, a user or medication deleting its children).
+    That parent's own handler bumps the version, so the children can skip it.
+    """
+    if origin is None:
+        return False
+    # origin is the deleted model instance, or the QuerySet that was deleted
+    model = origin._meta.model if hasattr(origin, '_meta') else origin.model
+    return model is not sender
@@ -0,0 +1,24 @@
+"""
+Celery application for background jobs.
+
+Configuration is read from the CELERY_* settings, and each app's tasks.py is
+discovered automatically. Run a worker and the beat scheduler with:
+
+    celery -A healthy_you worker -l info
+    celery -A healthy_you beat -l info
+
+Tasks go to the broker in CELERY_BROKER_URL (Redis in production). When it
+is not set, the in-memory transport is used and tasks run eagerly, in the
+calling process, so everything works locally without Redis. Set
+CELERY_TASK_ALWAYS_EAGER=False to queue on the in-memory transport instead,
+for a worker started in the same process (as the tests do).
+"""
+
+import os
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthy_you.settings')
+
+app = Celery('healthy_you')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,172 @@
+"""
+Database configuration.
+
+settings.DATABASES is built from the environment: DJANGO_DB_ENGINE selects
+"sqlite" (the default) or "postgresql"; see the settings file for the other
+variables. The app's queries are written with the ORM only, so they run
+unchanged on either backend.
+
+sqlite_database() builds a DATABASES entry whose connections are tuned when
+they are opened:
+
+* journal_mode=WAL lets readers keep reading while a writer commits, and a
+  writer proceed while readers hold snapshots,
+* synchronous=NORMAL syncs only at checkpoints, which is safe in WAL mode
+  (a power cut can lose the last commits, never corrupt the file),
+* mmap_size and cache_size keep hot pages in memory,
+* busy_timeout makes a blocked writer wait for the lock instead of failing
+  at once with "database is locked",
+* transactions start with BEGIN IMMEDIATE, so a transaction that reads and
+  then writes takes the write lock up front; a deferred transaction that
+  has to upgrade its lock fails immediately, whatever the busy timeout.
+
+stress() runs concurrent readers and writers against a scratch database file
+and reports what blocked or failed, for comparing configurations.
+"""
+
+import sqlite3
+import statistics
+import threading
+import time
+
+# Pragmas run on every new connection, in order
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # Bytes of the file mapped into memory
+    'cache_size': -64000,  # Negative values are KiB: about 64 MB of page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+BUSY_TIMEOUT_MS = 5000
+
+
+def sqlite_pragmas(busy_timeout_ms=BUSY_TIMEOUT_MS, **overrides):
+    """
+    Return the pragma statements for a new connection, with any PRAGMAS
+    values replaced by keyword arguments.
+    """
+    pragmas = {**PRAGMAS, **overrides, 'busy_timeout': busy_timeout_ms}
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+
+def sqlite_database(name, busy_timeout_ms=BUSY_TIMEOUT_MS, conn_max_age=600, **pragmas):
+    """
+    Return a settings.DATABASES entry for the SQLite file at `name`, with the
+    tuning described in the module docstring and persistent connections kept
+    for `conn_max_age` seconds.
+    """
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            'init_command': '; '.join(sqlite_pragmas(busy_timeout_ms, **pragmas)),
+            'transaction_mode': 'IMMEDIATE',
+            # The sqlite3 module's own busy handler, in seconds; kept in step with busy_timeout
+            'timeout': busy_timeout_ms / 1000,
+        },
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+
+def postgresql_database(name, user='', password='', host='', port='', conn_max_age=600):
+    """
+    Return a settings.DATABASES entry for a PostgreSQL database, with
+    persistent connections kept for `conn_max_age` seconds. Needs psycopg.
+    """
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': name,
+        'USER': user,
+        'PASSWORD': password,
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+
+def _connect(path, pragmas, timeout):
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    for statement in pragmas:
+        conn.execute(statement)
+    return conn
+
+
+def stress(path, tuned=True, readers=4, writers=4, seconds=2.0, write_hold=0.002):
+    """
+    Hammer a scratch SQLite file with concurrent readers and writers for
+    `seconds`, configured with the tuning above (tuned=True) or with SQLite's
+    defaults (rollback journal, deferred transactions). Each write is a
+    read-then-insert transaction held open for `write_hold` seconds, like a
+    form post; each read aggregates the table, like a dashboard.
+
+    Returns {'reads', 'writes', 'read_errors', 'write_errors', 'read_p50_ms',
+    'read_max_ms'}.
+    """
+    if tuned:
+        pragmas, begin = sqlite_pragmas(), 'BEGIN IMMEDIATE'
+    else:
+        pragmas, begin = ['PRAGMA journal_mode = DELETE'], 'BEGIN'
+    timeout = BUSY_TIMEOUT_MS / 1000
+
+    setup = _connect(path, pragmas, timeout)
+    setup.execute('CREATE TABLE IF NOT EXISTS metric (id INTEGER PRIMARY KEY, user_id INTEGER, value REAL)')
+    setup.executemany('INSERT INTO metric (user_id, value) VALUES (?, ?)', [(i % 50, i) for i in range(10000)])
+    setup.close()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    read_times = []
+
+    def count(name, n=1):
+        with lock:
+            counts[name] += n
+
+    def read_loop():
+        conn = _connect(path, pragmas, timeout)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                conn.execute('SELECT user_id, COUNT(*), AVG(value) FROM metric GROUP BY user_id').fetchall()
+            except sqlite3.OperationalError:
+                count('read_errors')
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                read_times.append(elapsed)
+            count('reads')
+        conn.close()
+
+    def write_loop(worker):
+        conn = _connect(path, pragmas, timeout)
+        while not stop.is_set():
+            try:
+                conn.execute(begin)
+                conn.execute('SELECT COUNT(*) FROM metric WHERE user_id = ?', (worker,)).fetchone()
+                time.sleep(write_hold)
+                conn.execute('INSERT INTO metric (user_id, value) VALUES (?, ?)', (worker, time.time()))
+                conn.execute('COMMIT')
+                count('writes')
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                count('write_errors')
+        conn.close()
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(worker,)) for worker in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        **counts,
+        'read_p50_ms': round(statistics.median(read_times) * 1000, 2) if read_times else None,
+        'read_max_ms': round(max(read_times) * 1000, 2) if read_times else None,
+    }
@@ -0,0 +1,113 @@
+"""
+Downsampling for chart series.
+
+Long series are reduced to a point budget with Largest-Triangle-Three-Buckets
+(LTTB), which keeps the first and last points and, from each bucket in
+between, the point forming the largest triangle with its neighbours. Peaks,
+dips and the overall shape survive while Chart.js gets a bounded number of
+points to draw.
+"""
+
+import datetime
+from django.conf import settings
+
+DEFAULT_POINT_BUDGET = 500
+
+
+def point_budget():
+    """
+    Return the configured maximum number of points per chart series.
+    """
+    return getattr(settings, 'CHART_POINT_BUDGET', DEFAULT_POINT_BUDGET)
+
+
+def lttb(xs, ys, threshold):
+    """
+    Return the indices of the points LTTB keeps when reducing (xs, ys) to
+    `threshold` points. xs must be sorted ascending. Series that already fit,
+    and thresholds below 3, keep every index.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    # Bucket width for the n - 2 points between the fixed first and last points
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of each candidate triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        # Keep the point in this bucket with the largest triangle area
+        ax, ay = xs[a], ys[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
+
+
+def _day_number(value):
+    """
+    Turn an ISO date string (or a date) into a number usable as an LTTB x value.
+    """
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value)
+    return value.toordinal()
+
+
+def downsample_series(dates, values, budget):
+    """
+    Reduce a line series given as parallel date and value lists to at most
+    `budget` points. Days without a value are dropped from a reduced series;
+    series within budget are returned unchanged. Returns (dates, values).
+    """
+    if budget is None or len(dates) <= budget:
+        return dates, values
+
+    present = [i for i, value in enumerate(values) if value is not None]
+    xs = [_day_number(dates[i]) for i in present]
+    ys = [values[i] for i in present]
+    keep = [present[i] for i in lttb(xs, ys, budget)]
+    return [dates[i] for i in keep], [values[i] for i in keep]
+
+
+def downsample_points(points, budget):
+    """
+    Reduce scatter points given as [{'x': date, 'y': value}, ...] (sorted by date)
+    to at most `budget` points.
+    """
+    if budget is None or len(points) <= budget:
+        return points
+
+    xs = [_day_number(point['x']) for point in points]
+    ys = [point['y'] for point in points]
+    return [points[i] for i in lttb(xs, ys, budget)]
+
+
+def downsample_payload(payload, budget):
+    """
+    Apply the point budget to a series API payload: its dates/values line and,
+    when present, its individual points. Adds 'downsampled' to say whether
+    anything was dropped.
+    """
+    payload = dict(payload)
+    dates, values = downsample_series(payload['dates'], payload['values'], budget)
+    downsampled = len(dates) != len(payload['dates'])
+    payload['dates'], payload['values'] = dates, values
+    if 'points' in payload:
+        points = downsample_points(payload['points'], budget)
+        downsampled = downsampled or len(points) != len(payload['points'])
+        payload['points'] = points
+    payload['downsampled'] = downsampled
+    return payload
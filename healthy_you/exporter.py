@@ -0,0 +1,99 @@
+"""
+Streaming export of querysets as CSV, NDJSON or a zip bundle.
+
+Rows are read with values_list().iterator(), which fetches them from the
+database in chunks, and each row is encoded and handed to the response as
+soon as it is read. Nothing holds more than one chunk of rows at a time, so
+memory use does not grow with the size of the export.
+"""
+
+import csv
+import io
+import json
+import zipfile
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = ('csv', 'ndjson')
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'zip': 'application/zip',
+}
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, so csv.writer encodes
+    one row at a time for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    Yield the queryset as UTF-8 CSV: a header row of field names, then one line per row.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields).encode('utf-8')
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        yield writer.writerow(row).encode('utf-8')
+
+
+def ndjson_lines(queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    Yield the queryset as UTF-8 NDJSON, one JSON object per row.
+    """
+    encoder = DjangoJSONEncoder()
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        yield (encoder.encode(dict(zip(fields, row))) + '\n').encode('utf-8')
+
+
+ENCODERS = {
+    'csv': csv_lines,
+    'ndjson': ndjson_lines,
+}
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    Write-only, unseekable buffer that ZipFile writes into. drain() hands
+    over whatever has been written so far, so the archive can be streamed
+    while it is being built.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def zip_stream(members):
+    """
+    Yield a zip archive built from (filename, iterable of bytes) members.
+    The archive is never seeked, so ZipFile records sizes in data descriptors
+    after each member and nothing is buffered beyond the current write.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, chunks in members:
+            with archive.open(filename, 'w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
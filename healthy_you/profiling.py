@@ -0,0 +1,366 @@
+"""
+Per-request profiling.
+
+ProfilingMiddleware profiles a sample of requests (settings.REQUEST_PROFILING
+and REQUEST_PROFILING_SAMPLE_RATE), plus any request from a staff user that
+sends the REQUEST_PROFILING_HEADER header. For a profiled request it records
+wall time, SQL query count and time, repeated identical queries (the N+1
+pattern) and template render time, then:
+
+* adds a Server-Timing header, which browser dev tools show per request,
+* logs one JSON line to the "healthy_you.profiling" logger,
+* adds the request to a per-view histogram kept in the cache, which staff
+  can read as JSON from profiling_stats. Like the dashboard cache, this is
+  skipped when the cache is process-local and several workers run.
+
+Requests that are not profiled pass straight through. The middleware runs
+natively under both WSGI and ASGI, so async views are not moved to a thread.
+"""
+
+import contextvars
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.db import connections
+from django.http import JsonResponse
+from django.template.backends.django import DjangoTemplates
+from .cache import shared_by_workers
+
+logger = logging.getLogger('healthy_you.profiling')
+
+# Upper bounds (ms) of the wall-time histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Totals kept per view, in integer units the cache can increment
+TOTALS = ('requests', 'wall_us', 'sql_us', 'queries', 'duplicates', 'template_us')
+
+# Number of views registered so far; view N's name is stored under profiling:views:N
+VIEW_COUNT_KEY = 'profiling:views'
+
+_active = contextvars.ContextVar('request_profile', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _stats_cache():
+    return caches[_setting('REQUEST_PROFILING_CACHE_ALIAS', 'default')]
+
+
+def stats_enabled():
+    """
+    Return False when the stats cache is process-local under several workers,
+    where each would keep its own histogram and profiling_stats would show
+    whichever worker answered.
+    """
+    return shared_by_workers(_setting('REQUEST_PROFILING_CACHE_ALIAS', 'default'))
+
+
+class RequestProfile:
+    """
+    Measurements for one profiled request. Also a database execute wrapper,
+    so it sees every query the request runs.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self.sql = 0.0
+        self.queries = Counter()
+        self.template = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries[sql] += 1
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicates(self):
+        """
+        Number of queries that repeated an earlier query's SQL in this request.
+        """
+        return sum(count - 1 for count in self.queries.values())
+
+    def repeated(self, threshold):
+        """
+        Return [(sql, count), ...] for statements run at least `threshold` times, most frequent first.
+        """
+        return [(sql, count) for sql, count in self.queries.most_common() if count >= threshold]
+
+    def server_timing(self):
+        """
+        Return the Server-Timing header value for this request.
+        """
+        return ', '.join((
+            f'total;dur={self.wall * 1000:.1f}',
+            f'sql;dur={self.sql * 1000:.1f};desc="{self.query_count} queries, {self.duplicates} duplicate"',
+            f'tpl;dur={self.template * 1000:.1f}',
+        ))
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend that adds each top-level render's time to the
+    active request profile. Includes and extends render inside the engine,
+    so they are counted once as part of their parent.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    """
+    Wraps a backend template, timing render() when a request is being profiled.
+    """
+
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        profile = _active.get()
+        if profile is None:
+            return self._wrapped.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            profile.template += time.perf_counter() - started
+
+
+def _bucket(wall_ms):
+    for index, bound in enumerate(BUCKETS_MS):
+        if wall_ms <= bound:
+            return index
+    return len(BUCKETS_MS)
+
+
+def _incr(cache, key, delta):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, delta, timeout=None)
+
+
+def _register(cache, view):
+    """
+    Give a view its numbered slot the first time it is recorded. Only the
+    request whose add() succeeds takes a slot, and incr() hands out distinct
+    numbers, so concurrent first requests for different views all survive.
+    """
+    if cache.add(f"profiling:view:{view}", True, timeout=None):
+        cache.add(VIEW_COUNT_KEY, 0, timeout=None)
+        cache.set(f"{VIEW_COUNT_KEY}:{cache.incr(VIEW_COUNT_KEY)}", view, timeout=None)
+
+
+def _registered(cache):
+    count = cache.get(VIEW_COUNT_KEY, 0)
+    return set(cache.get_many([f"{VIEW_COUNT_KEY}:{number}" for number in range(1, count + 1)]).values())
+
+
+def record(view, profile):
+    """
+    Add a finished request to its view's totals and wall-time histogram.
+    """
+    if not stats_enabled():
+        return
+    cache = _stats_cache()
+    _register(cache, view)
+    values = {
+        'requests': 1,
+        'wall_us': round(profile.wall * 1e6),
+        'sql_us': round(profile.sql * 1e6),
+        'queries': profile.query_count,
+        'duplicates': profile.duplicates,
+        'template_us': round(profile.template * 1e6),
+    }
+    for name, value in values.items():
+        _incr(cache, f"profiling:{view}:{name}", value)
+    _incr(cache, f"profiling:{view}:bucket:{_bucket(profile.wall * 1000)}", 1)
+
+
+def view_stats():
+    """
+    Return {view: {requests, mean_wall_ms, mean_sql_ms, mean_queries,
+    mean_duplicates, mean_template_ms, histogram: {"<=5ms": n, ...}}}.
+    """
+    cache = _stats_cache()
+    labels = [f"<={bound}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+    stats = {}
+    for view in sorted(_registered(cache)):
+        keys = [f"profiling:{view}:{name}" for name in TOTALS]
+        keys += [f"profiling:{view}:bucket:{index}" for index in range(len(labels))]
+        values = cache.get_many(keys)
+        totals = {name: values.get(f"profiling:{view}:{name}", 0) for name in TOTALS}
+        requests = totals['requests'] or 1
+        stats[view] = {
+            'requests': totals['requests'],
+            'mean_wall_ms': round(totals['wall_us'] / requests / 1000, 2),
+            'mean_sql_ms': round(totals['sql_us'] / requests / 1000, 2),
+            'mean_queries': round(totals['queries'] / requests, 2),
+            'mean_duplicates': round(totals['duplicates'] / requests, 2),
+            'mean_template_ms': round(totals['template_us'] / requests / 1000, 2),
+            'histogram': {
+                label: values.get(f"profiling:{view}:bucket:{index}", 0) for index, label in enumerate(labels)
+            },
+        }
+    return stats
+
+
+def reset_stats():
+    """
+    Forget every view's aggregated profile.
+    """
+    cache = _stats_cache()
+    count = cache.get(VIEW_COUNT_KEY, 0)
+    keys = [VIEW_COUNT_KEY] + [f"{VIEW_COUNT_KEY}:{number}" for number in range(1, count + 1)]
+    for view in _registered(cache):
+        keys.append(f"profiling:view:{view}")
+        keys += [f"profiling:{view}:{name}" for name in TOTALS]
+        keys += [f"profiling:{view}:bucket:{index}" for index in range(len(BUCKETS_MS) + 1)]
+    cache.delete_many(keys)
+
+
+class ProfilingMiddleware:
+    """
+    Profile sampled or explicitly requested requests; see the module docstring.
+    Must come after AuthenticationMiddleware, which the header check relies on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _requested(self, request):
+        header = _setting('REQUEST_PROFILING_HEADER', 'X-Profile')
+        return bool(header and request.headers.get(header))
+
+    def _sampled(self):
+        if not _setting('REQUEST_PROFILING', False):
+            return False
+        return random.random() < _setting('REQUEST_PROFILING_SAMPLE_RATE', 0.01)
+
+    def should_profile(self, request):
+        if self._requested(request) and getattr(request.user, 'is_staff', False):
+            return True
+        return self._sampled()
+
+    async def ashould_profile(self, request):
+        if self._requested(request) and getattr(await request.auser(), 'is_staff', False):
+            return True
+        return self._sampled()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _active.set(profile)
+        try:
+            with ExitStack() as stack:
+                _wrap_connections(stack, profile)
+                response = self.get_response(request)
+        finally:
+            _active.reset(token)
+            profile.wall = time.perf_counter() - profile.started
+        return self._report(request, response, profile)
+
+    async def __acall__(self, request):
+        if not await self.ashould_profile(request):
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = _active.set(profile)
+        stack = ExitStack()
+        try:
+            # Connections are per thread: wrap those of the thread the request's sync code runs in
+            await sync_to_async(_wrap_connections)(stack, profile)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _active.reset(token)
+            profile.wall = time.perf_counter() - profile.started
+        return self._report(request, response, profile)
+
+    def _report(self, request, response, profile):
+        """
+        Add the Server-Timing header, record the profile and log it.
+        """
+        # Unresolved paths share one entry so 404 probes cannot grow the histogram without bound
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+
+        response['Server-Timing'] = profile.server_timing()
+        record(view, profile)
+
+        threshold = _setting('REQUEST_PROFILING_DUPLICATE_THRESHOLD', 3)
+        repeated = profile.repeated(threshold)
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            json.dumps({
+                'view': view,
+                'method': request.method,
+                'status': response.status_code,
+                'wall_ms': round(profile.wall * 1000, 2),
+                'sql_ms': round(profile.sql * 1000, 2),
+                'queries': profile.query_count,
+                'duplicates': profile.duplicates,
+                'template_ms': round(profile.template * 1000, 2),
+                # Statements repeated often enough to suggest an N+1 query pattern
+                'repeated': [{'sql': sql[:300], 'count': count} for sql, count in repeated[:5]],
+            }),
+        )
+        return response
+
+
+def _wrap_connections(stack, profile):
+    """
+    Install the profile as an execute wrapper on the current thread's database connections.
+    """
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(profile))
+
+
+@staff_member_required
+def profiling_stats(request):
+    """
+    Return the aggregated per-view profiles as JSON (staff only). `enabled` is
+    False when no histogram is kept; see stats_enabled().
+    """
+    return JsonResponse({
+        'enabled': stats_enabled(),
+        'buckets_ms': list(BUCKETS_MS),
+        'views': view_stats(),
+    })
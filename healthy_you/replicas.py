@@ -0,0 +1,165 @@
+"""
+Read-replica routing.
+
+When settings.REPLICA_DATABASE_ALIAS names a database, views decorated with
+replica_reads send their reads there; everything else reads from the
+primary ("default"), and every write goes to the primary.
+
+A replica lags behind the primary, so a user who has just written must read
+their own writes: StickyPrimaryMiddleware marks the session after any unsafe
+request (POST, PUT, PATCH, DELETE), and replica_reads keeps that session on
+the primary for settings.STICKY_PRIMARY_SECONDS. This covers the usual
+POST-redirect-GET, where the dashboard is shown right after its form is saved.
+Both the decorator and the middleware run natively in sync and async code.
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SESSION_KEY = '_primary_until'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_alias():
+    """
+    Return the configured replica alias, or None when reads all go to the primary.
+    """
+    return getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+
+
+class ReplicaRouter:
+    """
+    Route reads inside replica_reads views to the replica and all other
+    queries to the primary. Migrations only run on the primary; the replica
+    receives its schema by replication.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _use_replica.get():
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows, so objects read from either may be related
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        return obj1._state.db in aliases and obj2._state.db in aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def is_sticky(request):
+    """
+    Return True while the request's session is pinned to the primary after a write.
+    """
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(SESSION_KEY, 0) > time.time()
+
+
+async def ais_sticky(request):
+    """
+    Async variant of is_sticky(), which loads the session without blocking the event loop.
+    """
+    session = getattr(request, 'session', None)
+    return session is not None and await session.aget(SESSION_KEY, 0) > time.time()
+
+
+def _reads_from_replica(request):
+    return replica_alias() is not None and request.method in SAFE_METHODS and not is_sticky(request)
+
+
+async def _areads_from_replica(request):
+    return replica_alias() is not None and request.method in SAFE_METHODS and not await ais_sticky(request)
+
+
+def replica_reads(view):
+    """
+    Decorate a read-only view (or the read-only GET side of one) so its
+    queries read from the replica, unless the session is sticky to the primary.
+    Works on sync and async views.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _use_replica.set(await _areads_from_replica(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _use_replica.set(_reads_from_replica(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary inside the block, e.g. to read back rows a
+    replica_reads view has just written.
+    """
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class StickyPrimaryMiddleware:
+    """
+    Pin the session to the primary for STICKY_PRIMARY_SECONDS after an unsafe
+    request by an authenticated user. Must come after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _applies(self, request):
+        return request.method not in SAFE_METHODS and replica_alias() is not None
+
+    def _pinned_until(self):
+        return time.time() + getattr(settings, 'STICKY_PRIMARY_SECONDS', 10)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if (
+            self._applies(request)
+            # Logging out leaves nothing to read back, and anonymous posts should not create sessions
+            and getattr(request, 'user', None) is not None
+            and request.user.is_authenticated
+        ):
+            request.session[SESSION_KEY] = self._pinned_until()
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._applies(request) and hasattr(request, 'auser') and (await request.auser()).is_authenticated:
+            await request.session.aset(SESSION_KEY, self._pinned_until())
+        return response
@@ -14,6 +14,9 @@ https://docs.djangoproject.com/en/stable/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
+from healthy_you.database import postgresql_database, sqlite_database
 
 load_dotenv()
 
@@ -47,6 +50,7 @@ INSTALLED_APPS = [
     'rest_framework',  # Django REST Framework for APIs
     'crispy_forms',  # Better form rendering
     'crispy_bootstrap4',  # Bootstrap 4 templates for crispy forms
+    'django_celery_beat',  # Periodic task schedules stored in the database
 
     # Custom or modular applications
     'accounts',
@@ -67,8 +71,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'healthy_you.replicas.StickyPrimaryMiddleware',  # Read-your-writes after a POST (see "Read Replica" below)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'healthy_you.profiling.ProfilingMiddleware',  # Sampled request profiling (see "Request Profiling" below)
 ]
 
 # Root URL configuration module
@@ -76,7 +82,7 @@ ROOT_URLCONF = 'healthy_you.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'healthy_you.profiling.ProfilingDjangoTemplates',  # DjangoTemplates that reports render time to the profiler
         'DIRS': [BASE_DIR / 'templates'],  # Path to custom template directory
         'APP_DIRS': True,  # Automatically locate templates inside app directories
         'OPTIONS': {
@@ -90,20 +96,72 @@ TEMPLATES = [
     },
 ]
 
-# WSGI application entry point
+# WSGI and ASGI application entry points
 WSGI_APPLICATION = 'healthy_you.wsgi.application'
+ASGI_APPLICATION = 'healthy_you.asgi.application'
+
+# Route the health, sleep and report dashboards to their async views. asgi.py
+# turns this on, since async views only pay off under an ASGI server. It has no
+# effect under waitress (Procfile.txt), which serves wsgi.py; start uvicorn
+# with Procfile.asgi.txt to use the async views.
+ASYNC_DASHBOARDS = os.getenv("DJANGO_ASYNC_DASHBOARDS", "False") == "True"
 
 # ----------------------------------------------------------------------
 # Database configuration
 # ----------------------------------------------------------------------
 
-# Default database: SQLite (for development purposes)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DJANGO_DB_ENGINE selects the backend: "sqlite" (default) or "postgresql";
+# see healthy_you/database.py
+DATABASE_ENGINE = os.getenv("DJANGO_DB_ENGINE", "sqlite")
+CONN_MAX_AGE = int(os.getenv("DJANGO_CONN_MAX_AGE", 600))  # Seconds a connection is reused; 0 closes per request
+
+if DATABASE_ENGINE == 'postgresql':
+    # PostgreSQL, configured from DJANGO_DB_NAME/USER/PASSWORD/HOST/PORT (requires psycopg)
+    DATABASES = {
+        'default': postgresql_database(
+            os.getenv("DJANGO_DB_NAME", 'healthy_you'),
+            user=os.getenv("DJANGO_DB_USER", ''),
+            password=os.getenv("DJANGO_DB_PASSWORD", ''),
+            host=os.getenv("DJANGO_DB_HOST", ''),
+            port=os.getenv("DJANGO_DB_PORT", ''),
+            conn_max_age=CONN_MAX_AGE,
+        )
     }
-}
+elif DATABASE_ENGINE == 'sqlite':
+    # SQLite, tuned for concurrent requests (WAL, pragmas, IMMEDIATE transactions
+    # and persistent connections)
+    DATABASES = {
+        'default': sqlite_database(
+            os.getenv("DJANGO_DB_NAME", BASE_DIR / 'db.sqlite3'),
+            busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+            conn_max_age=CONN_MAX_AGE,
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+            cache_size=-int(os.getenv("SQLITE_CACHE_SIZE_KB", 64000)),
+        )
+    }
+else:
+    raise ImproperlyConfigured(f"DJANGO_DB_ENGINE must be 'sqlite' or 'postgresql', not {DATABASE_ENGINE!r}.")
+
+# ----------------------------------------------------------------------
+# Read Replica
+# ----------------------------------------------------------------------
+
+# Set DJANGO_DB_REPLICA_NAME (plus DJANGO_DB_REPLICA_HOST/PORT for PostgreSQL)
+# to send dashboard and report reads to a replica of the default database;
+# see healthy_you/replicas.py. Writes always go to the primary, and a user's
+# session reads from the primary for STICKY_PRIMARY_SECONDS after each write.
+DATABASE_ROUTERS = ['healthy_you.replicas.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = None
+if os.getenv("DJANGO_DB_REPLICA_NAME"):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv("DJANGO_DB_REPLICA_NAME"),
+        'HOST': os.getenv("DJANGO_DB_REPLICA_HOST", DATABASES['default'].get('HOST', '')),
+        'PORT': os.getenv("DJANGO_DB_REPLICA_PORT", DATABASES['default'].get('PORT', '')),
+        'TEST': {'MIRROR': 'default'},  # Tests read the replica's data from the test database
+    }
+    REPLICA_DATABASE_ALIAS = 'replica'
+STICKY_PRIMARY_SECONDS = int(os.getenv("STICKY_PRIMARY_SECONDS", 10))
 
 # ----------------------------------------------------------------------
 # Password validation
@@ -150,13 +208,139 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ----------------------------------------------------------------------
+# Caching
+# ----------------------------------------------------------------------
+
+# Dashboards cache their computed context per user; see healthy_you/cache.py.
+# Set DASHBOARD_CACHE_BACKEND/LOCATION to share it between processes
+# (e.g. django.core.cache.backends.redis.RedisCache and a redis:// URL, or
+# FileBasedCache and a directory on a single host). Invalidation only reaches
+# the processes sharing the cache, so with more than one WEB_CONCURRENCY worker
+# a process-local LocMemCache turns dashboard caching and conditional GETs off.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'healthy-you',
+    },
+    'dashboards': {
+        'BACKEND': os.getenv("DASHBOARD_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("DASHBOARD_CACHE_LOCATION", 'healthy-you-dashboards'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # The dose reminder change feed; see REMINDER_CACHE_ALIAS below
+    'reminders': {
+        'BACKEND': os.getenv("REMINDER_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("REMINDER_CACHE_LOCATION", 'healthy-you-reminders'),
+    },
+    # Request profiling histograms; see REQUEST_PROFILING_CACHE_ALIAS below
+    'profiling': {
+        'BACKEND': os.getenv("REQUEST_PROFILING_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("REQUEST_PROFILING_CACHE_LOCATION", 'healthy-you-profiling'),
+    },
+}
+DASHBOARD_CACHE_ALIAS = 'dashboards'
+# Number of web worker processes; gunicorn and uvicorn take their default worker count from it too
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", 3600))  # Seconds a cached dashboard is kept
+
+# Maximum points per chart series returned by the series APIs (longer series are downsampled)
+CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", 500))
+
+# ----------------------------------------------------------------------
+# Request Profiling
+# ----------------------------------------------------------------------
+
+# Profile a random sample of requests (wall time, SQL, duplicate queries,
+# template time); see healthy_you/profiling.py. Staff can also profile any
+# request by sending the X-Profile header. Aggregates are kept in the
+# REQUEST_PROFILING_CACHE_ALIAS cache and served at /admin/profiling/. With
+# WEB_CONCURRENCY > 1 that cache must be shared (set REQUEST_PROFILING_CACHE_BACKEND
+# and LOCATION to Redis or Memcached); on the process-local default each worker
+# would keep its own histogram, so none is kept and only the logs and
+# Server-Timing headers remain.
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "False") == "True"
+REQUEST_PROFILING_SAMPLE_RATE = float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", 0.01))
+REQUEST_PROFILING_HEADER = 'X-Profile'
+REQUEST_PROFILING_DUPLICATE_THRESHOLD = 3  # Repeats of one statement that are logged as a likely N+1
+REQUEST_PROFILING_CACHE_ALIAS = 'profiling'
+
+# ----------------------------------------------------------------------
+# Logging
+# ----------------------------------------------------------------------
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per profiled request
+        'healthy_you.profiling': {
+            'handlers': ['console'],
+            'level': os.getenv("REQUEST_PROFILING_LOG_LEVEL", "INFO"),
+            'propagate': False,
+        },
+    },
+}
+
+# ----------------------------------------------------------------------
+# Medication Adherence
+# ----------------------------------------------------------------------
+
+# Maintain per-medication monthly status counters so lifetime adherence
+# does not have to count every MedicationLog row
+MEDICATION_ADHERENCE_COUNTERS = os.getenv("MEDICATION_ADHERENCE_COUNTERS", "True") == "True"
+
+# Dose reminders are emailed by `manage.py dispatch_reminders` (see
+# medications/reminders.py). Dose time changes reach it through a feed in this
+# cache, which must be shared between the web processes and the dispatcher and
+# increment atomically: set REMINDER_CACHE_BACKEND/LOCATION to a Redis or
+# Memcached server (e.g. django.core.cache.backends.redis.RedisCache and
+# redis://localhost:6379/1). On any other backend the dispatcher warns and
+# reloads every dose each --reload-interval instead; `--once` never needs the feed.
+REMINDER_CACHE_ALIAS = 'reminders'
+
 # ----------------------------------------------------------------------
 # Celery (Task Queue) Configuration
 # ----------------------------------------------------------------------
 
-# Use Redis as the Celery message broker
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+# Set CELERY_BROKER_URL (e.g. redis://localhost:6379/0) and
+# CELERY_RESULT_BACKEND to send tasks to workers. Without a broker, tasks use
+# kombu's in-memory transport and run in-process as they are called; see
+# healthy_you/celery.py.
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", 'memory://')
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", 'cache+memory://')
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", str("CELERY_BROKER_URL" not in os.environ)) == "True"
+CELERY_TASK_EAGER_PROPAGATES = True  # Eager tasks raise their exceptions to the caller
+CELERY_TIMEZONE = TIME_ZONE
+
+# Schedules are synced into django_celery_beat's tables when beat starts,
+# and can be changed from the admin afterwards
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'materialize-medication-logs': {
+        'task': 'medications.tasks.materialize_logs_parallel',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    'warm-report-snapshots': {
+        'task': 'reports.tasks.warm_report_snapshots',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'rebuild-health-rollups': {
+        'task': 'health.tasks.rebuild_health_rollups',
+        'schedule': crontab(hour=3, minute=0, day_of_week='sunday'),
+    },
+    'rebuild-adherence-counters': {
+        'task': 'medications.tasks.rebuild_adherence_counters',
+        'schedule': crontab(hour=3, minute=30, day_of_week='sunday'),
+    },
+    'send-report-digests': {
+        'task': 'reports.tasks.send_report_digests',
+        'schedule': crontab(hour=8, minute=0, day_of_week='monday'),
+    },
+}
 
 # ----------------------------------------------------------------------
 # Email Backend Configuration
@@ -0,0 +1,107 @@
+"""
+Streaming statistics helpers shared by the dashboard views.
+
+RunningStats summarizes a numeric series (count, mean, min, max, last value
+and variance) as values are pushed one at a time, for example while walking
+a queryset iterator, so the series never has to be kept. mean_of() averages
+a series that has already been built, such as a chart series, without
+making a filtered copy of it.
+"""
+
+import math
+
+
+def mean_of(values, default=0):
+    """
+    Return the mean of a list or tuple, ignoring None values, or `default`
+    when it holds none. One count() and one sum() pass, both in C, and no copy.
+    """
+    present = len(values) - values.count(None)
+    if not present:
+        return default
+    # filter(None, ...) drops zeros as well as None, which cannot change a sum
+    return sum(filter(None, values)) / present
+
+
+class RunningStats:
+    """
+    One-pass, None-aware accumulator for a numeric series.
+    None values are skipped. The mean and the sum of squared deviations are
+    updated with Welford's algorithm, which keeps the variance numerically
+    stable without a second pass.
+    """
+
+    __slots__ = ('count', 'last', 'min', 'max', '_mean', '_m2')
+
+    def __init__(self, values=None):
+        self.count = 0
+        self.last = None
+        self.min = None
+        self.max = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        if values is not None:
+            self.extend(values)
+
+    def push(self, value):
+        """
+        Add a single value to the accumulator. None is ignored.
+        Returns the value so calls can be used inline while building a series.
+        """
+        if value is None:
+            return None
+
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        if self.count == 1:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.last = value
+        return value
+
+    def extend(self, values):
+        """
+        Add every value from an iterable to the accumulator.
+        """
+        push = self.push
+        for value in values:
+            push(value)
+        return self
+
+    @property
+    def mean(self):
+        """
+        Mean of the values seen so far (None when no values were seen).
+        """
+        return self._mean if self.count else None
+
+    @property
+    def variance(self):
+        """
+        Sample variance of the values seen so far (None with fewer than two values).
+        """
+        if self.count < 2:
+            return None
+        return self._m2 / (self.count - 1)
+
+    @property
+    def stdev(self):
+        """
+        Sample standard deviation of the values seen so far.
+        """
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def mean_or(self, default=0):
+        """
+        Return the mean, or the given default when no values were seen.
+        """
+        return self.mean if self.count else default
+
+    def __repr__(self):
+        return f"RunningStats(count={self.count}, mean={self.mean}, min={self.min}, max={self.max})"
@@ -0,0 +1,847 @@
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from unittest import skipUnless
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from celery.contrib.testing.worker import start_worker
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from appointments.models import Appointment, AppointmentOverride
+from health import views as health_views
+from reports import views as report_views
+from sleep import views as sleep_views
+from goals.models import Goal
+from health.entries import encode_cursor
+from health.models import HealthMetric
+from health.tasks import rebuild_health_rollups
+from medications.models import Medication, MedicationDoseTime
+from sleep.models import SleepRecord
+from .cache import cache_stats, caching_enabled, dashboard_cache, reset_cache_stats
+from .celery import app as celery_app
+from .database import sqlite_pragmas, stress
+from .downsample import downsample_payload, downsample_points, downsample_series, lttb
+from .profiling import RequestProfile, record, reset_stats, view_stats
+from .replicas import SESSION_KEY, ReplicaRouter, StickyPrimaryMiddleware, ais_sticky, primary_reads, replica_reads
+from .stats import RunningStats, mean_of
+
+
+class RunningStatsTest(SimpleTestCase):
+    """
+    Test cases for the streaming RunningStats accumulator.
+    """
+
+    def test_empty_series(self):
+        """
+        Test that an empty accumulator reports no values.
+        """
+        stats = RunningStats()
+        self.assertEqual(stats.count, 0)
+        self.assertIsNone(stats.mean)
+        self.assertIsNone(stats.variance)
+        self.assertEqual(stats.mean_or(0), 0)
+
+    def test_matches_statistics_module(self):
+        """
+        Test that the one-pass results match the standard library.
+        """
+        values = [70.5, 71.2, 69.8, 72.4, 70.0, 68.9]
+        stats = RunningStats(values)
+        self.assertEqual(stats.count, len(values))
+        self.assertAlmostEqual(stats.mean, statistics.mean(values))
+        self.assertAlmostEqual(stats.variance, statistics.variance(values))
+        self.assertAlmostEqual(stats.stdev, statistics.stdev(values))
+        self.assertEqual(stats.min, 68.9)
+        self.assertEqual(stats.max, 72.4)
+        self.assertEqual(stats.last, 68.9)
+
+    def test_none_values_are_skipped(self):
+        """
+        Test that None values are ignored but still returned by push().
+        """
+        stats = RunningStats()
+        self.assertIsNone(stats.push(None))
+        self.assertEqual(stats.push(3), 3)
+        stats.push(None)
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.mean, 3.0)
+        self.assertEqual(stats.last, 3)
+
+    def test_extend_sequence_matches_push(self):
+        """
+        Test that folding in a finished series agrees with pushing values one by one.
+        """
+        values = [None, 0, 72.5, None, 68.0, 0.0, 75.25]
+        folded = RunningStats([80.0])
+        folded.extend(values)
+        pushed = RunningStats()
+        for value in [80.0] + values:
+            pushed.push(value)
+        self.assertEqual(folded.count, pushed.count)
+        self.assertAlmostEqual(folded.mean, pushed.mean)
+        self.assertAlmostEqual(folded.variance, pushed.variance)
+        self.assertEqual((folded.min, folded.max, folded.last), (pushed.min, pushed.max, pushed.last))
+
+    def test_mean_of_finished_series(self):
+        """
+        Test that mean_of skips None but not zeros, and falls back to the default.
+        """
+        self.assertEqual(mean_of([None, 0, 3.0, None, 6]), 3.0)
+        self.assertEqual(mean_of((None, None)), 0)
+        self.assertIsNone(mean_of([], None))
+
+    def test_extend_is_not_affected_by_later_list_changes(self):
+        """
+        Test that changing a list after extend() does not change the deferred min, max or variance.
+        """
+        values = [70.0, 72.0, 74.0]
+        stats = RunningStats(values)
+        values[0] = 500.0
+        values.append(None)
+        self.assertEqual((stats.min, stats.max), (70.0, 74.0))
+        self.assertAlmostEqual(stats.variance, 4.0)
+
+
+class DownsampleTest(SimpleTestCase):
+    """
+    Test cases for the LTTB chart downsampling helpers.
+    """
+
+    def test_short_series_unchanged(self):
+        """
+        Test that series within the budget, or thresholds below 3, keep every point.
+        """
+        self.assertEqual(lttb([1, 2, 3], [5, 6, 7], 10), [0, 1, 2])
+        self.assertEqual(lttb(list(range(10)), list(range(10)), 2), list(range(10)))
+
+    def test_keeps_endpoints_and_peaks(self):
+        """
+        Test that LTTB keeps the first and last points and a sharp spike within budget.
+        """
+        xs = list(range(1000))
+        ys = [0.0] * 1000
+        ys[437] = 100.0
+        keep = lttb(xs, ys, 50)
+        self.assertEqual(len(keep), 50)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertIn(437, keep)
+        self.assertEqual(keep, sorted(keep))
+
+    def test_series_and_points(self):
+        """
+        Test that date/value series drop empty days when reduced and points keep their shape.
+        """
+        start = datetime.date(2020, 1, 1)
+        dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(100)]
+        values = [None if i % 2 else float(i) for i in range(100)]
+        reduced_dates, reduced_values = downsample_series(dates, values, 10)
+        self.assertEqual(len(reduced_dates), 10)
+        self.assertNotIn(None, reduced_values)
+        self.assertEqual(downsample_series(dates, values, None), (dates, values))
+
+        points = [{'x': date, 'y': i} for i, date in enumerate(dates)]
+        self.assertEqual(len(downsample_points(points, 7)), 7)
+        payload = downsample_payload({'dates': dates, 'values': values, 'points': points}, 200)
+        self.assertFalse(payload['downsampled'])
+
+class DashboardQueryPlanTest(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on SQLite for every query issued by the dashboards
+    and the JSON endpoints their charts, tables and calendar load from, and
+    fails if any of them falls back to a full scan of a tracking table.
+    """
+
+    TRACKED_TABLE_PREFIXES = ('health_', 'sleep_', 'medications_', 'goals_', 'appointments_')
+    # Plan lines that scan on purpose; every other tracked table must be searched through an index
+    ALLOWED_SCANS = set()
+    DASHBOARDS = [
+        'health_dashboard',
+        'sleep_dashboard',
+        'medications_dashboard',
+        'goal_dashboard',
+        'appointment_dashboard',
+        'report_dashboard',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planuser', password='password123')
+        today = datetime.date.today()
+        for offset in range(3):
+            day = today - datetime.timedelta(days=offset)
+            HealthMetric.objects.create(
+                user=cls.user, date=day, weight=70 + offset, blood_pressure_systolic=120,
+                blood_pressure_diastolic=80, heart_rate=70, calories_intake=2000,
+                physical_activity_minutes=30,
+            )
+            SleepRecord.objects.create(user=cls.user, date=day, duration=7.5, quality=4)
+            Appointment.objects.create(
+                user=cls.user, title='Checkup', appointment_date=day + datetime.timedelta(days=1),
+                appointment_time=datetime.time(9, 0),
+            )
+        medication = Medication.objects.create(user=cls.user, name='Aspirin', frequency='daily', start_date=today)
+        MedicationDoseTime.objects.create(medication=medication, scheduled_time=datetime.time(8, 0))
+        for goal_type in ('weight', 'calories', 'activity', 'sleep'):
+            Goal.objects.create(user=cls.user, goal_type=goal_type, target_value=50)
+        series = Appointment.objects.create(
+            user=cls.user, title='Therapy', appointment_date=today - datetime.timedelta(days=14),
+            appointment_time=datetime.time(10, 0), recurrence='FREQ=WEEKLY',
+        )
+        AppointmentOverride.objects.create(
+            appointment=series, date=today - datetime.timedelta(days=7), rescheduled_time=datetime.time(11, 0),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # Cached responses would skip the queries under test
+        dashboard_cache().clear()
+
+    def full_scans(self, sql):
+        """
+        Return the plan lines that scan a tracked table, or the whole of one of
+        its indexes, rather than searching an index.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[-1] for row in cursor.fetchall()]
+        return [
+            detail for detail in details
+            if detail.startswith('SCAN ')
+            and detail.split()[1].startswith(self.TRACKED_TABLE_PREFIXES)
+            and detail not in self.ALLOWED_SCANS
+        ]
+
+    def test_full_index_scans_are_caught(self):
+        """
+        Test that scanning a whole index counts as a full scan, and searching one does not.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest("EXPLAIN QUERY PLAN checks are SQLite specific.")
+
+        scans = self.full_scans('SELECT COUNT(*) FROM "health_healthmetric"')
+        self.assertEqual(len(scans), 1)
+        self.assertIn('INDEX', scans[0])
+        self.assertEqual(self.full_scans(f'SELECT COUNT(*) FROM "health_healthmetric" WHERE "user_id" = {self.user.pk}'), [])
+
+    def test_dashboard_queries_use_indexes(self):
+        """
+        Test that no dashboard query falls back to a full table scan.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest("EXPLAIN QUERY PLAN checks are SQLite specific.")
+
+        for name in self.DASHBOARDS:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                with self.subTest(dashboard=name, sql=sql):
+                    self.assertEqual(self.full_scans(sql), [])
+
+    def test_api_queries_use_indexes(self):
+        """
+        Test that no series, entries or event-feed query falls back to a full table scan.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest("EXPLAIN QUERY PLAN checks are SQLite specific.")
+
+        today = datetime.date.today()
+        window = {'start': f"{today - datetime.timedelta(days=30):%Y-%m-%d}", 'end': f"{today:%Y-%m-%d}"}
+        oldest = HealthMetric.objects.filter(user=self.user).order_by('date', 'id').first()
+        requests = [
+            (reverse('health_series', args=['weight']), {}),
+            (reverse('health_series', args=['hr']), {'bucket': 'week', **window}),
+            (reverse('sleep_series', args=['duration']), {}),
+            (reverse('sleep_series', args=['quality']), {'bucket': 'month', **window}),
+            (reverse('report_series', args=['map']), {}),
+            (reverse('report_series', args=['sleep']), {'bucket': 'week'}),
+            (reverse('health_entries'), {'limit': 2}),
+            (reverse('health_entries'), {'after': encode_cursor(oldest.date, oldest.pk), **window}),
+            (reverse('appointment_events'), window),
+        ]
+        for url, params in requests:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, params, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200, (url, params))
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                with self.subTest(url=url, params=params, sql=sql):
+                    self.assertEqual(self.full_scans(sql), [])
+
+
+class DashboardCacheMixin:
+    """
+    Shared checks for the per-user dashboard cache, run against each cache backend.
+    """
+
+    DASHBOARDS = {
+        'health': 'health_dashboard',
+        'sleep': 'sleep_dashboard',
+        'reports': 'report_dashboard',
+        'goals': 'goal_dashboard',
+        'medications': 'medications_dashboard',
+    }
+
+    def setUp(self):
+        dashboard_cache().clear()
+        self.user = User.objects.create_user(username='cacheuser', password='password')
+        self.client.force_login(self.user)
+        today = datetime.date.today()
+        HealthMetric.objects.create(user=self.user, date=today, weight=70, heart_rate=60)
+        SleepRecord.objects.create(user=self.user, date=today, duration=7, quality=4)
+        Goal.objects.create(user=self.user, goal_type='sleep', target_value=8, comparison='max')
+        med = Medication.objects.create(user=self.user, name='Med', frequency='daily', start_date=today)
+        MedicationDoseTime.objects.create(medication=med, scheduled_time=datetime.time(8, 0))
+
+    def get(self, url_name, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse(url_name), data)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in captured]
+
+    def test_repeat_views_skip_the_database(self):
+        """
+        Test that a repeated view is a cache hit that only loads the session and user.
+        """
+        for name, url_name in self.DASHBOARDS.items():
+            with self.subTest(dashboard=name):
+                first, _ = self.get(url_name)
+                second, queries = self.get(url_name)
+                self.assertEqual(len(queries), 2, queries)
+                self.assertTrue(all('django_session' in sql or 'auth_user' in sql for sql in queries), queries)
+                self.assertEqual(cache_stats([name])[name], {'hits': 1, 'misses': 1})
+
+    def test_writes_invalidate_every_dashboard(self):
+        """
+        Test that saving or deleting a tracked row makes the next view recompute.
+        """
+        response, _ = self.get('health_dashboard', {'active_tab': 'edit'})
+        self.assertEqual(len(response.context['entries']), 1)
+
+        HealthMetric.objects.create(
+            user=self.user, date=datetime.date.today() - datetime.timedelta(days=1), weight=71
+        )
+        response, _ = self.get('health_dashboard', {'active_tab': 'edit'})
+        self.assertEqual(len(response.context['entries']), 2)
+
+        self.get('sleep_dashboard')
+        SleepRecord.objects.filter(user=self.user).delete()
+        response, _ = self.get('sleep_dashboard')
+        self.assertEqual(response.context['overall_duration'], 0)
+        self.assertEqual(cache_stats(['health', 'sleep']), {
+            'health': {'hits': 0, 'misses': 2},
+            'sleep': {'hits': 0, 'misses': 2},
+        })
+
+    def test_users_do_not_share_entries(self):
+        """
+        Test that another user's writes leave this user's cached dashboards valid.
+        """
+        self.get('goal_dashboard')
+        other = User.objects.create_user(username='other', password='password')
+        Goal.objects.create(user=other, goal_type='weight', target_value=150)
+        self.get('goal_dashboard')
+        self.assertEqual(cache_stats(['goals'])['goals'], {'hits': 1, 'misses': 1})
+
+    def test_filters_are_part_of_the_key(self):
+        """
+        Test that health dashboard date filters are cached separately.
+        """
+        today = datetime.date.today().strftime('%Y-%m-%d')
+        self.client.get(reverse('health_dashboard'), {'active_tab': 'edit'})
+        response = self.client.get(reverse('health_dashboard'), {'start_date': '2000-01-01', 'end_date': '2000-01-02'})
+        self.assertEqual(len(response.context['entries']), 0)
+        response = self.client.get(reverse('health_dashboard'), {'start_date': today, 'end_date': today})
+        self.assertEqual(len(response.context['entries']), 1)
+        self.assertEqual(cache_stats(['health_entries'])['health_entries'], {'hits': 0, 'misses': 3})
+        self.assertEqual(cache_stats(['health'])['health'], {'hits': 2, 'misses': 1})
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'dashboards': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dashboard-tests'},
+})
+class LocMemDashboardCacheTest(DashboardCacheMixin, TestCase):
+    pass
+
+
+class FileBasedDashboardCacheTest(DashboardCacheMixin, TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        settings_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'dashboards': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        super().setUp()
+
+
+class ProcessLocalDashboardCacheTest(TestCase):
+    """
+    Tests that several web workers never share a process-local dashboard cache.
+    """
+
+    def setUp(self):
+        dashboard_cache().clear()
+        reset_cache_stats()
+        self.user = User.objects.create_user(username='workeruser', password='password')
+        HealthMetric.objects.create(user=self.user, date=datetime.date.today(), weight=70)
+        self.client.force_login(self.user)
+
+    def test_several_workers_turn_caching_off(self):
+        """
+        Test that dashboards are recomputed and no validators are sent when each worker has its own cache.
+        """
+        with self.settings(WEB_CONCURRENCY=4):
+            self.assertFalse(caching_enabled())
+            self.client.get(reverse('health_dashboard'))
+            self.client.get(reverse('health_dashboard'))
+            response = self.client.get(reverse('health_series', args=['weight']))
+        self.assertEqual(cache_stats(['health'])['health'], {'hits': 0, 'misses': 0})
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_shared_backend_keeps_caching(self):
+        """
+        Test that a backend shared between processes keeps caching with several workers.
+        """
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared = {**settings.CACHES, 'dashboards': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}
+        with self.settings(WEB_CONCURRENCY=4, CACHES=shared):
+            self.assertTrue(caching_enabled())
+            response = self.client.get(reverse('health_series', args=['weight']))
+        self.assertTrue(response.has_header('ETag'))
+
+
+class AsyncDashboardTest(TestCase):
+    """
+    Tests for the async dashboard views served under ASGI.
+    """
+
+    def setUp(self):
+        dashboard_cache().clear()
+        self.user = User.objects.create_user(username='asyncuser', password='password')
+        self.today = datetime.date.today()
+        for days in range(5):
+            date = self.today - datetime.timedelta(days=days)
+            HealthMetric.objects.create(
+                user=self.user, date=date, weight=70 + days, heart_rate=60 + days,
+                blood_pressure_systolic=120, blood_pressure_diastolic=80, calories_intake=2000,
+            )
+            SleepRecord.objects.create(user=self.user, date=date, duration=6 + days % 3, quality=3)
+
+    def request(self, url_name, data=None):
+        request = AsyncRequestFactory().get(reverse(url_name), data)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+
+        request.auser = auser
+        return request
+
+    async def test_async_builders_match_sync(self):
+        """
+        Test that each async context builder returns exactly what the sync one does.
+        """
+        builders = [
+            (health_views._build_dashboard_context, health_views._abuild_dashboard_context, (self.user, self.today)),
+            (sleep_views._build_dashboard_context, sleep_views._abuild_dashboard_context, (self.user,)),
+            (report_views._build_dashboard_context, report_views._abuild_dashboard_context, (self.user, self.today)),
+        ]
+        for build, abuild, args in builders:
+            with self.subTest(view=build.__module__):
+                expected = await sync_to_async(build)(*args)
+                self.assertEqual(await abuild(*args), expected)
+
+    async def test_async_views_render_and_share_the_cache(self):
+        """
+        Test that the async views render, and reuse contexts cached by the sync views.
+        """
+        views = [
+            ('health', health_views.health_dashboard, health_views.ahealth_dashboard, 'health_dashboard'),
+            ('sleep', sleep_views.sleep_dashboard, sleep_views.asleep_dashboard, 'sleep_dashboard'),
+            ('reports', report_views.report_dashboard, report_views.areport_dashboard, 'report_dashboard'),
+        ]
+        for name, view, aview, url_name in views:
+            with self.subTest(dashboard=name):
+                await sync_to_async(view)(self.request(url_name))
+                response = await aview(self.request(url_name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual((await sync_to_async(cache_stats)([name]))[name], {'hits': 1, 'misses': 1})
+
+    async def test_async_health_edit_tab(self):
+        """
+        Test that the async health view fetches the edit tab's first page with the summary.
+        """
+        response = await health_views.ahealth_dashboard(self.request('health_dashboard', {'active_tab': 'edit'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'href="/health/edit/' + self.today.strftime('%Y-%m-%d'))
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """
+    Test cases for the sampled request-profiling middleware and its stats endpoint.
+    """
+
+    def setUp(self):
+        reset_stats()
+        self.addCleanup(reset_stats)
+        self.user = User.objects.create_user(username='profiled', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        HealthMetric.objects.create(user=self.user, date=datetime.date.today(), weight=70)
+
+    def test_unsampled_requests_pass_through(self):
+        """
+        Test that nothing is recorded when profiling is off or the request is not sampled.
+        """
+        self.client.force_login(self.user)
+        with self.settings(REQUEST_PROFILING=False):
+            response = self.client.get(reverse('health_dashboard'), HTTP_X_PROFILE='1')
+        self.assertFalse(response.has_header('Server-Timing'))
+        with self.settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=0):
+            response = self.client.get(reverse('health_dashboard'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(view_stats(), {})
+
+    def test_sampled_request_is_profiled(self):
+        """
+        Test that a sampled request gets a Server-Timing header, a JSON log line and a histogram entry.
+        """
+        self.client.force_login(self.user)
+        with self.settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=1.0):
+            with self.assertLogs('healthy_you.profiling', 'INFO') as logs:
+                response = self.client.get(reverse('health_dashboard'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, sql;dur=[\d.]+;desc="\d+ queries, \d+ duplicate", tpl;dur=[\d.]+$')
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'health_dashboard')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+
+        stats = view_stats()['health_dashboard']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(sum(stats['histogram'].values()), 1)
+
+    def test_header_profiles_staff_only(self):
+        """
+        Test that the X-Profile header forces profiling for staff but not for other users.
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('health_dashboard'), HTTP_X_PROFILE='1')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+        self.client.force_login(self.staff)
+        with self.assertLogs('healthy_you.profiling', 'INFO'):
+            response = self.client.get(reverse('health_dashboard'), HTTP_X_PROFILE='1')
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    def test_repeated_queries_are_flagged(self):
+        """
+        Test that a statement run repeatedly in one request is counted as duplicates.
+        """
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            for user_id in (self.user.pk, self.staff.pk, self.user.pk):
+                list(User.objects.filter(pk=user_id))
+            HealthMetric.objects.count()
+        self.assertEqual(profile.query_count, 4)
+        self.assertEqual(profile.duplicates, 2)
+        self.assertEqual([count for _, count in profile.repeated(3)], [3])
+
+    async def test_async_requests_are_profiled(self):
+        """
+        Test that a request served through the ASGI handler is profiled, queries included.
+        """
+        await self.async_client.aforce_login(self.user)
+        with self.settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=1.0):
+            with self.assertLogs('healthy_you.profiling', 'INFO') as logs:
+                response = await self.async_client.get(reverse('health_dashboard'))
+        self.assertTrue(response.has_header('Server-Timing'))
+        self.assertGreater(json.loads(logs.records[0].getMessage())['queries'], 0)
+
+    def test_stats_endpoint_is_staff_only(self):
+        """
+        Test that the aggregated histogram is served as JSON to staff and hidden from other users.
+        """
+        self.client.force_login(self.staff)
+        with self.settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=1.0):
+            with self.assertLogs('healthy_you.profiling', 'INFO'):
+                self.client.get(reverse('health_dashboard'))
+                self.client.get(reverse('health_dashboard'))
+        data = self.client.get(reverse('profiling_stats')).json()
+        self.assertEqual(data['views']['health_dashboard']['requests'], 2)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('profiling_stats')).status_code, 302)
+
+    def test_views_register_independently(self):
+        """
+        Test that every view recorded keeps its own entry, and reset forgets them all.
+        """
+        profile = RequestProfile()
+        for view in ('a', 'b', 'c', 'b'):
+            record(view, profile)
+        self.assertEqual({view: stats['requests'] for view, stats in view_stats().items()}, {'a': 1, 'b': 2, 'c': 1})
+        reset_stats()
+        self.assertEqual(view_stats(), {})
+        record('d', profile)
+        self.assertEqual(list(view_stats()), ['d'])
+
+    def test_several_workers_keep_no_process_local_histogram(self):
+        """
+        Test that a process-local stats cache keeps no histogram when several workers run.
+        """
+        self.client.force_login(self.staff)
+        with self.settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=1.0, WEB_CONCURRENCY=2):
+            with self.assertLogs('healthy_you.profiling', 'INFO'):
+                self.client.get(reverse('health_dashboard'))
+            data = self.client.get(reverse('profiling_stats')).json()
+        self.assertEqual((data['enabled'], data['views']), (False, {}))
+
+
+class AsyncMiddlewareTest(TestCase):
+    """
+    Tests that the project's middleware runs natively under ASGI.
+    """
+
+    def test_asgi_stack_is_not_adapted(self):
+        """
+        Test that the ASGI handler builds its middleware chain without wrapping any of it in a thread.
+        """
+        with self.settings(DEBUG=True), self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_sticky_primary_in_async_code(self):
+        """
+        Test that the async middleware marks the session after a POST and async views see the mark.
+        """
+        user = await sync_to_async(User.objects.create_user)(username='asyncsticky', password='password')
+
+        async def view(request):
+            return HttpResponse()
+
+        async def auser():
+            return user
+
+        middleware = StickyPrimaryMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = AsyncRequestFactory().post('/')
+        request.session = SessionStore()
+        request.auser = auser
+        with self.settings(REPLICA_DATABASE_ALIAS='replica'):
+            await middleware(request)
+            self.assertTrue(await ais_sticky(request))
+            request.method = 'GET'
+            await middleware(request)
+            self.assertGreater(await request.session.aget(SESSION_KEY), time.time())
+
+
+class SqliteTuningTest(TestCase):
+    """
+    Tests for the SQLite connection tuning in healthy_you/database.py.
+    """
+
+    def scratch_path(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        return os.path.join(directory, 'scratch.sqlite3')
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite connection settings")
+    def test_connections_apply_pragmas(self):
+        """
+        Test that Django's connections are opened with the configured pragmas.
+        """
+        with connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ('synchronous', 'busy_timeout', 'cache_size', 'temp_store')
+            }
+        self.assertEqual(pragmas, {'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -64000, 'temp_store': 2})
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_reads_do_not_wait_for_an_open_write(self):
+        """
+        Test that in WAL mode a reader sees the last committed data while a write transaction is open.
+        """
+        path = self.scratch_path()
+        writer = sqlite3.connect(path, isolation_level=None)
+        reader = sqlite3.connect(path, isolation_level=None, timeout=0)  # Fail at once instead of waiting
+        self.addCleanup(writer.close)
+        self.addCleanup(reader.close)
+        for conn in (writer, reader):
+            for statement in sqlite_pragmas():
+                conn.execute(statement)
+        writer.execute('CREATE TABLE metric (value INTEGER)')
+        writer.execute('INSERT INTO metric VALUES (1)')
+
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute('INSERT INTO metric VALUES (2)')
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM metric').fetchone()[0], 1)
+        writer.execute('COMMIT')
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM metric').fetchone()[0], 2)
+
+    def test_concurrent_reads_and_writes_do_not_fail(self):
+        """
+        Test that concurrent read-then-write transactions and reads finish without lock errors.
+        """
+        result = stress(self.scratch_path(), tuned=True, readers=2, writers=3, seconds=0.5)
+        self.assertGreater(result['reads'], 0)
+        self.assertGreater(result['writes'], 0)
+        self.assertEqual((result['read_errors'], result['write_errors']), (0, 0))
+
+
+class ReplicaRoutingTest(TestCase):
+    """
+    Tests for read-replica routing, with a second SQLite file standing in for the replica.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The replica is added after the test runner has set up its databases, so it is
+        # not wrapped in the test transactions; setUp clears it instead
+        cls.replica_directory = tempfile.mkdtemp()
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': os.path.join(cls.replica_directory, 'replica.sqlite3'),
+        }
+        cls.databases = cls.databases | {'replica'}
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(SleepRecord)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        cls.databases = cls.databases - {'replica'}
+        del connections.settings['replica']
+        shutil.rmtree(cls.replica_directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        settings_override = override_settings(REPLICA_DATABASE_ALIAS='replica')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        dashboard_cache().clear()
+        SleepRecord.objects.using('replica').all().delete()
+        User.objects.using('replica').all().delete()
+
+        # The same user on both databases, with different sleep data on each
+        self.user = User.objects.create_user(username='replicauser', password='password')
+        self.user.save(using='replica')
+        SleepRecord.objects.create(user=self.user, date=datetime.date(2023, 10, 1), duration=7.0, quality=4)
+        SleepRecord.objects.using('replica').create(user=self.user, date=datetime.date(2023, 10, 1), duration=5.0, quality=2)
+        self.client.force_login(self.user)
+
+    def durations(self):
+        response = self.client.get(reverse('sleep_series', args=['duration']))
+        return response.json()['values']
+
+    def test_dashboard_reads_use_the_replica(self):
+        """
+        Test that decorated views read from the replica while the session makes no writes.
+        """
+        self.assertEqual(self.durations(), [5.0])
+        response = self.client.get(reverse('sleep_dashboard'))
+        self.assertEqual(response.context['overall_duration'], 5.0)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        """
+        Test that a POST writes to the primary and that the following reads see it until the window ends.
+        """
+        response = self.client.post(reverse('sleep_dashboard'), {'date': '2023-10-02', 'duration': 8, 'quality': 5})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(SleepRecord.objects.filter(date=datetime.date(2023, 10, 2)).exists())
+        self.assertFalse(SleepRecord.objects.using('replica').filter(date=datetime.date(2023, 10, 2)).exists())
+        self.assertEqual(self.durations(), [7.0, 8.0])
+
+        session = self.client.session
+        session[SESSION_KEY] = 0
+        session.save()
+        dashboard_cache().clear()
+        self.assertEqual(self.durations(), [5.0])
+
+    def test_without_a_replica_everything_reads_the_primary(self):
+        """
+        Test that reads stay on the primary, and sessions are not marked, when no replica is configured.
+        """
+        with self.settings(REPLICA_DATABASE_ALIAS=None):
+            self.assertEqual(self.durations(), [7.0])
+            self.client.post(reverse('sleep_dashboard'), {'date': '2023-10-02', 'duration': 8, 'quality': 5})
+            self.assertNotIn(SESSION_KEY, self.client.session)
+
+    def test_migrations_only_run_on_the_primary(self):
+        """
+        Test that the router writes to and migrates only the primary.
+        """
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_write(SleepRecord), 'default')
+        self.assertTrue(router.allow_migrate('default', 'sleep'))
+        self.assertFalse(router.allow_migrate('replica', 'sleep'))
+
+    def test_primary_reads_inside_a_replica_view(self):
+        """
+        Test that primary_reads() sends a replica_reads view's reads back to the primary.
+        """
+        router = ReplicaRouter()
+
+        @replica_reads
+        def view(request):
+            with primary_reads():
+                inside = router.db_for_read(SleepRecord)
+            return router.db_for_read(SleepRecord), inside
+
+        self.assertEqual(view(RequestFactory().get('/')), ('replica', 'default'))
+
+
+class CeleryTaskTest(TransactionTestCase):
+    """
+    Tests for the Celery wiring, run through kombu's in-memory transport so no
+    broker is needed. A TransactionTestCase lets the worker thread see the rows.
+    """
+
+    def setUp(self):
+        previous = {key: celery_app.conf[key] for key in ('broker_url', 'result_backend', 'task_always_eager')}
+        celery_app.conf.update(broker_url='memory://', result_backend='cache+memory://', task_always_eager=False)
+        self.addCleanup(celery_app.conf.update, previous)
+
+    def test_beat_schedule_names_registered_tasks(self):
+        """
+        Test that every beat entry refers to a task discovered from the apps.
+        """
+        celery_app.loader.import_default_modules()
+        for entry in celery_app.conf.beat_schedule.values():
+            self.assertIn(entry['task'], celery_app.tasks)
+
+    def test_tasks_run_on_an_in_memory_worker(self):
+        """
+        Test that a task sent with delay() is consumed by a worker and its result returned.
+        """
+        user = User.objects.create_user(username='celeryuser', password='password')
+        HealthMetric.objects.bulk_create([HealthMetric(user=user, date=datetime.date(2023, 10, 1), weight=70)])
+        with start_worker(celery_app, pool='solo', perform_ping_check=False):
+            result = rebuild_health_rollups.delay(user_ids=[user.id])
+            self.assertEqual(result.get(timeout=10), 1)
@@ -1,9 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse  # Import HttpResponse if it isn't already imported
+from .profiling import profiling_stats
 
 # URL patterns for the core Healthy You project
 urlpatterns = [
+    # Aggregated request profiles (staff only; listed before the admin's catch-all)
+    path('admin/profiling/', profiling_stats, name='profiling_stats'),
+
     # Admin site
     path('admin/', admin.site.urls),
 
@@ -0,0 +1,156 @@
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from .models import MedicationAdherenceCounter, MedicationLog
+
+# Every status a MedicationLog can have, in the order they are reported
+STATUSES = tuple(status for status, _ in MedicationLog.STATUS_CHOICES)
+
+
+def counters_enabled():
+    """
+    Return True when the monthly counter table should be maintained and read.
+    """
+    return getattr(settings, 'MEDICATION_ADHERENCE_COUNTERS', False)
+
+
+def empty_counts():
+    """
+    A status -> count mapping with every status set to zero.
+    """
+    return dict.fromkeys(STATUSES, 0)
+
+
+def status_aggregates():
+    """
+    Conditional aggregates that count MedicationLog rows per status in a single pass.
+    """
+    return {status: Count('id', filter=Q(status=status)) for status in STATUSES}
+
+
+def month_start(date):
+    """
+    Return the first day of the month containing the given date.
+    """
+    return date.replace(day=1)
+
+
+def adherence_counts(user, start=None, end=None):
+    """
+    Count the user's medication logs by status within an optional inclusive
+    date window. Returns {'overall': {...}, 'by_medication': {med_id: {...}}}.
+
+    Everything comes from one grouped conditional-aggregation query; the
+    overall totals are summed from the per-medication rows in Python.
+    """
+    logs = MedicationLog.objects.filter(medication__user=user)
+    if start is not None:
+        logs = logs.filter(date__gte=start)
+    if end is not None:
+        logs = logs.filter(date__lte=end)
+
+    rows = logs.values('medication_id').annotate(**status_aggregates()).order_by()
+    return _combine(rows)
+
+
+def lifetime_adherence(user):
+    """
+    Count every log the user has ever recorded, by status, in the same shape
+    as adherence_counts(). Reads the monthly counter table when it is enabled,
+    which keeps the cost proportional to months tracked rather than logs.
+    """
+    if not counters_enabled():
+        return adherence_counts(user)
+
+    rows = (
+        MedicationAdherenceCounter.objects
+        .filter(medication__user=user)
+        .values('medication_id')
+        .annotate(**{status: Sum(status) for status in STATUSES})
+        .order_by()
+    )
+    return _combine(rows)
+
+
+def _combine(rows):
+    """
+    Build the overall and per-medication result from grouped status rows.
+    """
+    overall = empty_counts()
+    by_medication = {}
+    for row in rows:
+        counts = {status: row[status] or 0 for status in STATUSES}
+        by_medication[row['medication_id']] = counts
+        for status in STATUSES:
+            overall[status] += counts[status]
+    return {'overall': overall, 'by_medication': by_medication}
+
+
+def refresh_adherence_counters(medication_ids, month):
+    """
+    Recompute the counter rows for the given medications and month from their
+    logs. Uses a fixed number of queries however many medications are passed:
+    one grouped count, one upsert, and a delete for months left without logs.
+    """
+    medication_ids = set(medication_ids)
+    if not medication_ids:
+        return
+
+    month = month_start(month)
+    next_month = month_start(month.replace(day=28) + datetime.timedelta(days=4))
+    rows = (
+        MedicationLog.objects
+        .filter(medication_id__in=medication_ids, date__gte=month, date__lt=next_month)
+        .values('medication_id')
+        .annotate(**status_aggregates())
+        .order_by()
+    )
+    counters = [MedicationAdherenceCounter(month=month, **row) for row in rows]
+
+    # The upsert and the delete touch different medications, so no shared transaction is needed
+    if counters:
+        MedicationAdherenceCounter.objects.bulk_create(
+            counters,
+            update_conflicts=True,
+            unique_fields=['medication', 'month'],
+            update_fields=list(STATUSES),
+        )
+    emptied = medication_ids - {counter.medication_id for counter in counters}
+    if emptied:
+        MedicationAdherenceCounter.objects.filter(medication_id__in=emptied, month=month).delete()
+
+
+def rebuild_adherence_counters(medication_ids=None, batch_size=1000):
+    """
+    Rebuild the counter table from scratch, either for every medication or only
+    for the given medication IDs. Returns the number of counter rows written.
+    """
+    logs = MedicationLog.objects.all()
+    counters = MedicationAdherenceCounter.objects.all()
+    if medication_ids is not None:
+        logs = logs.filter(medication_id__in=medication_ids)
+        counters = counters.filter(medication_id__in=medication_ids)
+
+    grouped = (
+        logs.annotate(month=TruncMonth('date'))
+        .values('medication_id', 'month')
+        .annotate(**status_aggregates())
+        .order_by('medication_id', 'month')
+    )
+
+    written = 0
+    with transaction.atomic():
+        counters.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(MedicationAdherenceCounter(**row))
+            if len(batch) >= batch_size:
+                MedicationAdherenceCounter.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            MedicationAdherenceCounter.objects.bulk_create(batch)
+            written += len(batch)
+    return written
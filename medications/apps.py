@@ -8,3 +8,9 @@ class MedicationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'  # Default primary key type for models
     name = 'medications'  # Name of the app as registered in Django settings
     verbose_name = 'Medications Management'  # Human-readable name for the app
+
+    def ready(self):
+        """
+        Connect the signal handlers that keep the adherence counters up to date.
+        """
+        from . import signals  # noqa: F401
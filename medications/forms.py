@@ -1,5 +1,5 @@
 from django import forms
-from .models import Medication, MedicationDoseTime
+from .models import Medication, MedicationDoseTime, parse_recurring_days
 
 
 class MedicationForm(forms.ModelForm):
@@ -26,3 +26,14 @@ class MedicationDoseTimeForm(forms.ModelForm):
         widgets = {
             'scheduled_time': forms.TimeInput(attrs={'type': 'time'}),  # Use an HTML5 time picker for the time field
         }
+
+    def clean_recurring_days(self):
+        """
+        Reject weekday names that the schedule engine would not understand.
+        """
+        recurring_days = self.cleaned_data.get('recurring_days', '')
+        try:
+            parse_recurring_days(recurring_days)
+        except ValueError:
+            raise forms.ValidationError("Use weekday abbreviations separated by commas, e.g. 'Mon,Wed,Fri'.")
+        return recurring_days
@@ -0,0 +1,160 @@
+"""
+MedicationLog materialization.
+
+A log row has to exist for every due dose before it can be marked taken or
+missed. The nightly materialize_logs task creates them ahead of time with
+materialize_logs(), in chunked bulk inserts over a range of user IDs, so
+several workers can each take a share of the users. The dashboard then only
+reads; materialize_daily_logs() still fills in anything missing (a dose
+added today, or a night the job did not run).
+"""
+
+import datetime
+from collections import namedtuple
+from django.db import connections, router
+from django.db.models import Max, Min
+from healthy_you.replicas import primary_reads
+from .adherence import counters_enabled, month_start, refresh_adherence_counters
+from .models import Medication, MedicationDoseTime, MedicationLog
+from .schedule import due_on, is_due
+
+_Dose = namedtuple('_Dose', 'id medication_id recurring_mask')
+_Medication = namedtuple('_Medication', 'frequency start_date')
+
+
+class _InsertedRows:
+    """
+    Database execute wrapper adding up the rows INSERT statements really
+    added. With ignore_conflicts, rows that already exist are skipped without
+    an error, and only the cursor's rowcount tells how many went in.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if sql.startswith('INSERT'):
+            self.count += max(context['cursor'].rowcount, 0)
+        return result
+
+
+def materialize_daily_logs(medications, date):
+    """
+    Make sure a MedicationLog row exists for every dose of the given medications
+    that is due on the given date, and return those logs in schedule order.
+
+    The medications should have their dose_times prefetched. Existing logs are
+    loaded with one query, so once the nightly job has run this only reads.
+    Any missing ones are inserted with a single bulk_create, so the number of
+    queries does not depend on how many medications or doses there are.
+    """
+    due = due_on(medications, date)
+    if not due:
+        return []
+
+    medication_ids = {med.id for med, _ in due}
+
+    def load_logs():
+        logs = MedicationLog.objects.filter(medication_id__in=medication_ids, date=date)
+        return {(log.medication_id, log.dose_time_id): log for log in logs}
+
+    logs_by_dose = load_logs()
+    missing = [
+        MedicationLog(medication=med, date=date, dose_time=dose, status='not_recorded')
+        for med, dose in due
+        if (med.id, dose.id) not in logs_by_dose
+    ]
+    if missing:
+        # A read replica may not have the new rows yet, so read them back from the primary
+        with primary_reads():
+            # ignore_conflicts leaves primary keys unset on some backends, so reload the day's logs
+            MedicationLog.objects.bulk_create(missing, ignore_conflicts=True)
+            logs_by_dose = load_logs()
+            if counters_enabled():
+                # bulk_create skips the save signals, so refresh the counters in one batch
+                refresh_adherence_counters({log.medication_id for log in missing}, date)
+
+    today_logs = []
+    for med, dose in due:
+        log = logs_by_dose[(med.id, dose.id)]
+        # Reuse the objects already in memory instead of fetching the relations again
+        log.medication = med
+        log.dose_time = dose
+        today_logs.append(log)
+    return today_logs
+
+
+def user_id_ranges(first_id, last_id, shards):
+    """
+    Split the inclusive user ID range [first_id, last_id] into at most
+    `shards` contiguous (first, last) ranges of about equal width.
+    """
+    width = max(-(-(last_id - first_id + 1) // shards), 1)
+    return [(start, min(start + width - 1, last_id)) for start in range(first_id, last_id + 1, width)]
+
+
+def materialize_logs(start, days=1, first_user_id=None, last_user_id=None, batch_size=1000):
+    """
+    Create the 'not_recorded' MedicationLog rows for every dose due in the
+    `days` days from `start`, for the users whose IDs fall in the optional
+    inclusive range. Returns (due, written): the number of due doses and the
+    number of rows actually inserted, not counting any another run inserted first.
+
+    Users are taken `batch_size` IDs at a time, and each batch's dose times
+    are read as tuples with only the medication fields the schedule needs.
+    The batch's existing logs are read with one query so reruns write
+    nothing, and the rest are written with chunked
+    bulk_create(ignore_conflicts=True), which also makes concurrent runs over
+    overlapping ranges harmless.
+    """
+    dates = [start + datetime.timedelta(days=offset) for offset in range(days)]
+    medications = Medication.objects.filter(start_date__lte=dates[-1])
+    if first_user_id is None or last_user_id is None:
+        bounds = medications.aggregate(first=Min('user_id'), last=Max('user_id'))
+        if bounds['first'] is None:
+            return 0, 0
+        first_user_id = bounds['first'] if first_user_id is None else first_user_id
+        last_user_id = bounds['last'] if last_user_id is None else last_user_id
+
+    rows = MedicationDoseTime.objects.filter(medication__start_date__lte=dates[-1]).values_list(
+        'id', 'medication_id', 'recurring_mask', 'medication__frequency', 'medication__start_date'
+    )
+    due_count = 0
+    inserted = _InsertedRows()
+    connection = connections[router.db_for_write(MedicationLog)]
+    # Contiguous user ID ranges keep each query a range read on the user index, with no sort
+    for first in range(first_user_id, last_user_id + 1, batch_size):
+        last = min(first + batch_size - 1, last_user_id)
+        # Plain tuples instead of model instances; the schedule only reads these attributes
+        batch = [
+            (_Dose(dose_id, medication_id, mask), _Medication(frequency, start_date))
+            for dose_id, medication_id, mask, frequency, start_date in rows.filter(medication__user__id__range=(first, last))
+        ]
+        due = [(dose, date) for date in dates for dose, med in batch if is_due(med, dose, date)]
+        if not due:
+            continue
+        due_count += len(due)
+        existing = set(
+            MedicationLog.objects
+            .filter(dose_time_id__in={dose.id for dose, _ in due}, date__range=(dates[0], dates[-1]))
+            .values_list('dose_time_id', 'date')
+        )
+        logs = [
+            MedicationLog(medication_id=dose.medication_id, dose_time_id=dose.id, date=date, status='not_recorded')
+            for dose, date in due
+            if (dose.id, date) not in existing
+        ]
+        if not logs:
+            continue
+        with connection.execute_wrapper(inserted):
+            MedicationLog.objects.bulk_create(logs, batch_size=1000, ignore_conflicts=True)
+
+        if counters_enabled():
+            # bulk_create skips the save signals, so refresh the counters per month touched
+            months = {}
+            for log in logs:
+                months.setdefault(month_start(log.date), set()).add(log.medication_id)
+            for month, medication_ids in months.items():
+                refresh_adherence_counters(medication_ids, month)
+    return due_count, inserted.count
@@ -0,0 +1,58 @@
+import datetime
+import time
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from medications.reminders import ReminderDispatcher, check_feed_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Emails dose reminders as their scheduled times arrive, from an in-memory queue of the "
+        "upcoming doses that follows dose time changes as they happen"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Send the reminders due now and exit.")
+        parser.add_argument('--interval', type=float, default=30.0, help="Seconds between checks for due reminders.")
+        parser.add_argument('--horizon-hours', type=float, default=24.0, help="Hours of upcoming doses kept queued.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Emails sent per connection.")
+        parser.add_argument(
+            '--reload-interval',
+            type=float,
+            default=300.0,
+            help="Seconds between full reloads of the queue when the change feed's cache is not shared.",
+        )
+
+    def handle(self, *args, **options):
+        reload_interval = datetime.timedelta(seconds=options['reload_interval'])
+        if not options['once']:
+            try:
+                # Without a shared feed, dose time changes made on the site would never reach this process
+                check_feed_cache()
+                reload_interval = None
+            except ImproperlyConfigured as error:
+                self.stderr.write(self.style.WARNING(
+                    f"{error} Reloading every dose every {options['reload_interval']:g}s instead, "
+                    f"so dose time changes take up to that long to apply."
+                ))
+        # A single pass loads the current doses and exits, so it never needs the change feed
+        dispatcher = ReminderDispatcher(
+            horizon=datetime.timedelta(hours=options['horizon_hours']),
+            batch_size=options['batch_size'],
+            reload_interval=reload_interval,
+        )
+        started = time.perf_counter()
+        # Start one interval back so doses scheduled just before startup are still sent
+        dispatcher.start(timezone.now() - datetime.timedelta(seconds=options['interval']))
+        self.stdout.write(
+            f"Queued {len(dispatcher.queue)} upcoming doses in {time.perf_counter() - started:.2f}s."
+        )
+
+        while True:
+            sent = dispatcher.tick(timezone.now())
+            if sent or options['once']:
+                self.stdout.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} sent {sent} reminder emails.")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
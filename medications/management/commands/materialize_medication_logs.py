@@ -0,0 +1,54 @@
+import datetime
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from medications.logs import materialize_logs, user_id_ranges
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the MedicationLog rows for every dose due in the coming day(s) for all users, "
+        "optionally split by user ID range across worker processes, and reports the write rate"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=datetime.date.fromisoformat,
+            help="First day to materialize, YYYY-MM-DD (default: today).",
+        )
+        parser.add_argument('--days', type=int, default=1, help="Number of days to materialize.")
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes, one per user ID range.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="User IDs per batch.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['workers'] < 1:
+            raise CommandError("--days and --workers must be at least 1.")
+        start = options['date'] or datetime.date.today()
+        bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write("No users.")
+            return
+        ranges = user_id_ranges(bounds['first'], bounds['last'], options['workers'])
+        jobs = [(start, options['days'], first, last, options['batch_size']) for first, last in ranges]
+
+        started = time.perf_counter()
+        if len(jobs) == 1:
+            due, written = materialize_logs(*jobs[0])
+        else:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=len(jobs), mp_context=context) as pool:
+                results = list(pool.map(materialize_logs, *zip(*jobs)))
+            due, written = (sum(counts) for counts in zip(*results))
+        seconds = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{due} doses due from {start} for {options['days']} day(s); wrote {written} new logs "
+            f"in {seconds:.2f}s ({written / max(seconds, 1e-9):.0f} rows/s) with {len(jobs)} worker(s)."
+        ))
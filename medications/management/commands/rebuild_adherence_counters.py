@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from medications.adherence import rebuild_adherence_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-medication, per-month adherence counter table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--medication',
+            type=int,
+            action='append',
+            dest='medication_ids',
+            help="Only rebuild counters for this medication ID (may be repeated).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of counter rows written per bulk insert.",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_adherence_counters(
+            medication_ids=options['medication_ids'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} adherence counter rows."))
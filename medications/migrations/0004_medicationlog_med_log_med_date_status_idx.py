@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0003_medication_dosing_schedule_medicationdosetime_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicationlog',
+            index=models.Index(fields=['medication', 'date', 'status'], name='med_log_med_date_status_idx'),
+        ),
+    ]
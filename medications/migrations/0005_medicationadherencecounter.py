@@ -0,0 +1,50 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Populate the counter table from the MedicationLog rows recorded so far.
+    """
+    MedicationLog = apps.get_model('medications', 'MedicationLog')
+    MedicationAdherenceCounter = apps.get_model('medications', 'MedicationAdherenceCounter')
+
+    grouped = MedicationLog.objects.annotate(month=TruncMonth('date')).values('medication_id', 'month').annotate(
+        taken=Count('id', filter=Q(status='taken')),
+        not_taken=Count('id', filter=Q(status='not_taken')),
+        not_recorded=Count('id', filter=Q(status='not_recorded')),
+    ).order_by('medication_id', 'month')
+
+    MedicationAdherenceCounter.objects.bulk_create(
+        (MedicationAdherenceCounter(**row) for row in grouped.iterator(chunk_size=1000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0004_medicationlog_med_log_med_date_status_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicationAdherenceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month covered by this counter.')),
+                ('taken', models.PositiveIntegerField(default=0, help_text='Number of logs marked as taken during the month.')),
+                ('not_taken', models.PositiveIntegerField(default=0, help_text='Number of logs marked as not taken during the month.')),
+                ('not_recorded', models.PositiveIntegerField(default=0, help_text='Number of logs still not recorded for the month.')),
+                ('medication', models.ForeignKey(help_text='Reference to the corresponding medication.', on_delete=django.db.models.deletion.CASCADE, related_name='adherence_counters', to='medications.medication')),
+            ],
+            options={
+                'verbose_name': 'Medication Adherence Counter',
+                'verbose_name_plural': 'Medication Adherence Counters',
+                'unique_together': {('medication', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def backfill_masks(apps, schema_editor):
+    """
+    Compile the recurring_days text of existing dose times into recurring_mask.
+    Unrecognized weekday names are skipped, as MedicationDoseTime.save() does.
+    """
+    MedicationDoseTime = apps.get_model('medications', 'MedicationDoseTime')
+
+    updated = []
+    for dose in MedicationDoseTime.objects.exclude(recurring_days='').only('id', 'recurring_days').iterator(chunk_size=1000):
+        mask = 0
+        for token in dose.recurring_days.split(','):
+            token = token.strip()[:3].title()
+            if token in WEEKDAYS:
+                mask |= 1 << WEEKDAYS.index(token)
+        dose.recurring_mask = mask
+        updated.append(dose)
+    MedicationDoseTime.objects.bulk_update(updated, ['recurring_mask'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0005_medicationadherencecounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationdosetime',
+            name='recurring_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Compiled form of recurring_days: bit 0 is Monday, 0 means no weekday restriction.'),
+        ),
+        migrations.RunPython(backfill_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+NEVER_DUE = 1 << 7
+
+
+def mark_never_due(apps, schema_editor):
+    """
+    Give dose times whose recurring_days names no weekday the NEVER_DUE mask.
+    0006 compiled them to 0, which made them due every day; before the mask
+    they were never due.
+    """
+    MedicationDoseTime = apps.get_model('medications', 'MedicationDoseTime')
+
+    updated = []
+    doses = MedicationDoseTime.objects.filter(recurring_mask=0).exclude(recurring_days='')
+    for dose in doses.only('id', 'recurring_days').iterator(chunk_size=1000):
+        if not dose.recurring_days.strip():
+            continue
+        if any(token.strip()[:3].title() in WEEKDAYS for token in dose.recurring_days.split(',')):
+            continue
+        dose.recurring_mask = NEVER_DUE
+        updated.append(dose)
+    MedicationDoseTime.objects.bulk_update(updated, ['recurring_mask'], batch_size=1000)
+
+
+def unmark_never_due(apps, schema_editor):
+    MedicationDoseTime = apps.get_model('medications', 'MedicationDoseTime')
+    MedicationDoseTime.objects.filter(recurring_mask=NEVER_DUE).update(recurring_mask=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0006_medicationdosetime_recurring_mask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicationdosetime',
+            name='recurring_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Compiled form of recurring_days: bit 0 is Monday, 0 means no weekday restriction, 128 means recurring_days names no weekday and the dose is never due.'),
+        ),
+        migrations.RunPython(mark_never_due, unmark_never_due),
+    ]
@@ -1,6 +1,39 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+# Weekday abbreviations accepted in MedicationDoseTime.recurring_days, indexed by date.weekday()
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Mask for a recurring_days value that names no weekday: no weekday bit is set, so the dose is never due
+NEVER_DUE = 1 << 7
+
+
+def parse_recurring_days(text, strict=True):
+    """
+    Compile a comma-separated weekday list such as "Mon,Wed,Fri" into a 7-bit
+    mask where bit 0 is Monday. Matching is case-insensitive and uses only the
+    first three letters, so "monday" works too. A blank value gives 0, which
+    means the dose is not restricted to particular weekdays.
+    Unknown names raise ValueError, or are skipped when strict is False; a
+    non-blank value with no weekday at all then gives NEVER_DUE, not 0.
+    """
+    mask = 0
+    for token in (text or '').split(','):
+        token = token.strip()[:3].title()
+        if not token:
+            continue
+        if token not in WEEKDAYS:
+            if strict:
+                raise ValueError(f"Unknown weekday: {token!r}")
+            continue
+        mask |= 1 << WEEKDAYS.index(token)
+    if not mask and (text or '').strip():
+        # Text that matches no weekday never did; it must not become "every day"
+        if strict:
+            raise ValueError(f"No weekday in {text!r}")
+        return NEVER_DUE
+    return mask
+
 
 class Medication(models.Model):
     """
@@ -62,6 +95,21 @@ class MedicationDoseTime(models.Model):
         blank=True,
         help_text="Comma-separated weekdays (e.g., 'Mon,Wed,Fri'). Leave blank for every day."
     )
+    recurring_mask = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Compiled form of recurring_days: bit 0 is Monday, 0 means no weekday restriction, "
+                  "128 means recurring_days names no weekday and the dose is never due."
+    )
+
+    def save(self, *args, **kwargs):
+        """
+        Compile recurring_days into recurring_mask before saving.
+        Unrecognized weekday names are skipped here, and a value with no weekday
+        at all is never due; the form rejects both.
+        """
+        self.recurring_mask = parse_recurring_days(self.recurring_days, strict=False)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.medication.name} at {self.scheduled_time}"
@@ -101,9 +149,51 @@ class MedicationLog(models.Model):
 
     class Meta:
         unique_together = ('medication', 'date', 'dose_time')
+        indexes = [
+            # Adherence statistics filter by medication and date, then count by status
+            models.Index(fields=['medication', 'date', 'status'], name='med_log_med_date_status_idx'),
+        ]
         verbose_name = "Medication Log"
         verbose_name_plural = "Medication Logs"
 
     def __str__(self):
         time_str = f" at {self.dose_time.scheduled_time}" if self.dose_time else ""
         return f"{self.medication.name} on {self.date}{time_str}: {self.status}"
+
+
+class MedicationAdherenceCounter(models.Model):
+    """
+    Per-medication, per-month tally of MedicationLog statuses.
+    Maintained by medications/adherence.py when MEDICATION_ADHERENCE_COUNTERS
+    is enabled, so lifetime adherence is a sum over a handful of monthly rows
+    instead of a count over every log ever recorded.
+    """
+    medication = models.ForeignKey(
+        Medication,
+        on_delete=models.CASCADE,
+        related_name='adherence_counters',
+        help_text="Reference to the corresponding medication."
+    )
+    month = models.DateField(
+        help_text="First day of the month covered by this counter."
+    )
+    taken = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of logs marked as taken during the month."
+    )
+    not_taken = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of logs marked as not taken during the month."
+    )
+    not_recorded = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of logs still not recorded for the month."
+    )
+
+    class Meta:
+        unique_together = ('medication', 'month')
+        verbose_name = "Medication Adherence Counter"
+        verbose_name_plural = "Medication Adherence Counters"
+
+    def __str__(self):
+        return f"{self.medication.name} {self.month:%Y-%m}: {self.taken} taken"
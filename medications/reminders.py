@@ -0,0 +1,351 @@
+"""
+Dose reminder dispatch.
+
+ReminderQueue keeps every dose occurrence due before a horizon in a binary
+heap ordered by fire time, so finding what is due costs O(log n) per
+reminder however many doses are queued. It is filled in bulk from
+MedicationDoseTime tuples and heapified once; a day's worth of doses for
+a large population fits in memory as small (timestamp, dose ID, generation)
+tuples.
+
+When a dose time or medication changes, the signal handlers append the dose
+IDs to a change feed in the cache (record_changes). The dispatcher reads the
+feed on every tick and reschedules only those doses: it bumps their
+generation, which turns their queued entries stale (they are dropped when
+popped), and pushes their new occurrences. Nothing is rescanned unless the
+feed has a gap. The feed carries an epoch token that is replaced whenever
+its sequence counter has to start again (a cache restart, eviction or
+clear), so a restarted counter is seen as a gap rather than as "no changes".
+
+ReminderDispatcher pops what is due, skips doses already recorded as taken or
+not taken, and emails each user one message per tick listing their doses.
+Messages are sent in batches, each over one connection of settings.EMAIL_BACKEND.
+Run it with the dispatch_reminders management command. The change feed must
+live in a cache shared with the web processes whose incr() is atomic
+(settings.REMINDER_CACHE_ALIAS), which check_feed_cache() checks. Without
+one, a dispatcher given a reload_interval ignores the feed and reloads its
+whole queue that often instead, so changes take up to that long to apply.
+"""
+
+import datetime
+import heapq
+import uuid
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import MedicationDoseTime, MedicationLog
+from .schedule import occurrences
+
+SEQUENCE_KEY = 'reminders:changes:sequence'
+EPOCH_KEY = 'reminders:changes:epoch'
+
+# Seconds a change stays in the feed; a dispatcher further behind reloads its queue
+FEED_TIMEOUT = 3600
+
+# Cache backends shared between processes whose incr() is atomic on the server
+FEED_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+)
+
+# Due doses looked up per query when sending
+DOSES_PER_LOOKUP = 1000
+
+# What occurrences() reads from a dose time and its medication
+_Dose = namedtuple('_Dose', 'id scheduled_time recurring_mask medication')
+_Medication = namedtuple('_Medication', 'frequency start_date')
+
+
+def reminder_cache():
+    """
+    Return the cache backend holding the change feed.
+    """
+    return caches[getattr(settings, 'REMINDER_CACHE_ALIAS', 'default')]
+
+
+def check_feed_cache():
+    """
+    Raise ImproperlyConfigured unless the change feed's cache can carry changes
+    from the web processes to the dispatcher. A process-local cache never sees
+    them, and a non-atomic incr() (e.g. the file or database cache) lets two
+    writers take the same sequence number and overwrite each other's change.
+    """
+    alias = getattr(settings, 'REMINDER_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in FEED_BACKENDS:
+        raise ImproperlyConfigured(
+            f"The reminder change feed uses the {alias!r} cache ({backend}), which is not shared "
+            f"between processes with an atomic incr(). Set REMINDER_CACHE_BACKEND and "
+            f"REMINDER_CACHE_LOCATION to a Redis or Memcached server."
+        )
+
+
+def _change_key(sequence):
+    return f"reminders:changes:{sequence}"
+
+
+def current_epoch():
+    """
+    Return the feed's epoch token, starting a new epoch when the sequence
+    counter is missing and has to start again from zero.
+    """
+    cache = reminder_cache()
+    if cache.add(SEQUENCE_KEY, 0, timeout=None):
+        # Sequence numbers from before the counter was lost mean nothing any more
+        cache.set(EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+    else:
+        cache.add(EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+    return cache.get(EPOCH_KEY)
+
+
+def record_changes(dose_ids):
+    """
+    Append changed or deleted dose IDs to the change feed once the current
+    transaction commits, so the dispatcher reads the committed rows.
+    """
+    dose_ids = list(dose_ids)
+    if not dose_ids:
+        return
+
+    def append():
+        current_epoch()
+        cache = reminder_cache()
+        cache.set(_change_key(cache.incr(SEQUENCE_KEY)), dose_ids, FEED_TIMEOUT)
+
+    transaction.on_commit(append)
+
+
+def read_changes(epoch, after):
+    """
+    Return (sequence, dose_ids) for the changes recorded in `epoch` after the
+    given sequence number. dose_ids is None when some changes may have been
+    lost: part of the feed expired, or the counter or epoch was reset.
+    """
+    cache = reminder_cache()
+    found = cache.get_many([EPOCH_KEY, SEQUENCE_KEY])
+    sequence = found.get(SEQUENCE_KEY)
+    if found.get(EPOCH_KEY) != epoch or sequence is None or sequence < after:
+        return after, None
+    if sequence == after:
+        return after, set()
+    keys = [_change_key(number) for number in range(after + 1, sequence + 1)]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        return sequence, None
+    return sequence, {dose_id for dose_ids in found.values() for dose_id in dose_ids}
+
+
+@lru_cache(maxsize=4096)
+def _fire_time(date, scheduled_time):
+    # Doses share a handful of times per day, so most conversions are cache hits
+    return timezone.make_aware(datetime.datetime.combine(date, scheduled_time)).timestamp()
+
+
+@lru_cache(maxsize=4096)
+def _fire_date(fire_at):
+    return timezone.localtime(datetime.datetime.fromtimestamp(fire_at, datetime.timezone.utc)).date()
+
+
+class ReminderQueue:
+    """
+    Heap of (fire timestamp, dose ID, generation) entries for the dose
+    occurrences due before `loaded_until`. An entry whose generation is older
+    than its dose's current one has been superseded and is skipped.
+    """
+
+    def __init__(self):
+        self._heap = []
+        # Only doses that have been rescheduled are stored; the rest are at generation 0
+        self._generation = {}
+        self.loaded_until = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _entries(self, doses, start, end):
+        """
+        Yield heap entries for the given dose times' occurrences in [start, end).
+        """
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        first_day, last_day = timezone.localdate(start), timezone.localdate(end)
+        for dose in doses:
+            generation = self._generation.get(dose.id, 0)
+            for date in occurrences(dose.medication, dose, first_day, last_day):
+                fire_at = _fire_time(date, dose.scheduled_time)
+                if start_ts <= fire_at < end_ts:
+                    yield (fire_at, dose.id, generation)
+
+    def _doses(self, queryset, batch_size):
+        """
+        Iterate dose times as tuples carrying only the fields the schedule
+        needs, in primary key pages.
+        """
+        rows = queryset.order_by('id').values_list(
+            'id', 'scheduled_time', 'recurring_mask', 'medication__frequency', 'medication__start_date',
+        )
+        last_id = 0
+        while True:
+            page = list(rows.filter(id__gt=last_id)[:batch_size])
+            if not page:
+                return
+            for dose_id, scheduled_time, mask, frequency, start_date in page:
+                yield _Dose(dose_id, scheduled_time, mask, _Medication(frequency, start_date))
+            if len(page) < batch_size:
+                return
+            last_id = page[-1][0]
+
+    def load(self, start, end, batch_size=5000):
+        """
+        Queue every dose occurrence in [start, end) and extend the horizon to
+        `end`. The entries are added in one pass and heapified once.
+        """
+        doses = MedicationDoseTime.objects.filter(medication__start_date__lte=timezone.localdate(end))
+        self._heap.extend(self._entries(self._doses(doses, batch_size), start, end))
+        heapq.heapify(self._heap)
+        self.loaded_until = end
+
+    def reschedule(self, dose_ids, now):
+        """
+        Replace the queued occurrences of the given dose IDs after `now` with
+        their current schedule. Deleted doses simply lose their entries.
+        """
+        for dose_id in dose_ids:
+            self._generation[dose_id] = self._generation.get(dose_id, 0) + 1
+        if self.loaded_until is None or now >= self.loaded_until:
+            return
+        doses = self._doses(MedicationDoseTime.objects.filter(id__in=dose_ids), len(dose_ids))
+        for entry in self._entries(doses, now, self.loaded_until):
+            heapq.heappush(self._heap, entry)
+
+    def clear(self):
+        self._heap.clear()
+        self._generation.clear()
+        self.loaded_until = None
+
+    def next_fire_time(self):
+        """
+        Return the timestamp of the earliest queued entry, or None.
+        """
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """
+        Remove and return [(dose ID, date), ...] for the current entries due at or before `now`.
+        """
+        now_ts = now.timestamp()
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            fire_at, dose_id, generation = heapq.heappop(self._heap)
+            if generation == self._generation.get(dose_id, 0):
+                due.append((dose_id, _fire_date(fire_at)))
+        return due
+
+
+class ReminderDispatcher:
+    """
+    Fire dose reminders from a ReminderQueue, keeping `horizon` of upcoming
+    occurrences loaded and sending the emails `batch_size` messages per connection.
+    With a `reload_interval` the change feed is not read; the queue is
+    reloaded from the database that often instead.
+    """
+
+    def __init__(self, horizon=datetime.timedelta(days=1), batch_size=100, reload_interval=None):
+        self.queue = ReminderQueue()
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.reload_interval = reload_interval
+        self.epoch = None
+        self.sequence = 0
+        self.loaded_at = None
+        self.last_tick = None
+
+    def start(self, now):
+        """
+        Load the queue from `now` to the horizon; changes recorded before this are already reflected.
+        """
+        if self.reload_interval is None:
+            self.epoch = current_epoch()
+            self.sequence = reminder_cache().get(SEQUENCE_KEY, 0)
+        self.queue.clear()
+        self.queue.load(now, now + self.horizon)
+        self.loaded_at = now
+
+    def tick(self, now):
+        """
+        Apply recorded changes, keep the horizon loaded, and send the reminders
+        due by `now`. Returns the number of emails sent.
+        """
+        if self.queue.loaded_until is None:
+            self.start(now)
+        elif self.reload_interval is not None:
+            if now - self.loaded_at >= self.reload_interval:
+                # Reload from just after the previous tick: doses due since then are still sent,
+                # and those it already sent (due at or before it) are not queued again
+                self.start(self.last_tick + datetime.timedelta(microseconds=1) if self.last_tick else now)
+        else:
+            self.sequence, changed = read_changes(self.epoch, self.sequence)
+            if changed is None:
+                # Changes may have been lost before they were read, so rebuild from scratch
+                self.start(now)
+            elif changed:
+                self.queue.reschedule(changed, now)
+        self.last_tick = now
+
+        if self.queue.loaded_until - now < self.horizon / 2:
+            # Extending in large steps keeps the full dose scan to twice per horizon
+            self.queue.load(self.queue.loaded_until, now + self.horizon)
+
+        due = self.queue.pop_due(now)
+        # Bounded chunks keep the lookups below the database's query parameter limit
+        return sum(self.send(due[offset:offset + DOSES_PER_LOOKUP]) for offset in range(0, len(due), DOSES_PER_LOOKUP))
+
+    def send(self, due):
+        """
+        Email each user one reminder listing their due doses that have no
+        recorded status yet. Returns the number of emails sent.
+        """
+        if not due:
+            return 0
+        dose_ids = {dose_id for dose_id, _ in due}
+        dates = {date for _, date in due}
+        recorded = set(
+            MedicationLog.objects
+            .filter(dose_time_id__in=dose_ids, date__in=dates)
+            .exclude(status='not_recorded')
+            .values_list('dose_time_id', 'date')
+        )
+        doses = {
+            dose.id: dose
+            for dose in MedicationDoseTime.objects.filter(id__in=dose_ids).select_related('medication__user')
+        }
+
+        lines = defaultdict(list)
+        for dose_id, date in due:
+            dose = doses.get(dose_id)
+            if dose is None or (dose_id, date) in recorded or not dose.medication.user.email:
+                continue
+            lines[dose.medication.user].append(
+                f"Take {dose.medication.name} at {dose.scheduled_time.strftime('%I:%M %p')}."
+            )
+
+        messages = [
+            EmailMessage(
+                subject="Medication reminder",
+                body="\n".join(user_lines),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[user.email],
+            )
+            for user, user_lines in lines.items()
+        ]
+        sent = 0
+        for offset in range(0, len(messages), self.batch_size):
+            # send_messages() opens the connection once for the whole batch
+            sent += get_connection().send_messages(messages[offset:offset + self.batch_size]) or 0
+        return sent
@@ -0,0 +1,138 @@
+"""
+Dose-schedule engine.
+
+Answers "which doses are due on this date" and "which doses fall in this date
+range" from the compiled MedicationDoseTime.recurring_mask and the owning
+Medication's frequency and start date:
+
+* daily   - due every day, or only on the masked weekdays
+* weekly  - due on the masked weekdays, or on the start date's weekday when none are set
+* monthly - due once a month on the start date's day of the month, clamped to
+            the last day of shorter months (weekday masks are ignored)
+
+Nothing is due before the medication's start date, and a dose whose
+recurring_days names no weekday (mask NEVER_DUE) is never due. Range expansion is done
+arithmetically per dose, so looking months ahead costs one query plus one
+step per occurrence.
+"""
+
+import calendar
+import datetime
+import heapq
+from .models import NEVER_DUE, MedicationDoseTime
+
+ALL_DAYS = 0b1111111
+ONE_DAY = datetime.timedelta(days=1)
+ONE_WEEK = datetime.timedelta(days=7)
+
+
+def effective_mask(medication, dose):
+    """
+    Return the weekday mask a daily or weekly dose actually follows.
+    """
+    if dose.recurring_mask:
+        return dose.recurring_mask
+    if medication.frequency == 'weekly':
+        return 1 << medication.start_date.weekday()
+    return ALL_DAYS
+
+
+def monthly_date(year, month, day):
+    """
+    Return the given day of the month, clamped to the month's last day.
+    """
+    return datetime.date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def is_due(medication, dose, date):
+    """
+    Return True when the dose applies on the given date.
+    """
+    if date < medication.start_date or dose.recurring_mask == NEVER_DUE:
+        return False
+    if medication.frequency == 'monthly':
+        return date == monthly_date(date.year, date.month, medication.start_date.day)
+    return bool(effective_mask(medication, dose) & (1 << date.weekday()))
+
+
+def occurrences(medication, dose, start, end):
+    """
+    Yield every date in the inclusive range [start, end] on which the dose is due, in order.
+    """
+    start = max(start, medication.start_date)
+    if start > end or dose.recurring_mask == NEVER_DUE:
+        return
+
+    if medication.frequency == 'monthly':
+        year, month = start.year, start.month
+        while True:
+            date = monthly_date(year, month, medication.start_date.day)
+            if date > end:
+                return
+            if date >= start:
+                yield date
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    mask = effective_mask(medication, dose)
+    if mask == ALL_DAYS:
+        date = start
+        while date <= end:
+            yield date
+            date += ONE_DAY
+        return
+
+    # One arithmetic sequence per selected weekday, merged back into date order
+    def weekly(first):
+        while first <= end:
+            yield first
+            first += ONE_WEEK
+
+    firsts = (start + datetime.timedelta(days=offset) for offset in range(7))
+    yield from heapq.merge(*(weekly(first) for first in firsts if mask & (1 << first.weekday())))
+
+
+def user_dose_times(user, until=None):
+    """
+    Load the user's dose times and their medications with a single query.
+    Medications that start after `until` are left out.
+    """
+    doses = MedicationDoseTime.objects.filter(medication__user=user).select_related('medication')
+    if until is not None:
+        doses = doses.filter(medication__start_date__lte=until)
+    return doses.order_by('scheduled_time', 'id')
+
+
+def due_on(medications, date):
+    """
+    Return the (medication, dose) pairs due on the given date, in schedule order
+    (by scheduled time). The medications should have their dose_times prefetched.
+    """
+    due = [
+        (med, dose)
+        for med in medications
+        for dose in med.dose_times.all()
+        if is_due(med, dose, date)
+    ]
+    due.sort(key=lambda pair: (pair[1].scheduled_time, pair[1].id))
+    return due
+
+
+def doses_due_on(user, date):
+    """
+    Return the user's doses due on the given date, ordered by scheduled time.
+    """
+    return [dose for dose in user_dose_times(user, until=date) if is_due(dose.medication, dose, date)]
+
+
+def doses_due_between(user, start, end):
+    """
+    Return (date, dose) pairs for every dose the user has due in the inclusive
+    range [start, end], ordered by date and then scheduled time.
+    """
+    def dated(dose):
+        return ((date, dose) for date in occurrences(dose.medication, dose, start, end))
+
+    return list(heapq.merge(
+        *(dated(dose) for dose in user_dose_times(user, until=end)),
+        key=lambda item: (item[0], item[1].scheduled_time),
+    ))
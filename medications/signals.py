@@ -0,0 +1,101 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from healthy_you.cache import invalidate_dashboards, is_cascade_delete
+from .adherence import counters_enabled, month_start, refresh_adherence_counters
+from .models import Medication, MedicationDoseTime, MedicationLog
+from .reminders import record_changes
+
+
+@receiver(pre_save, sender=MedicationLog)
+def remember_previous_counter_month(sender, instance, raw=False, **kwargs):
+    """
+    Record the (medication, month) an existing log belonged to before it is saved,
+    so the old month's counter can be refreshed if the log moves.
+    """
+    instance._previous_counter_month = None
+    if raw or instance.pk is None or not counters_enabled():
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('medication_id', 'date').first()
+    if previous and (previous[0], month_start(previous[1])) != (instance.medication_id, month_start(instance.date)):
+        instance._previous_counter_month = previous
+
+
+@receiver(post_save, sender=MedicationLog)
+def update_counter_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Keep the monthly adherence counter current whenever a log is created or edited.
+    """
+    if raw or not counters_enabled():
+        return
+    refresh_adherence_counters([instance.medication_id], instance.date)
+    previous = getattr(instance, '_previous_counter_month', None)
+    if previous:
+        refresh_adherence_counters([previous[0]], previous[1])
+
+
+def _deletes_counters(origin):
+    """
+    Return True when logs are deleted because their medication or user is,
+    which deletes the medication's counters along with them.
+    """
+    if origin is None:
+        return False
+    model = origin._meta.model if hasattr(origin, '_meta') else origin.model
+    return model in (Medication, User)
+
+
+@receiver(post_delete, sender=MedicationLog)
+def update_counter_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Keep the monthly adherence counter current whenever a log is deleted.
+    """
+    if not counters_enabled() or _deletes_counters(origin):
+        return
+    refresh_adherence_counters([instance.medication_id], instance.date)
+
+
+def _owner_id(instance):
+    """
+    Return the user ID owning a medication, dose time or log, reusing a loaded
+    medication when there is one.
+    """
+    if isinstance(instance, Medication):
+        return instance.user_id
+    if type(instance).medication.is_cached(instance):
+        return instance.medication.user_id
+    return Medication.objects.filter(pk=instance.medication_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+@receiver(post_save, sender=MedicationDoseTime)
+@receiver(post_delete, sender=MedicationDoseTime)
+@receiver(post_save, sender=MedicationLog)
+@receiver(post_delete, sender=MedicationLog)
+def invalidate_dashboards_on_change(sender, instance, origin=None, **kwargs):
+    """
+    Move the owner to a new dashboard data version whenever their medications change.
+    """
+    if not is_cascade_delete(sender, origin):
+        invalidate_dashboards(_owner_id(instance))
+
+
+@receiver(post_save, sender=MedicationDoseTime)
+@receiver(post_delete, sender=MedicationDoseTime)
+def reschedule_dose_reminders(sender, instance, raw=False, **kwargs):
+    """
+    Tell the reminder dispatcher to requeue a dose time that was added, edited or deleted.
+    """
+    if not raw:
+        record_changes([instance.pk])
+
+
+@receiver(post_save, sender=Medication)
+def reschedule_medication_reminders(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Requeue a medication's dose times when its frequency or start date may have changed.
+    Deleting a medication deletes its dose times, which requeue themselves.
+    """
+    if not raw and not created:
+        record_changes(instance.dose_times.values_list('id', flat=True))
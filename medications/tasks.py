@@ -0,0 +1,43 @@
+import datetime
+from celery import group, shared_task
+from django.contrib.auth.models import User
+from django.db.models import Max, Min
+from .adherence import rebuild_adherence_counters as rebuild_counters
+from .logs import materialize_logs as materialize, user_id_ranges
+
+
+@shared_task
+def rebuild_adherence_counters(medication_ids=None):
+    """
+    Rebuild the monthly adherence counters, for every medication or only the
+    given medication IDs. Returns the number of counter rows written.
+    """
+    return rebuild_counters(medication_ids=medication_ids)
+
+
+@shared_task
+def materialize_logs(date=None, days=1, first_user_id=None, last_user_id=None, batch_size=1000):
+    """
+    Create the MedicationLog rows for every dose due in the `days` days from
+    the given ISO date (today by default), for all users or an inclusive
+    user ID range. Returns the number of new rows.
+    """
+    start = datetime.date.fromisoformat(date) if date else datetime.date.today()
+    _, written = materialize(start, days, first_user_id, last_user_id, batch_size)
+    return written
+
+
+@shared_task
+def materialize_logs_parallel(date=None, days=1, shards=4, batch_size=1000):
+    """
+    Split the users into `shards` ID ranges and queue one materialize_logs
+    task per range, so the workers share the job. Returns the number of
+    tasks queued.
+    """
+    date = date or datetime.date.today().isoformat()
+    bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return 0
+    ranges = user_id_ranges(bounds['first'], bounds['last'], shards)
+    group(materialize_logs.s(date, days, first, last, batch_size) for first, last in ranges).apply_async()
+    return len(ranges)
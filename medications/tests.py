@@ -1,8 +1,21 @@
-from django.test import TestCase, Client
+import io
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
-from .models import Medication, MedicationDoseTime, MedicationLog
+from django.utils import timezone
+from .models import Medication, MedicationAdherenceCounter, MedicationDoseTime, MedicationLog, NEVER_DUE, parse_recurring_days
+from .adherence import adherence_counts, lifetime_adherence, rebuild_adherence_counters
+from .schedule import doses_due_between, doses_due_on, due_on, is_due
 from .forms import MedicationForm, MedicationDoseTimeForm
+from .logs import user_id_ranges
+from .reminders import SEQUENCE_KEY, ReminderDispatcher, check_feed_cache, read_changes, record_changes, reminder_cache
+from .tasks import materialize_logs, materialize_logs_parallel
 import datetime
 
 
@@ -178,3 +191,472 @@ class MedicationFormsTest(TestCase):
             'start_date': ''  # Missing required start_date
         })
         self.assertFalse(form.is_valid())
+
+
+class MedicationDashboardQueryCountTest(TestCase):
+    """
+    The dashboard's query count must not grow with the number of medications.
+    """
+
+    MAX_QUERIES = 10
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_login(self.user)
+
+    def add_medications(self, count, doses_per_medication=2):
+        for i in range(count):
+            med = Medication.objects.create(
+                user=self.user,
+                name=f'Medication {Medication.objects.count()}',
+                frequency='daily',
+                start_date=datetime.date.today(),
+            )
+            for hour in range(doses_per_medication):
+                MedicationDoseTime.objects.create(medication=med, scheduled_time=datetime.time(8 + hour, 0))
+
+    def count_dashboard_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('medications_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_query_count_is_constant(self):
+        """
+        Test that first and repeated loads issue the same number of queries for 1 and 10 medications.
+        """
+        self.add_medications(1)
+        small_first = self.count_dashboard_queries()
+        small_repeat = self.count_dashboard_queries()
+
+        self.add_medications(9)
+        MedicationLog.objects.all().delete()
+        large_first = self.count_dashboard_queries()
+        large_repeat = self.count_dashboard_queries()
+
+        self.assertEqual(small_first, large_first)
+        self.assertEqual(small_repeat, large_repeat)
+        self.assertLessEqual(large_first, self.MAX_QUERIES)
+
+    def test_logs_materialized_once(self):
+        """
+        Test that every due dose gets exactly one log, even across repeated loads.
+        """
+        self.add_medications(3)
+        self.client.get(reverse('medications_dashboard'))
+        response = self.client.get(reverse('medications_dashboard'))
+        self.assertEqual(MedicationLog.objects.count(), 6)
+        self.assertEqual(len(response.context['today_logs']), 6)
+        self.assertTrue(all(log.pk for log in response.context['today_logs']))
+
+    def test_materialize_task(self):
+        """
+        Test that the background task creates the day's logs for every user, in batches, only once.
+        """
+        self.add_medications(3)
+        other = User.objects.create_user(username='otheruser', password='password')
+        med = Medication.objects.create(user=other, name='Other', frequency='daily', start_date=datetime.date.today())
+        MedicationDoseTime.objects.create(medication=med, scheduled_time=datetime.time(9, 0))
+
+        self.assertEqual(materialize_logs.apply(kwargs={'batch_size': 1}).get(), 7)
+        self.assertEqual(materialize_logs.apply(args=[datetime.date.today().isoformat()]).get(), 0)
+        self.assertEqual(MedicationLog.objects.count(), 7)
+        self.assertEqual(materialize_logs.apply(args=['2000-01-01']).get(), 0)
+
+    def test_materialize_counts_only_rows_it_inserted(self):
+        """
+        Test that a log another run inserts between the existing-log read and
+        the bulk insert is not counted as written.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest("The concurrent insert is written in SQLite's parameter style.")
+        self.add_medications(3)
+        dose = MedicationDoseTime.objects.filter(medication__user=self.user).first()
+        inserted = []
+
+        def concurrent_insert(execute, sql, params, many, context):
+            if sql.startswith('INSERT') and '"medications_medicationlog"' in sql and not inserted:
+                inserted.append(True)
+                # Straight through the DB-API connection, as another worker's insert would not pass this one's wrappers
+                connection.connection.execute(
+                    'INSERT INTO medications_medicationlog (medication_id, dose_time_id, date, status) VALUES (?, ?, ?, ?)',
+                    (dose.medication_id, dose.id, datetime.date.today().isoformat(), 'not_recorded'),
+                )
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent_insert):
+            self.assertEqual(materialize_logs.apply().get(), 5)
+        self.assertEqual(MedicationLog.objects.count(), 6)
+
+    def test_materialize_task_by_user_range_and_days(self):
+        """
+        Test that a run covers only its user ID range and every requested day, and updates the counters.
+        """
+        self.add_medications(1)
+        other = User.objects.create_user(username='otheruser', password='password')
+        med = Medication.objects.create(user=other, name='Other', frequency='daily', start_date=datetime.date.today())
+        MedicationDoseTime.objects.create(medication=med, scheduled_time=datetime.time(9, 0))
+
+        materialize_logs.apply(kwargs={'days': 3, 'first_user_id': other.id, 'last_user_id': other.id}).get()
+        self.assertEqual(MedicationLog.objects.filter(medication=med).count(), 3)
+        self.assertFalse(MedicationLog.objects.filter(medication__user=self.user).exists())
+        self.assertEqual(lifetime_adherence(other)['overall']['not_recorded'], 3)
+
+        # Tasks run eagerly here, so the queued shards have finished on return
+        self.assertEqual(materialize_logs_parallel.apply(kwargs={'shards': 2}).get(), 2)
+        self.assertEqual(MedicationLog.objects.filter(medication__user=self.user).count(), 2)
+
+    def test_dashboard_only_reads_after_materialization(self):
+        """
+        Test that once the job has run, the dashboard inserts nothing.
+        """
+        self.add_medications(2)
+        call_command('materialize_medication_logs', stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('medications_dashboard'))
+        self.assertEqual(len(response.context['today_logs']), 4)
+        self.assertFalse(any(query['sql'].startswith('INSERT') for query in captured))
+
+    def test_user_id_ranges(self):
+        """
+        Test that user ID ranges cover the span without gaps or overlaps.
+        """
+        self.assertEqual(user_id_ranges(1, 10, 3), [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(user_id_ranges(5, 6, 4), [(5, 5), (6, 6)])
+        self.assertEqual(user_id_ranges(7, 7, 1), [(7, 7)])
+
+
+class AdherenceStatisticsTest(TestCase):
+    """
+    Status counts from the adherence service, with and without the monthly counters.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.med_a = Medication.objects.create(
+            user=self.user, name='A', frequency='daily', start_date=datetime.date(2024, 1, 1)
+        )
+        self.med_b = Medication.objects.create(
+            user=self.user, name='B', frequency='daily', start_date=datetime.date(2024, 1, 1)
+        )
+        self.dose_a = MedicationDoseTime.objects.create(medication=self.med_a, scheduled_time=datetime.time(8, 0))
+        self.dose_b = MedicationDoseTime.objects.create(medication=self.med_b, scheduled_time=datetime.time(8, 0))
+        statuses = ['taken', 'taken', 'not_taken', 'not_recorded']
+        for offset, status in enumerate(statuses):
+            day = datetime.date(2024, 1, 30) + datetime.timedelta(days=offset)
+            MedicationLog.objects.create(medication=self.med_a, dose_time=self.dose_a, date=day, status=status)
+        MedicationLog.objects.create(
+            medication=self.med_b, dose_time=self.dose_b, date=datetime.date(2024, 2, 1), status='taken'
+        )
+
+    def test_window_counts_in_one_query(self):
+        """
+        Test that overall and per-medication counts for a window come from a single query.
+        """
+        with self.assertNumQueries(1):
+            counts = adherence_counts(self.user, start=datetime.date(2024, 2, 1), end=datetime.date(2024, 2, 2))
+        self.assertEqual(counts['overall'], {'taken': 1, 'not_taken': 1, 'not_recorded': 1})
+        self.assertEqual(counts['by_medication'][self.med_a.id], {'taken': 0, 'not_taken': 1, 'not_recorded': 1})
+        self.assertEqual(counts['by_medication'][self.med_b.id], {'taken': 1, 'not_taken': 0, 'not_recorded': 0})
+
+    def test_counters_match_raw_counts(self):
+        """
+        Test that the counter table tracks creates, status edits, moves and deletes.
+        """
+        log = MedicationLog.objects.get(medication=self.med_a, date=datetime.date(2024, 2, 2))
+        log.status = 'taken'
+        log.save()
+        moved = MedicationLog.objects.get(medication=self.med_a, date=datetime.date(2024, 1, 30))
+        moved.date = datetime.date(2024, 3, 1)
+        moved.save()
+        MedicationLog.objects.filter(medication=self.med_a, date=datetime.date(2024, 2, 1)).delete()
+
+        with self.settings(MEDICATION_ADHERENCE_COUNTERS=True):
+            from_counters = lifetime_adherence(self.user)
+        with self.settings(MEDICATION_ADHERENCE_COUNTERS=False):
+            from_logs = lifetime_adherence(self.user)
+        self.assertEqual(from_counters, from_logs)
+        self.assertEqual(from_counters['overall'], {'taken': 4, 'not_taken': 0, 'not_recorded': 0})
+
+    def test_rebuild_counters(self):
+        """
+        Test that rebuilding the counter table reproduces the incrementally maintained rows.
+        """
+        before = sorted(MedicationAdherenceCounter.objects.values_list('medication_id', 'month', 'taken', 'not_taken', 'not_recorded'))
+        self.assertEqual(rebuild_adherence_counters(), 3)
+        after = sorted(MedicationAdherenceCounter.objects.values_list('medication_id', 'month', 'taken', 'not_taken', 'not_recorded'))
+        self.assertEqual(before, after)
+
+    def test_dashboard_overall_counts(self):
+        """
+        Test that the dashboard's overall counts include the logs materialized for today.
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('medications_dashboard'))
+        self.assertEqual(response.context['today_not_recorded'], 2)
+        self.assertEqual(response.context['overall_taken'], 3)
+        self.assertEqual(response.context['overall_not_taken'], 1)
+        self.assertEqual(response.context['overall_not_recorded'], 3)
+
+
+class DoseScheduleTest(TestCase):
+    """
+    The compiled weekday mask and the schedule engine built on it.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        # 2024-01-31 is a Wednesday
+        self.start = datetime.date(2024, 1, 31)
+
+    def add_dose(self, frequency, recurring_days='', hour=8):
+        med = Medication.objects.create(
+            user=self.user, name=f'{frequency} {hour}', frequency=frequency, start_date=self.start
+        )
+        return MedicationDoseTime.objects.create(
+            medication=med, scheduled_time=datetime.time(hour, 0), recurring_days=recurring_days
+        )
+
+    def test_mask_compiled_on_save(self):
+        """
+        Test that recurring_days is compiled to a Monday-first bitmask, case-insensitively.
+        """
+        self.assertEqual(self.add_dose('daily', 'Mon, wed,FRIDAY').recurring_mask, 0b10101)
+        self.assertEqual(self.add_dose('daily').recurring_mask, 0)
+        with self.assertRaises(ValueError):
+            parse_recurring_days('Mon,Someday')
+
+    def test_unparseable_days_are_never_due(self):
+        """
+        Test that recurring_days naming no weekday is never due rather than due
+        every day, while recognized weekdays next to unknown ones still count.
+        """
+        for frequency in ('daily', 'weekly', 'monthly'):
+            dose = self.add_dose(frequency, 'Xyz')
+            self.assertEqual(dose.recurring_mask, NEVER_DUE)
+            self.assertFalse(is_due(dose.medication, dose, self.start))
+        self.assertEqual(doses_due_between(self.user, self.start, self.start + datetime.timedelta(days=60)), [])
+        self.assertEqual(self.add_dose('daily', 'Mon,Xyz').recurring_mask, 0b1)
+        with self.assertRaises(ValueError):
+            parse_recurring_days(' , ')
+
+    def test_due_on_is_in_schedule_order(self):
+        """
+        Test that due_on orders doses by scheduled time across medications.
+        """
+        late = self.add_dose('daily', hour=20)
+        early = self.add_dose('daily', hour=7)
+        medications = Medication.objects.filter(user=self.user).order_by('id').prefetch_related('dose_times')
+        self.assertEqual([dose for _, dose in due_on(medications, self.start)], [early, late])
+
+    def test_form_rejects_unknown_weekdays(self):
+        """
+        Test that the dose time form rejects text the engine cannot compile.
+        """
+        form = MedicationDoseTimeForm(data={'scheduled_time': '08:00', 'recurring_days': 'Mon,Funday'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('recurring_days', form.errors)
+
+    def test_frequencies(self):
+        """
+        Test daily, weekly and monthly doses over a range, including the start-date cutoff.
+        """
+        daily = self.add_dose('daily', 'Mon,Fri', hour=8)
+        weekly = self.add_dose('weekly', hour=9)
+        monthly = self.add_dose('monthly', hour=10)
+
+        due = doses_due_between(self.user, datetime.date(2024, 1, 1), datetime.date(2024, 3, 31))
+        by_dose = {dose.id: [date for date, d in due if d.id == dose.id] for dose in (daily, weekly, monthly)}
+
+        self.assertEqual(by_dose[monthly.id], [datetime.date(2024, 1, 31), datetime.date(2024, 2, 29), datetime.date(2024, 3, 31)])
+        self.assertEqual(by_dose[weekly.id][:2], [datetime.date(2024, 1, 31), datetime.date(2024, 2, 7)])
+        self.assertTrue(all(date.weekday() == 2 for date in by_dose[weekly.id]))
+        self.assertEqual(by_dose[daily.id][:3], [datetime.date(2024, 2, 2), datetime.date(2024, 2, 5), datetime.date(2024, 2, 9)])
+        self.assertEqual(due, sorted(due, key=lambda item: (item[0], item[1].scheduled_time)))
+
+        # The range expansion and the single-date check must agree
+        for date, dose in due:
+            self.assertTrue(is_due(dose.medication, dose, date))
+        self.assertEqual(len(due), sum(
+            is_due(dose.medication, dose, self.start + datetime.timedelta(days=offset))
+            for dose in (daily, weekly, monthly)
+            for offset in range(61)
+        ))
+
+    def test_single_query(self):
+        """
+        Test that due doses for a date or a range are answered with one query.
+        """
+        for hour in range(5):
+            self.add_dose('daily', hour=hour)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(doses_due_on(self.user, self.start)), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(doses_due_between(self.user, self.start, self.start + datetime.timedelta(days=179))), 900)
+
+
+class ReminderDispatchTest(TestCase):
+    """
+    Test cases for the dose reminder queue and dispatcher.
+    """
+
+    def setUp(self):
+        reminder_cache().clear()
+        self.day = datetime.date(2024, 1, 10)
+        self.user = User.objects.create_user(username='reminded', email='reminded@example.com', password='pw')
+        self.medication = Medication.objects.create(
+            user=self.user, name='Aspirin', frequency='daily', start_date=datetime.date(2024, 1, 1),
+        )
+        self.morning = MedicationDoseTime.objects.create(medication=self.medication, scheduled_time=datetime.time(8, 0))
+        self.later = MedicationDoseTime.objects.create(medication=self.medication, scheduled_time=datetime.time(9, 0))
+        self.dispatcher = ReminderDispatcher()
+        self.dispatcher.start(self.at(0))
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.datetime.combine(self.day, datetime.time(hour, minute)))
+
+    def test_fires_at_scheduled_time(self):
+        """
+        Test that each dose is sent once, when its time arrives, and not before.
+        """
+        self.assertEqual(len(self.dispatcher.queue), 2)
+        self.assertEqual(self.dispatcher.tick(self.at(7, 59)), 0)
+        self.assertEqual(self.dispatcher.tick(self.at(8, 30)), 1)
+        self.assertEqual(mail.outbox[0].to, ['reminded@example.com'])
+        self.assertIn('Take Aspirin at 08:00 AM.', mail.outbox[0].body)
+        self.assertEqual(self.dispatcher.tick(self.at(8, 45)), 0)
+        self.assertEqual(self.dispatcher.tick(self.at(9, 0)), 1)
+
+        # The horizon moves forward as the day goes on
+        self.assertEqual(self.dispatcher.tick(self.at(13)), 0)
+        self.day += datetime.timedelta(days=1)
+        self.assertEqual(self.dispatcher.tick(self.at(9)), 1)
+
+    def test_skips_recorded_doses_and_groups_per_user(self):
+        """
+        Test that doses already recorded are skipped and a user's due doses share one email.
+        """
+        evening = MedicationDoseTime.objects.create(medication=self.medication, scheduled_time=datetime.time(9, 30))
+        MedicationLog.objects.create(medication=self.medication, dose_time=self.morning, date=self.day, status='taken')
+        self.dispatcher.start(self.at(0))
+        self.assertEqual(self.dispatcher.tick(self.at(10)), 1)
+        self.assertNotIn('08:00', mail.outbox[0].body)
+        self.assertIn('09:00 AM', mail.outbox[0].body)
+        self.assertIn(evening.scheduled_time.strftime('%I:%M %p'), mail.outbox[0].body)
+
+    def test_sends_in_batches(self):
+        """
+        Test that every user gets their email when the messages span several batches.
+        """
+        for index in range(4):
+            user = User.objects.create_user(username=f'batch{index}', email=f'batch{index}@example.com', password='pw')
+            med = Medication.objects.create(user=user, name='Vitamin D', frequency='daily', start_date=self.day)
+            MedicationDoseTime.objects.create(medication=med, scheduled_time=datetime.time(8, 0))
+        dispatcher = ReminderDispatcher(batch_size=2)
+        dispatcher.start(self.at(0))
+        self.assertEqual(dispatcher.tick(self.at(8)), 5)
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), 5)
+
+    def test_changes_are_applied_incrementally(self):
+        """
+        Test that edited, added and deleted dose times are requeued from the change feed without a reload.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.morning.scheduled_time = datetime.time(10, 0)
+            self.morning.save()
+            MedicationDoseTime.objects.create(medication=self.medication, scheduled_time=datetime.time(11, 0))
+            self.later.delete()
+
+        with self.assertNumQueries(1):
+            # Only the two surviving changed doses are read back
+            self.assertEqual(self.dispatcher.tick(self.at(9, 30)), 0)
+        self.assertEqual(self.dispatcher.tick(self.at(10)), 1)
+        self.assertIn('10:00 AM', mail.outbox[0].body)
+        self.assertEqual(self.dispatcher.tick(self.at(11)), 1)
+
+    def test_medication_changes_requeue_its_doses(self):
+        """
+        Test that moving a medication's start date reschedules its dose times.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medication.start_date = self.day + datetime.timedelta(days=1)
+            self.medication.save()
+        self.assertEqual(self.dispatcher.tick(self.at(12)), 0)
+
+    def test_feed_gap_rebuilds_the_queue(self):
+        """
+        Test that a change that expired from the feed makes the dispatcher reload everything.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.later.delete()
+        reminder_cache().delete(f"reminders:changes:{reminder_cache().get(SEQUENCE_KEY)}")
+        self.assertEqual(self.dispatcher.tick(self.at(0, 1)), 0)
+        self.assertEqual(len(self.dispatcher.queue), 1)
+
+    def test_feed_cache_must_be_shared(self):
+        """
+        Test that only a shared cache with an atomic incr() is accepted for the change feed.
+        """
+        for backend in ('locmem.LocMemCache', 'filebased.FileBasedCache', 'db.DatabaseCache'):
+            caches_setting = {**settings.CACHES, 'reminders': {'BACKEND': f'django.core.cache.backends.{backend}'}}
+            with self.subTest(backend=backend), override_settings(CACHES=caches_setting):
+                with self.assertRaisesMessage(ImproperlyConfigured, 'REMINDER_CACHE_BACKEND'):
+                    check_feed_cache()
+
+        shared = {**settings.CACHES, 'reminders': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/1',
+        }}
+        with override_settings(CACHES=shared):
+            check_feed_cache()
+
+    def test_once_runs_on_default_settings(self):
+        """
+        Test that a single pass sends what is due without a shared change feed.
+        """
+        now = timezone.localtime()
+        user = User.objects.create_user(username='once', email='once@example.com', password='pw')
+        medication = Medication.objects.create(user=user, name='Iron', frequency='daily', start_date=now.date())
+        MedicationDoseTime.objects.create(
+            medication=medication, scheduled_time=(now - datetime.timedelta(seconds=5)).time(),
+        )
+        out = io.StringIO()
+        call_command('dispatch_reminders', '--once', '--interval', '60', stdout=out)
+        self.assertIn('once@example.com', [message.to[0] for message in mail.outbox])
+        self.assertIn('Take Iron', mail.outbox[-1].body)
+
+    def test_without_a_feed_the_queue_is_reloaded(self):
+        """
+        Test that a dispatcher without the change feed picks up changes at its
+        next reload and does not send a dose twice.
+        """
+        dispatcher = ReminderDispatcher(reload_interval=datetime.timedelta(minutes=5))
+        dispatcher.start(self.at(0))
+        self.morning.scheduled_time = datetime.time(10, 0)
+        self.morning.save()
+        self.assertEqual(dispatcher.tick(self.at(0, 1)), 0)
+        self.assertEqual(len(dispatcher.queue), 2)
+        self.assertEqual(dispatcher.tick(self.at(9)), 1)
+        self.assertEqual(dispatcher.tick(self.at(9, 10)), 0)
+        self.assertEqual(dispatcher.tick(self.at(10)), 1)
+        self.assertNotIn('09:00', mail.outbox[-1].body)
+        self.assertIn('10:00 AM', mail.outbox[-1].body)
+
+    def test_cache_reset_rebuilds_the_queue(self):
+        """
+        Test that changes recorded after the cache lost the feed are not missed
+        when the restarted counter is still below the dispatcher's position.
+        """
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                record_changes([self.morning.pk])
+        self.dispatcher.tick(self.at(0, 1))
+        self.assertEqual(self.dispatcher.sequence, 3)
+
+        reminder_cache().clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.later.delete()
+        self.assertEqual(read_changes(self.dispatcher.epoch, 3), (3, None))
+        self.dispatcher.tick(self.at(0, 2))
+        self.assertEqual(len(self.dispatcher.queue), 1)
+        self.assertEqual(self.dispatcher.tick(self.at(9, 30)), 1)
+        self.assertEqual(read_changes(self.dispatcher.epoch, self.dispatcher.sequence), (self.dispatcher.sequence, set()))
@@ -3,73 +3,69 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.forms import inlineformset_factory
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
+from healthy_you.cache import cached_context
+from healthy_you.replicas import replica_reads
 from .models import Medication, MedicationDoseTime, MedicationLog
 from .forms import MedicationForm, MedicationDoseTimeForm
+from .adherence import empty_counts, lifetime_adherence
+from .logs import materialize_daily_logs
 
 
 @login_required
+@replica_reads
 def medications_dashboard(request):
     """
     Displays the dashboard for the logged-in user's medications,
     showing today's logs and adherence statistics.
     """
+    # Today's logs and adherence only change with the user's data, so the context is cached per day
     today = datetime.date.today()
+    context = cached_context(
+        'medications', request.user, lambda: _build_dashboard_context(request.user, today), today
+    )
+    return render(request, 'medications/medications_dashboard.html', context)
+
+
+def _build_dashboard_context(user, today):
+    """
+    Materialize today's logs and compute reminders and adherence statistics for a user.
+    """
+    # Get all medications for the current user, with their dose times in one extra query
+    medications = Medication.objects.filter(user=user).prefetch_related('dose_times')
 
-    # Get all medications for the current user
-    medications = Medication.objects.filter(user=request.user)
-
-    # Build today's logs by iterating over each medication's dose times
-    today_logs = []
-    for med in medications:
-        for dose in med.dose_times.all():
-            # Check if today matches the recurring days (if any)
-            if dose.recurring_days:
-                days = [d.strip() for d in dose.recurring_days.split(',')]
-                if today.strftime("%a") not in days:
-                    continue
-
-            # Create or retrieve today's log for this dose
-            log, created = MedicationLog.objects.get_or_create(
-                medication=med,
-                date=today,
-                dose_time=dose,
-                defaults={'status': 'not_recorded'}
-            )
-            today_logs.append(log)
-            # Create user-friendly reminder message
-            if log.status == 'not_recorded':
-                reminder_msg = f"💊 Reminder: Take {med.name} at {dose.scheduled_time.strftime('%I:%M %p')}."
-                if 'reminders' not in locals():
-                    reminders = []
-                reminders.append(reminder_msg)
-
-    # Compute adherence statistics for today
-    today_taken = sum(1 for log in today_logs if log.status == 'taken')
-    today_not_taken = sum(1 for log in today_logs if log.status == 'not_taken')
-    today_not_recorded = sum(1 for log in today_logs if log.status == 'not_recorded')
-
-    # Compute overall adherence across all logs
-    all_logs = MedicationLog.objects.filter(medication__user=request.user)
-    overall_taken = all_logs.filter(status='taken').count()
-    overall_not_taken = all_logs.filter(status='not_taken').count()
-    overall_not_recorded = all_logs.filter(status='not_recorded').count()
+    # Load the logs for every dose due today; the nightly job has normally created them already,
+    # and any that are missing are created here in a single batch
+    today_logs = materialize_daily_logs(medications, today)
+
+    # Create user-friendly reminder messages for doses not yet recorded
+    reminders = [
+        f"💊 Reminder: Take {log.medication.name} at {log.dose_time.scheduled_time.strftime('%I:%M %p')}."
+        for log in today_logs
+        if log.status == 'not_recorded'
+    ]
+
+    # Compute adherence statistics for today in a single pass over the logs
+    today_counts = empty_counts()
+    for log in today_logs:
+        today_counts[log.status] += 1
+
+    # Overall adherence across all logs, read from the monthly counters when enabled
+    overall_counts = lifetime_adherence(user)['overall']
 
     # Context for the dashboard template
-    context = {
+    return {
         'medications': medications,
         'today': today,
         'today_logs': today_logs,
-        'today_taken': today_taken,
-        'today_not_taken': today_not_taken,
-        'today_not_recorded': today_not_recorded,
-        'overall_taken': overall_taken,
-        'overall_not_taken': overall_not_taken,
-        'overall_not_recorded': overall_not_recorded,
-        'reminders': reminders if 'reminders' in locals() else [],
+        'today_taken': today_counts['taken'],
+        'today_not_taken': today_counts['not_taken'],
+        'today_not_recorded': today_counts['not_recorded'],
+        'overall_taken': overall_counts['taken'],
+        'overall_not_taken': overall_counts['not_taken'],
+        'overall_not_recorded': overall_counts['not_recorded'],
+        'reminders': reminders,
     }
 
-    return render(request, 'medications/medications_dashboard.html', context)
-
 
 @login_required
 def medication_create(request):
@@ -0,0 +1,34 @@
+import datetime
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from healthy_you.api import series_query, user_data_condition
+from healthy_you.cache import cached_context
+from healthy_you.downsample import downsample_payload
+from healthy_you.replicas import replica_reads
+from .series import REPORT_DAYS, SERIES, series_payload
+
+
+@user_data_condition(daily=True)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def report_series(request, series):
+    """
+    Return one report series (weight, calories, activity, map, hr or sleep) for
+    the logged-in user. Defaults to the report's 30-day window ending today;
+    ?start= and ?end= select another window, ?bucket=week or month averages
+    the daily values per bucket, and ?points= or ?raw=1 control downsampling.
+    """
+    if series not in SERIES:
+        raise NotFound(f"Unknown series: {series}")
+    today = datetime.date.today()
+    start, end, budget, bucket = series_query(request, today - datetime.timedelta(days=REPORT_DAYS), today)
+    data = cached_context(
+        'report_series',
+        request.user,
+        lambda: downsample_payload(series_payload(request.user, series, start, end, bucket), budget),
+        series, start, end, budget, bucket,
+    )
+    return Response(data)
@@ -0,0 +1,147 @@
+"""
+Daily series behind the 30-day report, shared by the report dashboard and the
+report series API.
+"""
+
+import asyncio
+from django.db.models import Avg, Count, Sum, F, ExpressionWrapper, FloatField
+from healthy_you.buckets import bucketed
+from health.models import HealthMetric
+from health.series import KG_TO_LBS
+from sleep.models import SleepRecord
+
+# Number of days before today covered by the report
+REPORT_DAYS = 30
+
+# Series name -> key of report_series() holding the dates for its values
+SERIES = {
+    'weight': 'dates',
+    'calories': 'dates',
+    'activity': 'dates',
+    'map': 'dates',
+    'hr': 'dates',
+    'sleep': 'sleep_dates',
+}
+
+
+def rounded(value):
+    """
+    Round a value to two decimals, passing None through.
+    """
+    return round(value, 2) if value is not None else None
+
+
+def _health_rows(user, start, end, bucket='day'):
+    """
+    Return the health averages per day (or bucket) between start and end as a values() queryset.
+    """
+    # Define an ExpressionWrapper for calculating the Mean Arterial Pressure (MAP)
+    map_expr = ExpressionWrapper(
+        (F('blood_pressure_systolic') + 2 * F('blood_pressure_diastolic')) / 3.0,
+        output_field=FloatField()
+    )
+
+    # Query and aggregate HealthMetric data over the period
+    health_qs = HealthMetric.objects.filter(
+        user=user, date__range=(start, end)
+    )
+    return bucketed(
+        health_qs, bucket,
+        avg_weight=Avg('weight'),
+        avg_calories=Avg('calories_intake'),
+        avg_activity=Avg('physical_activity_minutes'),
+        avg_map=Avg(map_expr),  # Aggregate MAP based on the custom ExpressionWrapper
+        avg_hr=Avg('heart_rate')
+    )
+
+
+def _sleep_rows(user, start, end, bucket='day'):
+    """
+    Return the sleep totals per day (or bucket) between start and end as a
+    values() queryset, with the number of days that have records.
+    """
+    # Query and aggregate SleepRecord data (sum of sleep duration per day)
+    sleep_qs = SleepRecord.objects.filter(
+        user=user, date__range=(start, end)
+    )
+    return bucketed(
+        sleep_qs, bucket,
+        total_duration=Sum('duration'),
+        days=Count('date', distinct=True),
+    )
+
+
+def _health_series(rows):
+    # Prepare data for health metrics visualizations in a single pass
+    hm_dates, hm_weight_lbs, hm_calories, hm_activity, hm_map, hm_hr = [], [], [], [], [], []
+    for entry in rows:
+        hm_dates.append(entry['period'].strftime('%Y-%m-%d'))
+        weight = entry['avg_weight']
+        hm_weight_lbs.append(round(weight * KG_TO_LBS, 2) if weight is not None else None)  # Convert kg to lbs
+        hm_calories.append(rounded(entry['avg_calories']))
+        hm_activity.append(rounded(entry['avg_activity']))
+        hm_map.append(rounded(entry['avg_map']))
+        hm_hr.append(rounded(entry['avg_hr']))
+    return {
+        'dates': hm_dates,
+        'weight': hm_weight_lbs,
+        'calories': hm_calories,
+        'activity': hm_activity,
+        'map': hm_map,
+        'hr': hm_hr,
+    }
+
+
+def _sleep_series(rows):
+    sl_dates, sl_duration = [], []
+    for entry in rows:
+        sl_dates.append(entry['period'].strftime('%Y-%m-%d'))
+        # Average nightly total; a day bucket holds a single day
+        sl_duration.append(round(entry['total_duration'] / entry['days'], 2))
+    return {
+        'sleep_dates': sl_dates,
+        'sleep': sl_duration,
+    }
+
+
+def report_series(user, start, end, bucket='day'):
+    """
+    Aggregate a user's health metrics (daily averages) and sleep (daily totals)
+    between start and end, inclusive. Returns the health dates and the weight
+    (lbs), calories, activity, map and hr series, plus sleep_dates and sleep.
+    With bucket='week' or 'month' the values are averaged per bucket instead.
+    """
+    return {
+        **_health_series(_health_rows(user, start, end, bucket).iterator()),
+        **_sleep_series(_sleep_rows(user, start, end, bucket).iterator()),
+    }
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+async def areport_series(user, start, end):
+    """
+    Async variant of report_series(). The health and sleep aggregations are
+    independent, so they run concurrently.
+    """
+    health_rows, sleep_rows = await asyncio.gather(
+        _alist(_health_rows(user, start, end)),
+        _alist(_sleep_rows(user, start, end)),
+    )
+    return {**_health_series(health_rows), **_sleep_series(sleep_rows)}
+
+
+def series_payload(user, name, start, end, bucket='day'):
+    """
+    Build the API payload for one report chart between start and end.
+    """
+    series = report_series(user, start, end, bucket)
+    return {
+        'series': name,
+        'start': start,
+        'end': end,
+        'dates': series[SERIES[name]],
+        'values': series[name],
+    }
@@ -0,0 +1,55 @@
+import datetime
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from .views import report_context
+
+# Users who logged in within this many days get their report precomputed
+ACTIVE_DAYS = 7
+
+
+def _active_users(user_ids=None):
+    users = User.objects.filter(is_active=True)
+    if user_ids is not None:
+        return users.filter(id__in=user_ids)
+    return users.filter(last_login__gte=timezone.now() - datetime.timedelta(days=ACTIVE_DAYS))
+
+
+@shared_task
+def warm_report_snapshots(user_ids=None):
+    """
+    Compute today's report for recently active users (or the given user IDs)
+    and store it in the dashboard cache, so their first visit is a cache hit.
+    Only useful with a cache backend shared with the web processes. Returns
+    the number of reports computed.
+    """
+    today = datetime.date.today()
+    computed = 0
+    for user in _active_users(user_ids).iterator():
+        report_context(user, today)
+        computed += 1
+    return computed
+
+
+@shared_task
+def send_report_digests(user_ids=None):
+    """
+    Email recently active users (or the given user IDs) the analysis from
+    their current report, sending every message over one SMTP connection.
+    Returns the number of emails sent.
+    """
+    today = datetime.date.today()
+    messages = [
+        EmailMessage(
+            subject="Your Healthy You report",
+            body=report_context(user, today)['analysis'],
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email],
+        )
+        for user in _active_users(user_ids).exclude(email='').iterator()
+    ]
+    if not messages:
+        return 0
+    return get_connection().send_messages(messages)
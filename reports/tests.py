@@ -1,5 +1,9 @@
+from django.core import mail
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
+from healthy_you.cache import cache_stats, dashboard_cache
+from .tasks import send_report_digests, warm_report_snapshots
 from django.contrib.auth.models import User
 from health.models import HealthMetric
 from sleep.models import SleepRecord
@@ -146,3 +150,82 @@ class ReportDashboardViewTest(TestCase):
             self.assertIn('Your daily physical activity is low', analysis)
         if any(sleep < 7 for sleep in json.loads(response.context['sl_duration'])):
             self.assertIn('You are not getting enough sleep', analysis)
+
+
+class ReportSeriesApiTest(TestCase):
+    """
+    Unit tests for the report series API endpoint.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.force_login(self.user)
+        self.today = datetime.date.today()
+        HealthMetric.objects.create(user=self.user, date=self.today, weight=70, calories_intake=2000)
+        HealthMetric.objects.create(user=self.user, date=self.today - datetime.timedelta(days=40), weight=90)
+        SleepRecord.objects.create(user=self.user, date=self.today, duration=7, quality=4)
+
+    def test_default_window(self):
+        """
+        Test that series default to the report's 30-day window.
+        """
+        response = self.client.get(reverse('report_series', args=['weight']), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['values'], [154.32])
+        response = self.client.get(reverse('report_series', args=['sleep']), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['dates'], [self.today.strftime('%Y-%m-%d')])
+
+    def test_etag_changes_daily(self):
+        """
+        Test that the report ETag includes today's date, since the default window moves.
+        """
+        response = self.client.get(reverse('report_series', args=['calories']))
+        self.assertIn(self.today.strftime('%Y%m%d'), response['ETag'])
+        response = self.client.get(reverse('report_series', args=['calories']), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_buckets(self):
+        """
+        Test that report series can be averaged per week or month.
+        """
+        SleepRecord.objects.create(user=self.user, date=datetime.date(2023, 10, 1), duration=7, quality=4)
+        SleepRecord.objects.create(user=self.user, date=datetime.date(2023, 10, 2), duration=5, quality=4)
+        october = {'start': '2023-10-01', 'end': '2023-10-31'}
+        data = self.client.get(reverse('report_series', args=['sleep']), {'bucket': 'month', **october}).json()
+        self.assertEqual((data['dates'], data['values']), (['2023-10-01'], [6.0]))
+        data = self.client.get(reverse('report_series', args=['sleep']), {'bucket': 'week', **october}).json()
+        self.assertEqual((data['dates'], data['values']), (['2023-09-25', '2023-10-02'], [7.0, 5.0]))
+
+
+class ReportTasksTest(TestCase):
+    """
+    Unit tests for the report background tasks.
+    """
+
+    def setUp(self):
+        dashboard_cache().clear()
+        self.user = User.objects.create_user(username='activeuser', email='active@example.com', password='pw')
+        self.user.last_login = timezone.now()
+        self.user.save()
+        User.objects.create_user(username='idleuser', email='idle@example.com', password='pw')
+        SleepRecord.objects.create(user=self.user, date=datetime.date.today(), duration=6, quality=3)
+
+    def test_warm_report_snapshots(self):
+        """
+        Test that reports are precomputed for recently active users only and then served from the cache.
+        """
+        self.assertEqual(warm_report_snapshots.apply().get(), 1)
+        before = cache_stats()['reports']
+        self.client.force_login(self.user)
+        self.client.get(reverse('report_dashboard'))
+        after = cache_stats()['reports']
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'], before['misses'])
+
+    def test_send_report_digests(self):
+        """
+        Test that active users with an email address receive their report analysis.
+        """
+        self.assertEqual(send_report_digests.apply().get(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['active@example.com'])
+        self.assertIn('You are not getting enough sleep', mail.outbox[0].body)
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 
 # Define URL patterns for the 'reports' application
 urlpatterns = [
     # Path for the report dashboard view
-    path('dashboard/', views.report_dashboard, name='report_dashboard'),
+    path('dashboard/', views.areport_dashboard if settings.ASYNC_DASHBOARDS else views.report_dashboard, name='report_dashboard'),
+
+    # JSON endpoint for a single report series, defaulting to the last 30 days
+    path('api/series/<str:series>/', api.report_series, name='report_series'),
 ]
@@ -1,78 +1,80 @@
 import datetime
 import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Sum, F, ExpressionWrapper, FloatField
-from health.models import HealthMetric
-from sleep.models import SleepRecord
+from healthy_you.cache import acached_context, cached_context
+from healthy_you.replicas import replica_reads
+from healthy_you.stats import mean_of
+from .series import REPORT_DAYS, areport_series, report_series
 
 
 @login_required
+@replica_reads
 def report_dashboard(request):
     """
     Generates the report dashboard for the last 30 days of user data,
     including aggregated health metrics and sleep data. Provides data
     for visualizations and textual analysis for improvement suggestions.
     """
-    # Set the reporting period: last 30 days
+    # The report covers a window ending today, so it is cached per user and per day
     today = datetime.date.today()
-    start_date = today - datetime.timedelta(days=30)
+    return render(request, 'reports/report_dashboard.html', report_context(request.user, today))
 
-    # Define an ExpressionWrapper for calculating the Mean Arterial Pressure (MAP)
-    map_expr = ExpressionWrapper(
-        (F('blood_pressure_systolic') + 2 * F('blood_pressure_diastolic')) / 3.0,
-        output_field=FloatField()
-    )
 
-    # Query and aggregate HealthMetric data over the past 30 days
-    health_qs = HealthMetric.objects.filter(
-        user=request.user, date__range=(start_date, today)
-    ).order_by('date')
-    health_aggregated = health_qs.values('date').annotate(
-        avg_weight=Avg('weight'),
-        avg_calories=Avg('calories_intake'),
-        avg_activity=Avg('physical_activity_minutes'),
-        avg_map=Avg(map_expr),  # Aggregate MAP based on the custom ExpressionWrapper
-        avg_hr=Avg('heart_rate')
-    )
+@login_required
+@replica_reads
+async def areport_dashboard(request):
+    """
+    Async variant of report_dashboard, served when the project runs under
+    ASGI (see settings.ASYNC_DASHBOARDS).
+    """
+    today = datetime.date.today()
+    user = await request.auser()
+    context = await acached_context('reports', user, lambda: _abuild_dashboard_context(user, today), today)
+    # Rendering runs context processors that may touch the session and user, which is sync-only
+    return await sync_to_async(render)(request, 'reports/report_dashboard.html', context)
 
-    # Prepare data for health metrics visualizations
-    hm_dates = [entry['date'].strftime('%Y-%m-%d') for entry in health_aggregated]
-    hm_weight = [entry['avg_weight'] for entry in health_aggregated]
-    hm_weight_lbs = [
-        round(w * 2.20462, 2) if w is not None else None for w in hm_weight
-    ]  # Convert weight from kg to lbs
-    hm_calories = [
-        round(entry['avg_calories'], 2) if entry['avg_calories'] is not None else None
-        for entry in health_aggregated
-    ]
-    hm_activity = [
-        round(entry['avg_activity'], 2) if entry['avg_activity'] is not None else None
-        for entry in health_aggregated
-    ]
-    hm_map = [
-        round(entry['avg_map'], 2) if entry['avg_map'] is not None else None
-        for entry in health_aggregated
-    ]
-    hm_hr = [
-        round(entry['avg_hr'], 2) if entry['avg_hr'] is not None else None
-        for entry in health_aggregated
-    ]
-
-    # Query and aggregate SleepRecord data (sum of sleep duration per day)
-    sleep_qs = SleepRecord.objects.filter(
-        user=request.user, date__range=(start_date, today)
-    ).order_by('date')
-    sleep_aggregated = sleep_qs.values('date').annotate(
-        total_duration=Sum('duration')
-    )
-    sl_dates = [entry['date'].strftime('%Y-%m-%d') for entry in sleep_aggregated]
-    sl_duration = [round(entry['total_duration'], 2) for entry in sleep_aggregated]
 
-    # Helper function to calculate the average of a list while ignoring None values
+def report_context(user, today):
+    """
+    Return the report context for a user and day from the dashboard cache,
+    building it on a miss. Shared by the view and the background tasks.
+    """
+    return cached_context('reports', user, lambda: _build_dashboard_context(user, today), today)
+
+
+def _build_dashboard_context(user, today):
+    """
+    Compute the 30-day report charts and analysis for a user, ending on the given day.
+    """
+    # Set the reporting period: last 30 days
+    start_date = today - datetime.timedelta(days=REPORT_DAYS)
+
+    # Aggregate health metrics and sleep per day over the reporting period
+    return _context_from_series(report_series(user, start_date, today))
+
+
+async def _abuild_dashboard_context(user, today):
+    """
+    Async variant of _build_dashboard_context().
+    """
+    start_date = today - datetime.timedelta(days=REPORT_DAYS)
+    return _context_from_series(await areport_series(user, start_date, today))
+
+
+def _context_from_series(series):
+    """
+    Build the report context (chart data and textual analysis) from report_series() output.
+    """
+    hm_dates, sl_dates = series['dates'], series['sleep_dates']
+    hm_weight_lbs, hm_calories, hm_activity = series['weight'], series['calories'], series['activity']
+    hm_map, hm_hr, sl_duration = series['map'], series['hr'], series['sleep']
+
+    # Helper function to average a series while ignoring None values, without copying it
     def safe_avg(data):
-        filtered = [x for x in data if x is not None]
-        return round(sum(filtered) / len(filtered), 2) if filtered else 0
+        average = mean_of(data, None)
+        return round(average, 2) if average is not None else 0
 
     # Calculate overall averages for user feedback
     overall_weight = safe_avg(hm_weight_lbs)
@@ -99,7 +101,7 @@ def report_dashboard(request):
         analysis += "You are not getting enough sleep; aim for at least 7 hours per night. "
 
     # Pass all data to the template for visualizations and analysis
-    context = {
+    return {
         'hm_dates': json.dumps(hm_dates),
         'hm_weight_lbs': json.dumps(hm_weight_lbs),
         'hm_calories': json.dumps(hm_calories),
@@ -110,4 +112,3 @@ def report_dashboard(request):
         'sl_duration': json.dumps(sl_duration),
         'analysis': analysis,
     }
-    return render(request, 'reports/report_dashboard.html', context)
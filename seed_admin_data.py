@@ -0,0 +1,24 @@
+"""
+Seed the local database with a reproducible synthetic population.
+
+Usage:
+    python seed_admin_data.py [generate_synthetic_data options]
+
+With no options this creates 25 users with two years of history each; any
+options are passed straight to the generate_synthetic_data management
+command (see `python manage.py generate_synthetic_data --help`), e.g.
+`python seed_admin_data.py --users 10000 --years 3 --clear` for a
+profiling-sized dataset.
+"""
+
+import os
+import sys
+
+import django
+from django.core.management import call_command
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthy_you.settings')
+    django.setup()
+    call_command('generate_synthetic_data', *(sys.argv[1:] or ['--users', '25', '--years', '2']))
@@ -0,0 +1,32 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from healthy_you.api import series_query, user_data_condition
+from healthy_you.cache import cached_context
+from healthy_you.downsample import downsample_payload
+from healthy_you.replicas import replica_reads
+from .series import SERIES, series_payload
+
+
+@user_data_condition()
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def sleep_series(request, series):
+    """
+    Return one sleep chart series (duration or quality) for the logged-in user,
+    optionally limited to ?start= and ?end= dates. ?bucket=week or month
+    averages the daily values per bucket. Long series are downsampled to the
+    point budget; ?points= changes it and ?raw=1 disables it.
+    """
+    if series not in SERIES:
+        raise NotFound(f"Unknown series: {series}")
+    start, end, budget, bucket = series_query(request)
+    data = cached_context(
+        'sleep_series',
+        request.user,
+        lambda: downsample_payload(series_payload(request.user, series, start, end, bucket), budget),
+        series, start, end, budget, bucket,
+    )
+    return Response(data)
@@ -11,3 +11,9 @@ class SleepConfig(AppConfig):
 
     # Application name
     name = 'sleep'
+
+    def ready(self):
+        """
+        Connect the signal handlers that invalidate cached dashboards.
+        """
+        from . import signals  # noqa: F401
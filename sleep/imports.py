@@ -0,0 +1,26 @@
+from healthy_you.cache import invalidate_dashboards
+from healthy_you.importer import ImportReport, RowCleaner, import_records
+from .forms import SleepRecordForm
+from .models import SleepRecord
+
+
+def import_sleep_records(stream, user, fmt='csv', batch_size=1000, transaction_rows=20000):
+    """
+    Bulk-import SleepRecord rows for a user from a CSV or NDJSON text stream.
+    Columns match SleepRecordForm. Returns an ImportReport.
+
+    bulk_create skips the model signals, so the user's dashboards are
+    invalidated once the rows are in, including when a later chunk fails
+    after earlier ones committed.
+    """
+    cleaner = RowCleaner(SleepRecordForm)
+    report = ImportReport()
+    try:
+        import_records(
+            stream, fmt, cleaner, lambda cleaned: SleepRecord(user_id=user.pk, **cleaned), SleepRecord,
+            batch_size, transaction_rows, report,
+        )
+    finally:
+        if report.created:
+            invalidate_dashboards(user.pk)
+    return report
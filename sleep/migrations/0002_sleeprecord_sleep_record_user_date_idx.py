@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sleep', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sleeprecord',
+            index=models.Index(fields=['user', 'date'], name='sleep_record_user_date_idx'),
+        ),
+    ]
@@ -32,6 +32,12 @@ class SleepRecord(models.Model):
         default=3  # Default quality is set to 3 (average)
     )
 
+    class Meta:
+        indexes = [
+            # Dashboards filter by user and a date range, ordered by date
+            models.Index(fields=['user', 'date'], name='sleep_record_user_date_idx'),
+        ]
+
     def __str__(self):
         """
         String representation of the SleepRecord instance.
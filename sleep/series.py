@@ -0,0 +1,88 @@
+"""
+Chart series for the sleep dashboard, shared by the dashboard view and the
+series API so both describe a user's data the same way.
+"""
+
+from django.db.models import Avg, Count, Sum
+from healthy_you.buckets import bucketed
+from healthy_you.stats import mean_of
+from .models import SleepRecord
+
+# Series name -> field charted for individual records
+SERIES = {
+    'duration': 'duration',
+    'quality': 'quality',
+}
+
+
+def _records(user, start=None, end=None):
+    records = SleepRecord.objects.filter(user=user)
+    if start is not None:
+        records = records.filter(date__gte=start)
+    if end is not None:
+        records = records.filter(date__lte=end)
+    return records
+
+
+def daily_series(user, start=None, end=None, bucket='day'):
+    """
+    Return the per-day sleep series: {'dates': [...], 'duration': [...], 'quality': [...]},
+    with the total hours slept and the average quality for each day.
+
+    With bucket='week' or 'month' each entry covers a bucket instead: the
+    average nightly total over the days with records, and the average quality
+    of its records, dated by the bucket's first day (see healthy_you/buckets.py).
+    """
+    if bucket != 'day':
+        rows = bucketed(
+            _records(user, start, end), bucket,
+            total=Sum('duration'),
+            days=Count('date', distinct=True),
+            avg_quality=Avg('quality'),
+        )
+        return _format_daily(
+            {'date': row['period'], 'sum_duration': row['total'] / row['days'], 'avg_quality': row['avg_quality']}
+            for row in rows.iterator()
+        )
+    return _format_daily(_daily_rows(user, start, end).iterator())
+
+
+async def adaily_series(user, start=None, end=None):
+    """
+    Async variant of daily_series().
+    """
+    return _format_daily([entry async for entry in _daily_rows(user, start, end)])
+
+
+def _daily_rows(user, start, end):
+    return _records(user, start, end).values('date').annotate(
+        sum_duration=Sum('duration'),  # Total sleep durations per day
+        avg_quality=Avg('quality')  # Average quality per day
+    ).order_by('date')
+
+
+def _format_daily(rows):
+    # Format aggregated data ready for visualization in a single pass
+    dates, duration, quality = [], [], []
+    for entry in rows:
+        dates.append(entry['date'].strftime('%Y-%m-%d'))
+        duration.append(round(entry['sum_duration'], 2))  # Total hours
+        quality.append(round(entry['avg_quality'], 2))  # Average quality
+    return {'dates': dates, 'duration': duration, 'quality': quality}
+
+
+def series_payload(user, name, start=None, end=None, bucket='day'):
+    """
+    Build the API payload for one chart: its daily (or per-bucket) values, the
+    overall average and the individual records.
+    """
+    series = daily_series(user, start, end, bucket)
+    values = series[name]
+    points = _records(user, start, end).order_by('date').values_list('date', SERIES[name])
+    return {
+        'series': name,
+        'dates': series['dates'],
+        'values': values,
+        'overall': mean_of(values),
+        'points': [{'x': date.strftime('%Y-%m-%d'), 'y': value} for date, value in points],
+    }
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from healthy_you.cache import invalidate_dashboards, is_cascade_delete
+from .models import SleepRecord
+
+
+@receiver(post_save, sender=SleepRecord)
+@receiver(post_delete, sender=SleepRecord)
+def invalidate_dashboards_on_change(sender, instance, origin=None, **kwargs):
+    """
+    Move the owner to a new dashboard data version whenever one of their sleep records changes.
+    """
+    if not is_cascade_delete(sender, origin):
+        invalidate_dashboards(instance.user_id)
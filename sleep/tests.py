@@ -149,3 +149,46 @@ class SleepRecordFormTestCase(TestCase):
         self.assertIn("date", form.errors)
         self.assertIn("duration", form.errors)
         self.assertIn("quality", form.errors)
+
+
+class SleepSeriesApiTest(TestCase):
+    """
+    Tests for the sleep chart-series API endpoint.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_login(self.user)
+        SleepRecord.objects.create(user=self.user, date=datetime.date(2023, 10, 1), duration=7.5, quality=4)
+        SleepRecord.objects.create(user=self.user, date=datetime.date(2023, 10, 2), duration=6.0, quality=3)
+
+    def test_series_payload(self):
+        # Daily totals, the overall average and the individual records
+        response = self.client.get(reverse('sleep_series', args=['duration']), HTTP_ACCEPT='application/json')
+        data = response.json()
+        self.assertEqual(data['dates'], ['2023-10-01', '2023-10-02'])
+        self.assertEqual(data['values'], [7.5, 6.0])
+        self.assertEqual(data['overall'], 6.75)
+        self.assertEqual(len(data['points']), 2)
+
+    def test_not_modified(self):
+        # A matching ETag is answered with 304 until the user's data changes
+        url = reverse('sleep_series', args=['quality'])
+        etag = self.client.get(url, {'start': '2023-10-02'})['ETag']
+        self.assertEqual(self.client.get(url, {'start': '2023-10-02'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        SleepRecord.objects.create(user=self.user, date=datetime.date(2023, 10, 3), duration=8.0, quality=5)
+        response = self.client.get(url, {'start': '2023-10-02'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['values'], [3.0, 5.0])
+
+    def test_buckets(self):
+        # Week and month buckets average the nightly totals of the days with records
+        SleepRecord.objects.create(user=self.user, date=datetime.date(2023, 10, 1), duration=1.0, quality=2)
+        url = reverse('sleep_series', args=['duration'])
+        data = self.client.get(url, {'bucket': 'week'}).json()
+        self.assertEqual(data['dates'], ['2023-09-25', '2023-10-02'])  # 1 October 2023 was a Sunday
+        self.assertEqual(data['values'], [8.5, 6.0])
+        data = self.client.get(url, {'bucket': 'month'}).json()
+        self.assertEqual(data['values'], [7.25])
+        quality = self.client.get(reverse('sleep_series', args=['quality']), {'bucket': 'month'}).json()
+        self.assertEqual(quality['values'], [3.0])
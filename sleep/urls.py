@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 
 # Define URL patterns for the sleep application
 urlpatterns = [
     # Route for the sleep dashboard
-    path('dashboard/', views.sleep_dashboard, name='sleep_dashboard'),
+    path('dashboard/', views.asleep_dashboard if settings.ASYNC_DASHBOARDS else views.sleep_dashboard, name='sleep_dashboard'),
+
+    # JSON endpoint for a single chart series (duration or quality)
+    path('api/series/<str:series>/', api.sleep_series, name='sleep_series'),
 ]
@@ -1,13 +1,17 @@
-import datetime
-import json
+import asyncio
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Avg
+from healthy_you.cache import acached_context, cached_context
+from healthy_you.replicas import replica_reads
+from healthy_you.stats import mean_of
 from .forms import SleepRecordForm
 from .models import SleepRecord
+from .series import adaily_series, daily_series
 
 
 @login_required
+@replica_reads
 def sleep_dashboard(request):
     """
     View for the sleep dashboard.
@@ -27,31 +31,64 @@ def sleep_dashboard(request):
         # Initialize an empty form for GET requests
         form = SleepRecordForm()
 
-    # ** Aggregate sleep data by date for the logged-in user **
-    # - Calculate total sleep duration per day (sum)
-    # - Calculate average sleep quality per day (average)
-    aggregated = SleepRecord.objects.filter(user=request.user).values('date').annotate(
-        sum_duration=Sum('duration'),  # Total sleep durations per day
-        avg_quality=Avg('quality')  # Average quality per day
-    ).order_by('date')  # Order by date (ascending)
+    # The charts and feedback only change when the user's sleep data does, so they are cached
+    context = dict(cached_context('sleep', request.user, lambda: _build_dashboard_context(request.user)))
+    context['form'] = form  # Form for sleep data entry
 
-    # ** Format aggregated data ready for visualization **
-    agg_dates = [entry['date'].strftime('%b %Y') for entry in aggregated]  # Format dates as "Mon YYYY"
-    agg_duration = [round(entry['sum_duration'], 2) for entry in aggregated]  # Total hours
-    agg_quality = [round(entry['avg_quality'], 2) for entry in aggregated]  # Average quality
+    # Render the sleep dashboard template with the provided context
+    return render(request, 'sleep/sleep_dashboard.html', context)
+
+
+@login_required
+@replica_reads
+async def asleep_dashboard(request):
+    """
+    Async variant of sleep_dashboard, served when the project runs under
+    ASGI (see settings.ASYNC_DASHBOARDS). New records are still saved by the
+    sync view.
+    """
+    if request.method == 'POST':
+        return await sync_to_async(sleep_dashboard)(request)
+
+    user = await request.auser()
+    context = dict(await acached_context('sleep', user, lambda: _abuild_dashboard_context(user)))
+    context['form'] = SleepRecordForm()
+    # Rendering runs context processors that may touch the session and user, which is sync-only
+    return await sync_to_async(render)(request, 'sleep/sleep_dashboard.html', context)
+
+
+def _build_dashboard_context(user):
+    """
+    Compute the sleep dashboard's averages, feedback and record list for a
+    user, so sleep_dashboard can cache the result.
+    """
+    # ** Aggregate sleep data by date (the charts fetch the same series from the series API) **
+    series = daily_series(user)
 
+    # Individual records, evaluated now so the cached context holds rows rather than a query
+    records = list(SleepRecord.objects.filter(user=user).order_by('date'))
+    return _context_from_data(series, records)
+
+
+async def _abuild_dashboard_context(user):
+    """
+    Async variant of _build_dashboard_context(); the daily series and the
+    record list are read concurrently.
+    """
+    async def records():
+        return [record async for record in SleepRecord.objects.filter(user=user).order_by('date')]
+
+    series, record_list = await asyncio.gather(adaily_series(user), records())
+    return _context_from_data(series, record_list)
+
+
+def _context_from_data(series, records):
+    """
+    Build the dashboard context from the daily series and the user's records.
+    """
     # Calculate overall averages for duration and quality
-    overall_duration = sum(agg_duration) / len(agg_duration) if agg_duration else 0
-    overall_quality = sum(agg_quality) / len(agg_quality) if agg_quality else 0
-
-    # Build scatter data for individual sleep records, useful for detailed visualizations
-    records = SleepRecord.objects.filter(user=request.user).order_by('date')  # Get individual records
-    individual_duration = [
-        {"x": r.date.strftime("%b %Y"), "y": r.duration} for r in records
-    ]
-    individual_quality = [
-        {"x": r.date.strftime("%b %Y"), "y": r.quality} for r in records
-    ]
+    overall_duration = mean_of(series['duration'])
+    overall_quality = mean_of(series['quality'])
 
     # ** Build dynamic feedback based on user statistics **
     feedback = (
@@ -74,19 +111,10 @@ def sleep_dashboard(request):
     else:
         feedback += "Your sleep quality appears satisfactory."
 
-    # ** Prepare context for the template **
-    context = {
-        'form': form,  # Form for sleep data entry
-        'agg_dates': json.dumps(agg_dates),  # Aggregated dates for visualization
-        'agg_duration': json.dumps(agg_duration),  # Aggregated durations
-        'agg_quality': json.dumps(agg_quality),  # Aggregated quality ratings
+    # ** Prepare context for the template (the entry form is added by the view) **
+    return {
         'overall_duration': overall_duration,  # Overall average sleep duration
         'overall_quality': overall_quality,  # Overall average sleep quality
-        'individual_duration': json.dumps(individual_duration),  # Scatter data: individual duration
-        'individual_quality': json.dumps(individual_quality),  # Scatter data: individual quality
         'feedback': feedback,  # Personalized feedback for the user
         'records': records,  # Full list of user's records (potentially for editing later)
     }
-
-    # Render the sleep dashboard template with the provided context
-    return render(request, 'sleep/sleep_dashboard.html', context)
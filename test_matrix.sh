@@ -0,0 +1,42 @@
+#!/usr/bin/env sh
+# Run the test suite against SQLite and then against PostgreSQL in a
+# throwaway local container, which is removed afterwards. Arguments are passed
+# to `manage.py test` (e.g. ./test_matrix.sh health sleep).
+#
+# Needs docker (or CONTAINER_RUNTIME=podman) and psycopg installed.
+set -u
+
+RUNTIME=${CONTAINER_RUNTIME:-docker}
+PG_IMAGE=${PG_IMAGE:-postgres:16-alpine}
+PG_PORT=${PG_PORT:-55432}
+export DJANGO_SECRET_KEY=${DJANGO_SECRET_KEY:-test-matrix}
+
+status=0
+
+echo "== sqlite"
+DJANGO_DB_ENGINE=sqlite python manage.py test "$@" || status=1
+
+echo "== postgresql ($PG_IMAGE)"
+container=$("$RUNTIME" run -d --rm -e POSTGRES_PASSWORD=postgres -p "127.0.0.1:$PG_PORT:5432" "$PG_IMAGE") || exit 1
+trap '"$RUNTIME" stop "$container" >/dev/null' EXIT
+
+# The image's init scripts run on a socket-only server first, so wait for TCP
+tries=0
+until "$RUNTIME" exec "$container" pg_isready -h 127.0.0.1 -U postgres >/dev/null 2>&1; do
+    tries=$((tries + 1))
+    if [ "$tries" -ge 60 ]; then
+        echo "PostgreSQL did not start" >&2
+        exit 1
+    fi
+    sleep 1
+done
+
+DJANGO_DB_ENGINE=postgresql \
+DJANGO_DB_NAME=postgres \
+DJANGO_DB_USER=postgres \
+DJANGO_DB_PASSWORD=postgres \
+DJANGO_DB_HOST=127.0.0.1 \
+DJANGO_DB_PORT="$PG_PORT" \
+python manage.py test "$@" || status=1
+
+exit $status